@@ -44,10 +44,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # Comprime las respuestas (las APIs de gráficos en JSON se reducen ~10x)
+    "django.middleware.gzip.GZipMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "dashboard.routers.AdherenciaDBMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -93,7 +96,26 @@ DATABASES = {
         },
         'TIME_ZONE': 'America/Lima',
         'CONN_MAX_AGE': 300,
-    }
+    },
+    # Réplica de solo lectura para las consultas analíticas (opcional).
+    # Mismas opciones que 'default' apuntando al HOST de la réplica, p. ej.:
+    # 'analytics': {..., 'HOST': '192.168.18.46', 'TEST': {'MIRROR': 'default'}},
+}
+
+# Lecturas analíticas (dashboard, APIs, cálculos) a la réplica, escrituras a default
+DATABASE_ROUTERS = ['dashboard.routers.RouterAnalitica']
+
+# Caché compartido por todos los procesos: las invalidaciones (versiones de
+# fragmentos, jornadas y simulaciones) deben verlas todos los workers, no solo
+# el que guardó. La tabla se crea con `python manage.py createcachetable`.
+# Con Redis: {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#             'LOCATION': 'redis://127.0.0.1:6379'}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'adherencia_cache',
+        'TIMEOUT': 300,
+    },
 }
 # Asegurar que Django use UTF-8
 DEFAULT_CHARSET = 'utf-8'
@@ -139,6 +161,49 @@ STATICFILES_DIR = [
   
   ]
 
+# Archivo columnar de actividades de meses cerrados
+# (ver manage.py archivar_actividades)
+ADHERENCIA_ARCHIVO_DIR = BASE_DIR / 'archivo'
+
+# Memoria máxima (MB) que CargadorDatos puede reservar en una sola carga
+ADHERENCIA_CARGADOR_MB = 256
+
+# Envía al log (nivel DEBUG) el detalle del análisis de problemas por minuto
+ADHERENCIA_DEBUG_ANALISIS = False
+
+# Días recientes que muestra el admin de tablas grandes sin filtro de fecha
+ADHERENCIA_ADMIN_DIAS = 31
+
+# Alias de la réplica para lecturas analíticas (si no existe en DATABASES se usa default)
+ADHERENCIA_DB_ANALITICA = 'analytics'
+
+# Tras una escritura, leer de default en el resto de la petición y durante
+# estos segundos en el mismo navegador (0 = solo la petición)
+ADHERENCIA_DB_PEGAJOSA = True
+ADHERENCIA_DB_PEGAJOSA_SEGUNDOS = 5
+
+# Nivel de servicio objetivo para el dimensionamiento Erlang C:
+# fracción de llamadas atendidas antes de ADHERENCIA_TIEMPO_SERVICIO segundos
+ADHERENCIA_NIVEL_SERVICIO = 0.8
+ADHERENCIA_TIEMPO_SERVICIO = 20
+
+# Intervalo (minutos, divisor de 1440) y ventana operativa por defecto de las
+# vistas de adherencia intradía; un cierre <= apertura es una ventana nocturna
+ADHERENCIA_INTERVALO = 60
+ADHERENCIA_VENTANA = ('08:00', '20:00')
+
+# Cálculos intradía de un día sobre las líneas de tiempo en bitsets
+# (LineaTiempoAgente); False vuelve a leer programas y actividades
+ADHERENCIA_LINEAS_TIEMPO = True
+
+# Caché de fragmentos de plantilla: duración máxima (segundos) y demora máxima
+# con la que las vistas ven una nueva versión de los datos
+ADHERENCIA_FRAGMENTOS_SEGUNDOS = 300
+ADHERENCIA_FRAGMENTOS_DEMORA = 30
+
+# Duración máxima (segundos) de las simulaciones de impacto en caché
+ADHERENCIA_IMPACTO_SEGUNDOS = 3600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -1,6 +1,131 @@
-from django.contrib import admin
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
 from .models import *
 
+
+class PaginadorEstimado(Paginator):
+    """
+    Paginator que, en tablas grandes, usa la estimación del motor (MySQL:
+    estadísticas de la tabla o EXPLAIN) en lugar de un COUNT(*) exacto.
+    Por debajo de UMBRAL filas estimadas sí cuenta exacto.
+    """
+
+    UMBRAL = 100000
+
+    def _estimar(self):
+        queryset = self.object_list
+        conexion = connections[queryset.db]
+        if conexion.vendor != 'mysql':
+            return None
+
+        with conexion.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                    [queryset.model._meta.db_table]
+                )
+            else:
+                sql, params = queryset.order_by().values('pk').query.sql_with_params()
+                cursor.execute(f"EXPLAIN {sql}", params)
+            fila = cursor.fetchone()
+            if fila is None:
+                return None
+            if cursor.description[0][0].upper() == 'TABLE_ROWS':
+                return fila[0]
+            columnas = [c[0].lower() for c in cursor.description]
+            return fila[columnas.index('rows')] if 'rows' in columnas else None
+
+    @cached_property
+    def count(self):
+        estimado = self._estimar()
+        if estimado is not None and estimado >= self.UMBRAL:
+            return int(estimado)
+        return super().count
+
+
+class ChangeListAcotado(ChangeList):
+    """
+    Sin filtro de fecha explícito, el listado (y la jerarquía de fechas)
+    se limita a los últimos ADHERENCIA_ADMIN_DIAS días, que usan el índice
+    por fecha en vez de recorrer toda la tabla.
+    """
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if not any(parametro.startswith('fecha') for parametro in self.params):
+            dias = getattr(settings, 'ADHERENCIA_ADMIN_DIAS', 31)
+            queryset = queryset.filter(fecha__gte=date.today() - timedelta(days=dias))
+        return queryset
+
+
+class FiltroAgente(admin.SimpleListFilter):
+    """
+    Filtro por agente con autocompletado (usa el endpoint de autocomplete
+    del admin sobre AgenteAdmin.search_fields); no carga la lista de agentes.
+    """
+
+    title = 'agente'
+    parameter_name = 'agente__id__exact'
+    template = 'admin/dashboard/filtro_agente.html'
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        # Un id no numérico (URL editada a mano) se ignora, como en choices
+        if self.value() and self.value().isdigit():
+            return queryset.filter(agente_id=self.value())
+        return queryset
+
+    def choices(self, changelist):
+        seleccionado = None
+        if self.value() and self.value().isdigit():
+            seleccionado = Agente.objects.filter(pk=self.value()).first()
+        yield {
+            'seleccionado': seleccionado,
+            'parametro': self.parameter_name,
+            'app_label': changelist.opts.app_label,
+            'model_name': changelist.opts.model_name,
+            'ocultos': [
+                (clave, valor) for clave, valor in changelist.params.items()
+                if clave != self.parameter_name
+            ],
+        }
+
+
+class AdminTablaGrande(admin.ModelAdmin):
+    """
+    Modo para tablas grandes: conteo estimado, sin conteo total,
+    agente con select_related/autocomplete y rango de fechas acotado.
+    """
+
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    list_select_related = ('agente',)
+    autocomplete_fields = ['agente']
+    date_hierarchy = 'fecha'
+
+    def get_changelist(self, request, **kwargs):
+        return ChangeListAcotado
+
+    @property
+    def media(self):
+        campo = self.model._meta.get_field('agente')
+        return super().media + AutocompleteSelect(campo, self.admin_site).media
+
+
 @admin.register(Agente)
 class AgenteAdmin(admin.ModelAdmin):
     list_display = ['codigo', 'nombre', 'apellido', 'tipo_contrato', 'activo']
@@ -9,17 +134,58 @@ class AgenteAdmin(admin.ModelAdmin):
     list_per_page = 20
 
 @admin.register(ProgramaDiario)
-class ProgramaDiarioAdmin(admin.ModelAdmin):
+class ProgramaDiarioAdmin(AdminTablaGrande):
     list_display = ['agente', 'fecha', 'turno', 'horas_planificadas']
-    list_filter = ['fecha', 'turno']
+    list_filter = [FiltroAgente, 'fecha', 'turno']
     search_fields = ['agente__codigo', 'agente__nombre']
-    date_hierarchy = 'fecha'
+    actions = ['copiar_a_proxima_semana']
+
+    @admin.action(description='Copiar programación a la próxima semana')
+    def copiar_a_proxima_semana(self, request, queryset):
+        copias = [
+            ProgramaDiario(
+                agente_id=programa.agente_id,
+                fecha=programa.fecha + timedelta(days=7),
+                turno=programa.turno,
+                hora_inicio=programa.hora_inicio,
+                hora_fin=programa.hora_fin,
+                horas_planificadas=programa.horas_planificadas,
+                pausas_planificadas=programa.pausas_planificadas,
+            )
+            for programa in queryset.order_by().iterator(chunk_size=2000)
+        ]
+        # Los días que ya tienen programación en la semana destino se respetan
+        existentes = set(
+            ProgramaDiario.objects.filter(
+                agente_id__in={c.agente_id for c in copias},
+                fecha__in={c.fecha for c in copias},
+            ).values_list('agente_id', 'fecha')
+        )
+        nuevas = [c for c in copias if (c.agente_id, c.fecha) not in existentes]
+        ProgramaDiario.objects.bulk_create(nuevas, batch_size=2000)
+
+        self.message_user(
+            request,
+            f"{len(nuevas)} programaciones copiadas a la próxima semana "
+            f"({len(copias) - len(nuevas)} ya existían).",
+            messages.SUCCESS
+        )
 
 @admin.register(RegistroActividad)
-class RegistroActividadAdmin(admin.ModelAdmin):
+class RegistroActividadAdmin(AdminTablaGrande):
     list_display = ['agente', 'fecha', 'tipo_actividad', 'duracion_minutos']
-    list_filter = ['tipo_actividad', 'fecha']
+    list_filter = [FiltroAgente, 'tipo_actividad', 'fecha']
     search_fields = ['agente__codigo']
+
+@admin.register(ExcepcionAdherencia)
+class ExcepcionAdherenciaAdmin(AdminTablaGrande):
+    list_display = ['agente', 'fecha', 'tipo', 'inicio_min', 'fin_min', 'minutos']
+    list_filter = [FiltroAgente, 'tipo', 'fecha']
+    search_fields = ['agente__codigo']
+
+@admin.register(ContadorDiario)
+class ContadorDiarioAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'programas', 'actividades', 'llamadas', 'agentes_activos', 'minutos_conversacion']
     date_hierarchy = 'fecha'
 
 @admin.register(KPIMeta)
@@ -30,4 +196,4 @@ class KPIMetaAdmin(admin.ModelAdmin):
 @admin.register(FactorImpacto)
 class FactorImpactoAdmin(admin.ModelAdmin):
     list_display = ['nombre', 'categoria', 'impacto_porcentaje']
-    list_filter = ['categoria']
\ No newline at end of file
+    list_filter = ['categoria']
@@ -0,0 +1,429 @@
+# dashboard/analizador.py
+"""
+Análisis de problemas de adherencia en una sola pasada.
+
+Se construye una vez el vector minuto a minuto de agentes programados y
+activos del día (ver ``ocupacion_dia``) y de ese único vector salen los
+histogramas, los peores minutos, las horas críticas y las rachas de huecos y
+sobrecargas, sin volver a consultar la base de datos por hora o por minuto.
+"""
+
+import heapq
+import logging
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .cargador import CargadorDatos
+
+logger = logging.getLogger(__name__)
+
+RANGOS_HISTOGRAMA = ['0-20%', '20-40%', '40-60%', '60-80%', '80-100%']
+LIMITES_HISTOGRAMA = [20, 40, 60, 80]
+
+UMBRAL_BAJA = 80      # minuto con adherencia baja
+UMBRAL_CRITICO = 50   # minuto crítico / hueco de productividad
+UMBRAL_SOBRECARGA = 110  # más agentes activos que programados
+
+MINUTOS_DIA = 24 * 60
+
+
+def _rachas(mascara):
+    """Índices [inicio, fin) de cada racha de True en un vector booleano"""
+    bordes = np.diff(np.concatenate(([0], mascara.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(bordes == 1).tolist(), np.flatnonzero(bordes == -1).tolist()))
+
+
+def _estado(adherencia):
+    if adherencia >= 90:
+        return '✅ Excelente'
+    if adherencia >= 80:
+        return '⚠️  Aceptable'
+    if adherencia >= 60:
+        return '🔴 Crítico'
+    return '💀 Grave'
+
+
+def _etiqueta_minuto(minuto_abs):
+    return f"{(minuto_abs // 60) % 24:02d}:{minuto_abs % 60:02d}"
+
+
+def mascaras_agentes(df, agentes, inicio_min, fin_min):
+    """
+    Matriz booleana (agentes × minutos) con los minutos de [inicio_min,
+    fin_min) que cubre alguna fila de cada agente; `agentes` ordenado
+    """
+    minutos = fin_min - inicio_min
+    # Arrays de diferencias por agente: +1 al entrar, -1 al salir
+    diferencias = np.zeros((len(agentes), minutos + 1), dtype=np.int16)
+    if len(df):
+        fila = np.searchsorted(agentes, df['agente_id'].to_numpy())
+        inicio = np.clip(df['inicio_min'].to_numpy(np.int32) - inicio_min, 0, minutos)
+        fin = np.clip(df['fin_min'].to_numpy(np.int32) - inicio_min, 0, minutos)
+        validos = fin > inicio
+        np.add.at(diferencias, (fila[validos], inicio[validos]), 1)
+        np.add.at(diferencias, (fila[validos], fin[validos]), -1)
+    return np.cumsum(diferencias[:, :minutos], axis=1) > 0
+
+
+def _ocupacion(programas, actividades, inicio_min, fin_min):
+    """Vectores por minuto de un día a partir de sus programas y actividades"""
+    agentes = np.union1d(programas['agente_id'].to_numpy(), actividades['agente_id'].to_numpy())
+    programado = mascaras_agentes(programas, agentes, inicio_min, fin_min)
+    activo = mascaras_agentes(actividades, agentes, inicio_min, fin_min)
+
+    return {
+        'inicio_min': inicio_min,
+        'programados': programado.sum(axis=0),
+        'activos': (programado & activo).sum(axis=0),
+        'activos_total': activo.sum(axis=0),
+    }
+
+
+def ocupacion_dia(fecha, inicio_min=8 * 60, fin_min=20 * 60, agente_ids=None):
+    """
+    Vectores por minuto en [inicio_min, fin_min) (opcionalmente solo de
+    ``agente_ids``):
+    - programados: agentes con turno en ese minuto
+    - activos: agentes programados con actividad productiva
+    - activos_total: agentes con actividad productiva (programados o no)
+    Con fin_min > 1440 la ventana sigue en la madrugada del día siguiente.
+    Las ventanas dentro del día se resuelven con las líneas de tiempo en
+    bitsets (ADHERENCIA_LINEAS_TIEMPO, ver lineatiempo.py).
+    """
+    if getattr(settings, 'ADHERENCIA_LINEAS_TIEMPO', True) and 0 <= inicio_min < fin_min <= MINUTOS_DIA:
+        from .lineatiempo import LineaTiempo  # lineatiempo importa este módulo
+        return LineaTiempo.ocupacion(fecha, inicio_min, fin_min, agente_ids)
+
+    rango = ocupacion_rango(fecha, fecha, inicio_min, fin_min, agente_ids)
+    return {
+        'inicio_min': inicio_min,
+        'programados': rango['programados'][0],
+        'activos': rango['activos'][0],
+        'activos_total': rango['activos_total'][0],
+    }
+
+
+def _vecinos(df, fecha_inicio, nocturna):
+    """
+    Filas con su día (relativo a fecha_inicio) más las copias que caen en la
+    ventana de los días vecinos: los turnos que cruzan la medianoche cuentan
+    también en la mañana siguiente (-1440) y, si la ventana es nocturna, las
+    filas de cada día cuentan en la madrugada del anterior (+1440).
+    """
+    dia = (df['fecha'].to_numpy() - np.datetime64(fecha_inicio, 'D')).astype(
+        'timedelta64[D]').astype(np.int64)
+    partes = [df.assign(dia=dia)]
+    cruzan = df['fin_min'].to_numpy() > MINUTOS_DIA
+    partes.append(df[cruzan].assign(
+        dia=dia[cruzan] + 1,
+        inicio_min=df['inicio_min'][cruzan] - MINUTOS_DIA,
+        fin_min=df['fin_min'][cruzan] - MINUTOS_DIA,
+    ))
+    if nocturna:
+        partes.append(df.assign(
+            dia=dia - 1,
+            inicio_min=df['inicio_min'] + MINUTOS_DIA,
+            fin_min=df['fin_min'] + MINUTOS_DIA,
+        ))
+    return pd.concat(partes, ignore_index=True)
+
+
+def filas_por_dia(df, fecha_inicio, dias, nocturna=False):
+    """
+    Filas (con las de los días vecinos que caen en cada ventana, ver
+    _vecinos) ordenadas por día y límites [limites[d], limites[d + 1]) de
+    cada uno de los `dias` días desde fecha_inicio
+    """
+    df = _vecinos(df, fecha_inicio, nocturna)
+    dia = df['dia'].to_numpy()
+    orden = np.argsort(dia, kind='stable')
+    return df.iloc[orden], np.searchsorted(dia[orden], np.arange(dias + 1))
+
+
+def ocupacion_rango(fecha_inicio, fecha_fin, inicio_min=8 * 60, fin_min=20 * 60, agente_ids=None):
+    """
+    Igual que ocupacion_dia para cada día del rango, con una sola carga de
+    programas y actividades: matrices (días × minutos).
+    """
+    dias = (fecha_fin - fecha_inicio).days + 1
+    nocturna = fin_min > MINUTOS_DIA
+    # Un día antes por los turnos que cruzan la medianoche y, en ventanas
+    # nocturnas, uno después por la madrugada del último día
+    desde = fecha_inicio - timedelta(days=1)
+    hasta = fecha_fin + timedelta(days=1) if nocturna else fecha_fin
+    programas = CargadorDatos.cargar_programas(desde, hasta, agente_ids=agente_ids)
+    actividades = CargadorDatos.cargar_productivas(desde, hasta, agente_ids=agente_ids)
+
+    programas, limites_programas = filas_por_dia(programas, fecha_inicio, dias, nocturna)
+    actividades, limites_actividades = filas_por_dia(actividades, fecha_inicio, dias, nocturna)
+
+    cubo = {
+        clave: np.zeros((dias, fin_min - inicio_min), dtype=np.int32)
+        for clave in ('programados', 'activos', 'activos_total')
+    }
+    for d in range(dias):
+        ocupacion = _ocupacion(
+            programas.iloc[limites_programas[d]:limites_programas[d + 1]],
+            actividades.iloc[limites_actividades[d]:limites_actividades[d + 1]],
+            inicio_min, fin_min,
+        )
+        for clave in cubo:
+            cubo[clave][d] = ocupacion[clave]
+
+    cubo['inicio_min'] = inicio_min
+    cubo['fechas'] = [fecha_inicio + timedelta(days=d) for d in range(dias)]
+    return cubo
+
+
+def acumulados(ocupacion):
+    """
+    Sumas prefijas por minuto (con un 0 inicial en el último eje) de una
+    ocupación de un día o de un cubo. Se calculan una vez y quedan guardadas
+    en la ocupación: la suma de cualquier tramo [i, j) es a[j] - a[i].
+    """
+    if 'acumulados' not in ocupacion:
+        programados = np.asarray(ocupacion['programados'])
+        adherencia = AnalizadorProblemas.adherencia_por_minuto(programados, ocupacion['activos'])
+        con_programacion = programados > 0
+        series = {
+            'programados': programados,
+            'activos': np.asarray(ocupacion['activos']),
+            'activos_total': np.asarray(ocupacion['activos_total']),
+            'minutos_programados': con_programacion,
+            'suma_adherencia': np.nan_to_num(adherencia),
+            'minutos_baja': con_programacion & (adherencia < UMBRAL_BAJA),
+            'minutos_criticos': con_programacion & (adherencia < UMBRAL_CRITICO),
+        }
+        ceros = np.zeros(programados.shape[:-1] + (1,))
+        ocupacion['acumulados'] = {
+            clave: np.concatenate((ceros, np.cumsum(serie, axis=-1, dtype=np.float64)), axis=-1)
+            for clave, serie in series.items()
+        }
+    return ocupacion['acumulados']
+
+
+def intervalos(ocupacion, intervalo=60, desde_min=None, hasta_min=None):
+    """
+    Sumas por intervalo de `intervalo` minutos en [desde_min, hasta_min)
+    (por defecto toda la ventana de la ocupación), cada una en O(1) a partir
+    de ``acumulados``. Minutos absolutos: > 1440 es la madrugada siguiente.
+    """
+    sumas = acumulados(ocupacion)
+    inicio_min = ocupacion['inicio_min']
+    largo = sumas['programados'].shape[-1] - 1
+    desde_min = inicio_min if desde_min is None else desde_min
+    hasta_min = inicio_min + largo if hasta_min is None else hasta_min
+
+    inicios = np.arange(desde_min, hasta_min, intervalo)
+    i = np.clip(inicios - inicio_min, 0, largo)
+    j = np.clip(np.minimum(inicios + intervalo, hasta_min) - inicio_min, 0, largo)
+
+    resultado = {clave: acumulado[..., j] - acumulado[..., i] for clave, acumulado in sumas.items()}
+    resultado['inicios'] = inicios
+    resultado['etiquetas'] = [_etiqueta_minuto(int(m)) for m in inicios]
+    return resultado
+
+
+class AnalizadorProblemas:
+    """
+    Analiza un vector de adherencia por minuto en una sola pasada vectorizada
+    """
+
+    @staticmethod
+    def adherencia_por_minuto(programados, activos):
+        """Adherencia (%) por minuto; NaN donde no hay programación"""
+        programados = np.asarray(programados, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(programados > 0, np.asarray(activos) / programados * 100, np.nan)
+
+    @staticmethod
+    def analizar(ocupacion, peores=5):
+        inicio_min = ocupacion['inicio_min']
+        programados = np.asarray(ocupacion['programados'])
+        adherencia = AnalizadorProblemas.adherencia_por_minuto(programados, ocupacion['activos'])
+        carga = AnalizadorProblemas.adherencia_por_minuto(programados, ocupacion['activos_total'])
+
+        con_programacion = programados > 0
+        minuto_abs = inicio_min + np.arange(len(adherencia))
+        hora = minuto_abs // 60
+        horas = np.unique(hora)
+        posicion_hora = hora - horas[0]
+
+        # Histograma por hora: una sola bincount sobre (hora, rango)
+        rango = np.digitize(np.nan_to_num(adherencia), LIMITES_HISTOGRAMA, right=True)
+        histograma = np.bincount(
+            posicion_hora[con_programacion] * len(RANGOS_HISTOGRAMA) + rango[con_programacion],
+            minlength=len(horas) * len(RANGOS_HISTOGRAMA)
+        ).reshape(len(horas), len(RANGOS_HISTOGRAMA))
+
+        def por_hora(mascara):
+            return np.bincount(posicion_hora[mascara], minlength=len(horas))
+
+        minutos_programados = por_hora(con_programacion)
+        minutos_baja = por_hora(con_programacion & (adherencia < UMBRAL_BAJA))
+        minutos_criticos = por_hora(con_programacion & (adherencia < UMBRAL_CRITICO))
+        suma_adherencia = np.bincount(
+            posicion_hora[con_programacion], weights=adherencia[con_programacion], minlength=len(horas)
+        )
+
+        problemas = {
+            'huecos_productividad': [],
+            'sobrecargas': [],
+            'horas_criticas': [],
+            'peores_minutos': [],
+            'resumen_por_hora': {},
+            'histograma_por_hora': {},
+        }
+
+        for i, h in enumerate(horas.tolist()):
+            etiqueta = f"{h % 24:02d}:00"
+            if minutos_programados[i]:
+                promedio = round(float(suma_adherencia[i] / minutos_programados[i]), 2)
+                consistencia = round(
+                    (minutos_programados[i] - minutos_baja[i]) / minutos_programados[i] * 100, 1
+                )
+                estado = _estado(promedio)
+            else:
+                promedio, consistencia, estado = 0, 0, '⏸️  Sin programación'
+
+            if minutos_criticos[i] > 0:
+                problemas['horas_criticas'].append({
+                    'hora': etiqueta,
+                    'minutos_criticos': int(minutos_criticos[i]),
+                    'adherencia_promedio': promedio,
+                })
+
+            problemas['resumen_por_hora'][etiqueta] = {
+                'adherencia': promedio,
+                'estado': estado,
+                'minutos_baja': int(minutos_baja[i]),
+                'consistencia': consistencia,
+            }
+            problemas['histograma_por_hora'][etiqueta] = dict(
+                zip(RANGOS_HISTOGRAMA, histograma[i].tolist())
+            )
+
+        # Peores minutos con un heap acotado a `peores` elementos
+        validos = np.flatnonzero(con_programacion)
+        for valor, i in heapq.nsmallest(peores, zip(adherencia[validos].tolist(), validos.tolist())):
+            problemas['peores_minutos'].append({
+                'minuto': _etiqueta_minuto(int(minuto_abs[i])),
+                'adherencia': round(valor, 1),
+                'agentes_programados': int(programados[i]),
+                'agentes_activos': int(ocupacion['activos'][i]),
+            })
+
+        for clave, mascara, valores in (
+            ('huecos_productividad', con_programacion & (adherencia < UMBRAL_CRITICO), adherencia),
+            ('sobrecargas', con_programacion & (carga > UMBRAL_SOBRECARGA), carga),
+        ):
+            for inicio, fin in _rachas(mascara):
+                problemas[clave].append({
+                    'inicio': _etiqueta_minuto(int(minuto_abs[inicio])),
+                    'fin': _etiqueta_minuto(int(minuto_abs[fin - 1]) + 1),
+                    'minutos': fin - inicio,
+                    'adherencia_promedio': round(float(valores[inicio:fin].mean()), 1),
+                })
+
+        if getattr(settings, 'ADHERENCIA_DEBUG_ANALISIS', False):
+            AnalizadorProblemas._registrar(problemas)
+
+        return problemas
+
+    @staticmethod
+    def _registrar(problemas):
+        """Detalle del análisis en el log (solo con ADHERENCIA_DEBUG_ANALISIS)"""
+        for hora, histograma in problemas['histograma_por_hora'].items():
+            logger.debug(
+                "Hora %s: %s", hora,
+                ", ".join(f"{rango}={cantidad}" for rango, cantidad in histograma.items())
+            )
+        for minuto in problemas['peores_minutos']:
+            logger.debug(
+                "Minuto crítico %s - %.1f%% (%d/%d agentes)", minuto['minuto'],
+                minuto['adherencia'], minuto['agentes_activos'], minuto['agentes_programados']
+            )
+        for hueco in problemas['huecos_productividad']:
+            logger.debug("Hueco de productividad %s-%s (%d min)",
+                         hueco['inicio'], hueco['fin'], hueco['minutos'])
+
+
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+
+class CuboAdherencia:
+    """
+    Cubo fechas × minutos de programados, activos y adherencia, con
+    reducciones para tendencias de varias semanas
+    """
+
+    @staticmethod
+    def construir(fecha_inicio, fecha_fin, inicio_min=8 * 60, fin_min=20 * 60, agente_ids=None):
+        cubo = ocupacion_rango(fecha_inicio, fecha_fin, inicio_min, fin_min, agente_ids)
+        cubo['adherencia'] = AnalizadorProblemas.adherencia_por_minuto(
+            cubo['programados'], cubo['activos']
+        )
+        return cubo
+
+    @staticmethod
+    def _promedio(suma, cantidad):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            promedio = np.where(cantidad > 0, suma / cantidad, np.nan)
+        return [[None if np.isnan(v) else round(float(v), 2) for v in fila] for fila in np.atleast_2d(promedio)]
+
+    @staticmethod
+    def por_dia_semana_y_hora(cubo, intervalo=60):
+        """
+        Adherencia media (de los minutos con programación) por día de la
+        semana e intervalo: matriz 7 × intervalos
+        """
+        tramos = intervalos(cubo, intervalo)
+
+        # Sumas por intervalo (sumas prefijas) y luego por día de la semana
+        # con una matriz indicadora
+        dia_semana = np.array([f.weekday() for f in cubo['fechas']])
+        fecha_dia = (np.arange(7)[:, None] == dia_semana[None, :]).astype(np.float64)
+
+        suma = fecha_dia @ tramos['suma_adherencia']
+        cantidad = fecha_dia @ tramos['minutos_programados']
+        return {
+            'dias_semana': DIAS_SEMANA,
+            'horas': tramos['etiquetas'],
+            'adherencia': CuboAdherencia._promedio(suma, cantidad),
+        }
+
+    @staticmethod
+    def serie_diaria(cubo, dia_semana=None, desde_min=None, hasta_min=None):
+        """
+        Adherencia de cada fecha, opcionalmente solo de un día de la semana y
+        de los minutos [desde_min, hasta_min) (p. ej. los lunes de 10 a 11)
+        """
+        inicio_min = cubo['inicio_min']
+        columnas = slice(
+            None if desde_min is None else max(desde_min - inicio_min, 0),
+            None if hasta_min is None else max(hasta_min - inicio_min, 0),
+        )
+        adherencia = cubo['adherencia'][:, columnas]
+        programados = cubo['programados'][:, columnas]
+        con_programacion = ~np.isnan(adherencia)
+        promedios = CuboAdherencia._promedio(
+            np.nan_to_num(adherencia).sum(axis=1), con_programacion.sum(axis=1)
+        )[0]
+
+        return [
+            {
+                'fecha': fecha.strftime('%Y-%m-%d'),
+                'dia_semana': DIAS_SEMANA[fecha.weekday()],
+                'adherencia': promedio,
+                'minutos_programados': int(programados[i].sum()),
+            }
+            for i, (fecha, promedio) in enumerate(zip(cubo['fechas'], promedios))
+            if promedio is not None and (dia_semana is None or fecha.weekday() == dia_semana)
+        ]
+
+    @staticmethod
+    def peores_dias(cubo, k=5):
+        return heapq.nsmallest(k, CuboAdherencia.serie_diaria(cubo), key=lambda d: d['adherencia'])
@@ -0,0 +1,290 @@
+# dashboard/archivo.py
+"""
+Archivo columnar de RegistroActividad por meses cerrados.
+
+Cada mes archivado vive en su propio directorio (``AAAA-MM``) con un archivo
+``.npy`` por columna y un ``meta.json``. Los arrays se abren con
+``mmap_mode='r'`` para que los cálculos históricos lean solo las páginas que
+necesitan en lugar de instanciar millones de objetos del ORM.
+
+El archivo guarda el id de cada fila y ``meta.json`` el mayor id archivado
+(``ultimo_id``): las filas de la base ya archivadas y todavía no borradas se
+descartan al fusionar y al leer (``sin_archivadas``), así que un corte entre
+la escritura del archivo y el borrado no duplica nada.
+
+``duracion`` es ``duracion_minutos``, la misma métrica que leen los cálculos
+sobre la base. Archivar no toca ContadorDiario ni las líneas de tiempo: los
+datos del mes no cambian, solo dónde se leen.
+"""
+
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Max, Q
+
+from .models import RegistroActividad
+
+# Código int8 de cada tipo de actividad (posición en TIPO_ACTIVIDAD)
+TIPOS_ACTIVIDAD = [codigo for codigo, _ in RegistroActividad.TIPO_ACTIVIDAD]
+CODIGO_TIPO = {tipo: i for i, tipo in enumerate(TIPOS_ACTIVIDAD)}
+
+TIPOS_PRODUCTIVOS = RegistroActividad.TIPOS_PRODUCTIVOS
+
+COLUMNAS = {
+    'id': np.int64,
+    'agente_id': np.int32,
+    'dia': np.int8,
+    'inicio_min': np.int16,
+    'fin_min': np.int16,
+    'duracion': np.int16,
+    'tipo': np.int8,
+    'llamadas': np.int16,
+    'conversacion': np.int16,
+}
+
+
+class ArchivoActividad:
+    """
+    Lectura y escritura del archivo columnar de actividades
+    """
+
+    @staticmethod
+    def directorio():
+        return Path(getattr(settings, 'ADHERENCIA_ARCHIVO_DIR',
+                            Path(settings.BASE_DIR) / 'archivo'))
+
+    @staticmethod
+    def ruta_mes(anio, mes):
+        return ArchivoActividad.directorio() / f"{anio:04d}-{mes:02d}"
+
+    @staticmethod
+    def meses_archivados():
+        """Lista ordenada de (año, mes) con archivo completo"""
+        base = ArchivoActividad.directorio()
+        if not base.is_dir():
+            return []
+
+        meses = []
+        for ruta in base.iterdir():
+            if (ruta / 'meta.json').exists():
+                anio, mes = ruta.name.split('-')
+                meses.append((int(anio), int(mes)))
+        return sorted(meses)
+
+    @staticmethod
+    def meses_en_rango(fecha_inicio, fecha_fin):
+        """Meses archivados que intersectan [fecha_inicio, fecha_fin]"""
+        desde = (fecha_inicio.year, fecha_inicio.month)
+        hasta = (fecha_fin.year, fecha_fin.month)
+        return [m for m in ArchivoActividad.meses_archivados() if desde <= m <= hasta]
+
+    @staticmethod
+    def ultimos_ids(fecha_inicio, fecha_fin):
+        """{(año, mes): mayor id archivado} de los meses del rango"""
+        ultimos = {}
+        for anio, mes in ArchivoActividad.meses_en_rango(fecha_inicio, fecha_fin):
+            with open(ArchivoActividad.ruta_mes(anio, mes) / 'meta.json', encoding='utf-8') as f:
+                ultimo_id = json.load(f).get('ultimo_id')
+            if ultimo_id:
+                ultimos[(anio, mes)] = ultimo_id
+        return ultimos
+
+    @staticmethod
+    def sin_archivadas(queryset, fecha_inicio, fecha_fin):
+        """
+        Excluye de un queryset de RegistroActividad las filas que ya están en
+        el archivo (archivadas pero aún no borradas de la base)
+        """
+        archivadas = Q()
+        for (anio, mes), ultimo_id in ArchivoActividad.ultimos_ids(fecha_inicio, fecha_fin).items():
+            primer_dia = date(anio, mes, 1)
+            siguiente = (primer_dia + timedelta(days=32)).replace(day=1)
+            archivadas |= Q(fecha__gte=primer_dia, fecha__lt=siguiente, id__lte=ultimo_id)
+        return queryset.exclude(archivadas) if archivadas else queryset
+
+    @staticmethod
+    def cargar_mes(anio, mes):
+        """
+        Abre las columnas de un mes como arrays memory-mapped.
+        Devuelve None si el mes no está archivado.
+        """
+        ruta = ArchivoActividad.ruta_mes(anio, mes)
+        if not (ruta / 'meta.json').exists():
+            return None
+
+        columnas = {
+            columna: np.load(ruta / f"{columna}.npy", mmap_mode='r')
+            for columna in COLUMNAS if (ruta / f"{columna}.npy").exists()
+        }
+        if 'id' not in columnas:
+            # Meses archivados antes de guardar el id: id 0 (sin deduplicar)
+            columnas['id'] = np.zeros(len(columnas['agente_id']), dtype=np.int64)
+        if 'duracion' not in columnas:
+            # Meses archivados antes de guardar duracion_minutos
+            columnas['duracion'] = (columnas['fin_min'] - columnas['inicio_min']).astype(np.int16)
+
+        # Si TIPO_ACTIVIDAD cambió desde que se archivó el mes, se recodifica
+        with open(ruta / 'meta.json', encoding='utf-8') as f:
+            tipos_archivo = json.load(f)['tipos']
+        if tipos_archivo != TIPOS_ACTIVIDAD:
+            recodificar = np.array([CODIGO_TIPO.get(t, -1) for t in tipos_archivo], dtype=np.int8)
+            columnas['tipo'] = recodificar[columnas['tipo']]
+        return columnas
+
+    @staticmethod
+    def seleccionar(fecha_inicio, fecha_fin, agente_ids=None, tipos=None):
+        """
+        Filas archivadas del rango como dict de arrays (copias pequeñas).
+        Agrega la columna ``fecha`` (datetime64[D]).
+        """
+        codigos = None
+        if tipos is not None:
+            codigos = np.array([CODIGO_TIPO[t] for t in tipos], dtype=np.int8)
+        if agente_ids is not None:
+            agente_ids = np.asarray(list(agente_ids), dtype=np.int32)
+
+        partes = []
+        for anio, mes in ArchivoActividad.meses_en_rango(fecha_inicio, fecha_fin):
+            columnas = ArchivoActividad.cargar_mes(anio, mes)
+            primer_dia = date(anio, mes, 1)
+            dia_min = max((fecha_inicio - primer_dia).days + 1, 1)
+            dia_max = min((fecha_fin - primer_dia).days + 1, 31)
+
+            mascara = (columnas['dia'] >= dia_min) & (columnas['dia'] <= dia_max)
+            if codigos is not None:
+                mascara &= np.isin(columnas['tipo'], codigos)
+            if agente_ids is not None:
+                mascara &= np.isin(columnas['agente_id'], agente_ids)
+
+            indices = np.flatnonzero(mascara)
+            if not len(indices):
+                continue
+
+            parte = {columna: np.asarray(columnas[columna][indices]) for columna in COLUMNAS}
+            parte['fecha'] = (np.datetime64(primer_dia, 'D')
+                              + (parte['dia'].astype(np.int32) - 1))
+            partes.append(parte)
+
+        if not partes:
+            vacio = {columna: np.empty(0, dtype=tipo) for columna, tipo in COLUMNAS.items()}
+            vacio['fecha'] = np.empty(0, dtype='datetime64[D]')
+            return vacio
+
+        return {columna: np.concatenate([p[columna] for p in partes]) for columna in partes[0]}
+
+    @staticmethod
+    def tiempo_productivo_por_agente(fecha_inicio, fecha_fin, agente_ids=None):
+        """Minutos productivos archivados por agente: {agente_id: minutos}"""
+        filas = ArchivoActividad.seleccionar(
+            fecha_inicio, fecha_fin, agente_ids=agente_ids, tipos=TIPOS_PRODUCTIVOS
+        )
+        if not len(filas['agente_id']):
+            return {}
+
+        agentes, posiciones = np.unique(filas['agente_id'], return_inverse=True)
+        totales = np.bincount(posiciones, weights=filas['duracion'])
+        return {int(a): int(t) for a, t in zip(agentes, totales)}
+
+    @staticmethod
+    def archivar_mes(anio, mes, lote=50000):
+        """
+        Mueve las actividades de un mes cerrado al archivo columnar.
+        Si el mes ya estaba archivado, las filas nuevas se fusionan con las
+        existentes. Devuelve el número de filas movidas desde la base de datos.
+        """
+        primer_dia = date(anio, mes, 1)
+        siguiente = (primer_dia + timedelta(days=32)).replace(day=1)
+        if siguiente > date.today().replace(day=1):
+            raise ValueError(f"El mes {anio:04d}-{mes:02d} aún no está cerrado")
+
+        queryset = RegistroActividad.objects.filter(fecha__gte=primer_dia, fecha__lt=siguiente)
+        # Fijar el último id evita borrar filas que lleguen durante el volcado
+        ultimo_id = queryset.aggregate(ultimo=Max('id'))['ultimo']
+        if ultimo_id is None:
+            return 0
+        queryset = queryset.filter(id__lte=ultimo_id)
+        total = queryset.count()
+
+        columnas = {columna: np.empty(total, dtype=tipo) for columna, tipo in COLUMNAS.items()}
+        filas = queryset.order_by('fecha', 'agente_id', 'inicio_min').values_list(
+            'id', 'agente_id', 'fecha', 'inicio_min', 'fin_min', 'duracion_minutos',
+            'tipo_actividad', 'llamadas_atendidas', 'tiempo_conversacion'
+        )
+
+        i = 0
+        for id_, agente_id, fecha, inicio_min, fin_min, duracion, tipo, llamadas, conversacion in (
+            filas.iterator(chunk_size=lote)
+        ):
+            columnas['id'][i] = id_
+            columnas['agente_id'][i] = agente_id
+            columnas['dia'][i] = fecha.day
+            columnas['inicio_min'][i] = inicio_min
+            columnas['fin_min'][i] = fin_min
+            columnas['duracion'][i] = duracion
+            columnas['tipo'][i] = CODIGO_TIPO[tipo]
+            columnas['llamadas'][i] = llamadas
+            columnas['conversacion'][i] = conversacion
+            i += 1
+        columnas = {columna: valores[:i] for columna, valores in columnas.items()}
+
+        existentes = ArchivoActividad.cargar_mes(anio, mes)
+        if existentes is not None:
+            columnas = {
+                columna: np.concatenate([np.asarray(existentes[columna]), columnas[columna]])
+                for columna in COLUMNAS
+            }
+            # Filas ya archivadas en una corrida que no llegó a borrarlas
+            _, primeras = np.unique(columnas['id'], return_index=True)
+            conservar = columnas['id'] == 0
+            conservar[primeras] = True
+            orden = np.flatnonzero(conservar)
+            orden = orden[np.lexsort((
+                columnas['inicio_min'][orden], columnas['agente_id'][orden], columnas['dia'][orden]
+            ))]
+            columnas = {columna: valores[orden] for columna, valores in columnas.items()}
+
+        ArchivoActividad._escribir_mes(anio, mes, columnas)
+
+        # Borrado sin MinutosQuerySet.delete: las filas siguen contando en
+        # ContadorDiario y en las líneas de tiempo, ahora desde el archivo
+        with transaction.atomic():
+            movidas, _ = models.QuerySet.delete(queryset)
+        return movidas
+
+    @staticmethod
+    def _escribir_mes(anio, mes, columnas):
+        """Escribe en un directorio temporal y lo reemplaza de forma atómica"""
+        destino = ArchivoActividad.ruta_mes(anio, mes)
+        temporal = destino.with_name(destino.name + '.tmp')
+        if temporal.exists():
+            shutil.rmtree(temporal)
+        temporal.mkdir(parents=True)
+
+        for columna, valores in columnas.items():
+            np.save(temporal / f"{columna}.npy", np.ascontiguousarray(valores, dtype=COLUMNAS[columna]))
+
+        meta = {
+            'anio': anio,
+            'mes': mes,
+            'filas': int(len(columnas['agente_id'])),
+            'ultimo_id': int(columnas['id'].max(initial=0)),
+            'tipos': TIPOS_ACTIVIDAD,
+            'columnas': {columna: np.dtype(tipo).name for columna, tipo in COLUMNAS.items()},
+            'archivado_en': datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(temporal / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+        if destino.exists():
+            anterior = destino.with_name(destino.name + '.old')
+            os.replace(destino, anterior)
+            os.replace(temporal, destino)
+            shutil.rmtree(anterior)
+        else:
+            os.replace(temporal, destino)
@@ -0,0 +1,102 @@
+# dashboard/columnas.py
+"""
+Formato columnar para las APIs de gráficos.
+
+En lugar de una lista de objetos que repiten las claves en cada fila, la
+respuesta lleva un índice compartido y un array por columna:
+
+    {"formato": "columnas", "indice": [...], "columnas": {"ft": [...], ...}}
+
+Con ``delta=1`` el índice (fechas YYYY-MM-DD, horas HH:MM o números) se
+codifica como inicio + diferencias, o inicio + paso si todas son iguales. Se
+pide con ``?formato=columnas`` o con el Accept ``TIPO_COLUMNAS``; sin eso las
+APIs siguen devolviendo filas. El tamaño final lo reduce GZipMiddleware.
+"""
+
+from datetime import date
+
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+
+TIPO_COLUMNAS = 'application/vnd.adherencia.columnas+json'
+MINUTOS_DIA = 24 * 60
+
+
+def _tipo_indice(valor):
+    if isinstance(valor, str) and len(valor) == 10 and valor[4] == '-':
+        return 'fecha'
+    if isinstance(valor, str) and len(valor) == 5 and valor[2] == ':':
+        return 'hora'
+    return 'numero'
+
+
+def _a_numero(valor, tipo):
+    if tipo == 'fecha':
+        return date.fromisoformat(valor).toordinal()
+    if tipo == 'hora':
+        return int(valor[:2]) * 60 + int(valor[3:])
+    return valor
+
+
+class RespuestaColumnar:
+    """
+    Negociación y armado de respuestas en filas o en columnas
+    """
+
+    @staticmethod
+    def solicitada(request):
+        """¿Pidió el cliente el formato columnar (parámetro o Accept)?"""
+        if request.GET.get('formato') == 'columnas':
+            return True
+        return TIPO_COLUMNAS in request.headers.get('Accept', '')
+
+    @staticmethod
+    def codificar_indice(valores):
+        """
+        Índice como inicio + diferencias (en días, minutos o unidades). Las
+        horas son circulares: tras 23:00 viene 00:00 con diferencia 60.
+        """
+        if not valores:
+            return {'tipo': 'numero', 'inicio': None, 'n': 0, 'deltas': []}
+        tipo = _tipo_indice(valores[0])
+        numeros = [_a_numero(v, tipo) for v in valores]
+        deltas = [b - a for a, b in zip(numeros, numeros[1:])]
+        if tipo == 'hora':
+            deltas = [d % MINUTOS_DIA for d in deltas]
+
+        codificado = {'tipo': tipo, 'inicio': valores[0], 'n': len(valores)}
+        if deltas and all(d == deltas[0] for d in deltas):
+            codificado['paso'] = deltas[0]
+        else:
+            codificado['deltas'] = deltas
+        return codificado
+
+    @staticmethod
+    def columnas(filas, indice, delta=False):
+        """Convierte una lista de dicts en índice + un array por columna"""
+        valores = [fila[indice] for fila in filas]
+        nombres = [nombre for nombre in (filas[0] if filas else {}) if nombre != indice]
+        return {
+            'formato': 'columnas',
+            'nombre_indice': indice,
+            'indice': RespuestaColumnar.codificar_indice(valores) if delta else valores,
+            'columnas': {nombre: [fila[nombre] for fila in filas] for nombre in nombres},
+        }
+
+    @staticmethod
+    def responder(request, filas, indice, clave='datos', extra=None):
+        """
+        JsonResponse con `filas` bajo `clave` o, si el cliente lo pidió, en
+        formato columnar (con `delta=1`, índice codificado)
+        """
+        datos = dict(extra or {})
+        columnar = RespuestaColumnar.solicitada(request)
+        if columnar:
+            datos.update(RespuestaColumnar.columnas(
+                filas, indice, delta=request.GET.get('delta') in ('1', 'true')
+            ))
+        else:
+            datos[clave] = filas
+        respuesta = JsonResponse(datos)
+        patch_vary_headers(respuesta, ['Accept'])
+        return respuesta
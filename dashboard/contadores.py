@@ -0,0 +1,82 @@
+# dashboard/contadores.py
+"""
+Contadores diarios de programas y actividades.
+
+ContadorDiario guarda por fecha los totales que antes se recalculaban con
+COUNT/SUM/DISTINCT en cada página (llamadas, agentes activos, minutos de
+conversación, programas...). Las escrituras los mantienen con UPDATE ... SET
+campo = campo + n (ver ``contar`` en models.py), así que leer las
+estadísticas del día es una lectura por clave primaria. ``recalcular``
+los rehace desde las tablas (p. ej. al instalar o tras cargas por SQL).
+"""
+
+from django.db import transaction
+
+from .models import AgenteActivoDia, ContadorDiario, ProgramaDiario, RegistroActividad
+
+CAMPOS = [campo.name for campo in ContadorDiario._meta.concrete_fields if not campo.primary_key]
+
+
+class ContadoresDiarios:
+    """
+    Lectura y recálculo de los contadores diarios
+    """
+
+    @staticmethod
+    def dias(*fechas):
+        """Contadores de `fechas` en una consulta; los días sin datos, en cero"""
+        guardados = ContadorDiario.objects.in_bulk(fechas)
+        return {fecha: guardados.get(fecha) or ContadorDiario(fecha=fecha) for fecha in fechas}
+
+    @staticmethod
+    def del_dia(fecha):
+        return ContadoresDiarios.dias(fecha)[fecha]
+
+    @staticmethod
+    def recalcular_dias(fechas):
+        """Rehace los contadores de `fechas` sueltas con un recálculo del rango que las cubre"""
+        if fechas:
+            ContadoresDiarios.recalcular(min(fechas), max(fechas))
+
+    @staticmethod
+    def recalcular(fecha_inicio, fecha_fin):
+        """Rehace los contadores y agentes activos del rango; devuelve los días con datos"""
+        with transaction.atomic():
+            # Se bloquean los contadores antes de leer: las escrituras (que
+            # suman con F() en su misma transacción) esperan a este commit y
+            # suman sobre los valores recalculados
+            existentes = set(ContadorDiario.objects.select_for_update().filter(
+                fecha__range=[fecha_inicio, fecha_fin]
+            ).values_list('fecha', flat=True))
+
+            dias = {}
+            for modelo in (ProgramaDiario, RegistroActividad):
+                for fila in modelo.objects.filter(fecha__range=[fecha_inicio, fecha_fin]).order_by().values(
+                    'fecha'
+                ).annotate(**modelo.agregados_contador()):
+                    dias.setdefault(fila.pop('fecha'), {}).update(fila)
+
+            pares = RegistroActividad.objects.filter(
+                fecha__range=[fecha_inicio, fecha_fin]
+            ).order_by().values_list('agente_id', 'fecha').distinct()
+            activos = {}
+            presencias = []
+            for agente_id, fecha in pares:
+                activos[fecha] = activos.get(fecha, 0) + 1
+                presencias.append(AgenteActivoDia(agente_id=agente_id, fecha=fecha))
+
+            # Los días existentes se actualizan en su lugar (en cero si ya no
+            # tienen datos) para que los UPDATE en espera encuentren la fila
+            contadores = [
+                ContadorDiario(fecha=fecha, agentes_activos=activos.get(fecha, 0), **dias.get(fecha, {}))
+                for fecha in existentes | set(dias)
+            ]
+            ContadorDiario.objects.bulk_update(
+                [contador for contador in contadores if contador.fecha in existentes], CAMPOS, batch_size=1000
+            )
+            ContadorDiario.objects.bulk_create(
+                [contador for contador in contadores if contador.fecha not in existentes]
+            )
+            AgenteActivoDia.objects.filter(fecha__range=[fecha_inicio, fecha_fin]).delete()
+            AgenteActivoDia.objects.bulk_create(presencias, batch_size=5000)
+        return len(dias)
@@ -2,16 +2,39 @@
 
 from django.utils import timezone
 from django.conf import settings  # ✅ ¡IMPORTANTE! Agregar esta línea
+from django.core.cache import cache
 from datetime import date, timedelta
 from django.db.models import Count, Sum, Avg, Q
 from .models import Agente, KPIMeta, ProgramaDiario, RegistroActividad
+from .fragmentos import VersionDatos
+from .instantanea import InstantaneaDashboard
 from .utils import CalculadorAdherencia
 
 def kpi_data(request):
     """
     Context processor para datos generales del dashboard
-    Se ejecuta automáticamente en todas las vistas
+    Se ejecuta automáticamente en todas las vistas; los datos quedan en caché
+    por versión de los datos (ver fragmentos.py), así que no consulta la base
+    en cada página
     """
+    autenticado = request.user.is_authenticated
+    clave = f"adherencia:kpi_data:v{VersionDatos.vigente()}:{date.today().isoformat()}:{int(autenticado)}"
+    context = cache.get(clave)
+    if context is None:
+        context = _calcular_kpi_data(InstantaneaDashboard.de(request), autenticado)
+        if context['estado_sistema'] != 'error':
+            cache.set(clave, context, getattr(settings, 'ADHERENCIA_FRAGMENTOS_SEGUNDOS', 300))
+
+    # 5. Información del entorno - ¡CORREGIDO!
+    context['entorno'] = {
+        'modo': 'desarrollo' if settings.DEBUG else 'producción',  # ✅ Ahora funciona
+        'version': '1.0.0',
+        'ultima_actualizacion': timezone.now()
+    }
+    return context
+
+
+def _calcular_kpi_data(instantanea, autenticado):
     # Inicializamos con valores por defecto
     context = {
         'hoy': date.today(),
@@ -25,53 +48,22 @@ def kpi_data(request):
     # Solo procesar si la base de datos está lista
     # (evita errores durante migraciones iniciales)
     try:
-        # 1. Estadísticas básicas de agentes
-        agentes_activos = Agente.objects.filter(activo=True)
-        context['total_agentes'] = agentes_activos.count()
-        context['agentes_ft'] = agentes_activos.filter(tipo_contrato='FT').count()
-        context['agentes_pt'] = agentes_activos.filter(tipo_contrato='PT').count()
+        # 1. Estadísticas básicas de agentes (un agregado, compartido con la vista)
+        context['total_agentes'] = instantanea.agentes['activos']
+        context['agentes_ft'] = instantanea.agentes['ft']
+        context['agentes_pt'] = instantanea.agentes['pt']
         
         # 2. Obtener KPI meta activo
-        context['kpi_meta'] = KPIMeta.objects.filter(activo=True).first()
+        context['kpi_meta'] = instantanea.kpi_meta
         
-        # 3. Verificar si hay datos en el sistema
-        hoy = date.today()
-        tiene_programacion_hoy = ProgramaDiario.objects.filter(fecha=hoy).exists()
-        tiene_actividades_hoy = RegistroActividad.objects.filter(fecha=hoy).exists()
-        
-        if tiene_programacion_hoy and tiene_actividades_hoy:
-            context['estado_sistema'] = 'activo'
-        elif tiene_programacion_hoy:
-            context['estado_sistema'] = 'parcial'
-        else:
-            context['estado_sistema'] = 'inactivo'
+        # 3. Verificar si hay datos en el sistema (contadores del día)
+        context['estado_sistema'] = instantanea.estado_sistema
         
         # 4. Datos para el header/navbar (si el usuario está autenticado)
-        if request.user.is_authenticated:
+        if autenticado:
             # Calcular adherencia del día actual rápidamente
             fecha_hoy = date.today()
-            
-            # Solo calcular si hay datos suficientes
-            if tiene_actividades_hoy:
-                # Obtener agentes programados hoy
-                agentes_programados_hoy = ProgramaDiario.objects.filter(
-                    fecha=fecha_hoy
-                ).values('agente').distinct().count()
-                
-                # Actividades productivas hoy
-                actividades_productivas = RegistroActividad.objects.filter(
-                    fecha=fecha_hoy,
-                    tipo_actividad__in=['LLAMADA', 'DISPO', 'CAPAC']
-                ).count()
-                
-                if agentes_programados_hoy > 0:
-                    context['adherencia_hoy_quick'] = round(
-                        (actividades_productivas / agentes_programados_hoy) * 100, 1
-                    )
-                else:
-                    context['adherencia_hoy_quick'] = 0
-            else:
-                context['adherencia_hoy_quick'] = 0
+            context['adherencia_hoy_quick'] = instantanea.adherencia_rapida
             
             # Agregar indicador de alertas (simulado)
             context['alertas_pendientes'] = {
@@ -97,13 +89,6 @@ def kpi_data(request):
                 'theme': 'light'  # o 'dark'
             }
         
-        # 5. Información del entorno - ¡CORREGIDO!
-        context['entorno'] = {
-            'modo': 'desarrollo' if settings.DEBUG else 'producción',  # ✅ Ahora funciona
-            'version': '1.0.0',
-            'ultima_actualizacion': timezone.now()
-        }
-        
     except Exception as e:
         # En caso de error (ej. tablas no creadas aún), usar valores por defecto
         print(f"⚠️ Error en context processor: {e}")
@@ -168,60 +153,10 @@ def estadisticas_globales(request):
     context = {}
     
     try:
-        hoy = date.today()
-        semana_pasada = hoy - timedelta(days=7)
-        
-        # 1. Total de llamadas hoy
-        llamadas_hoy = RegistroActividad.objects.filter(
-            fecha=hoy,
-            tipo_actividad='LLAMADA'
-        ).count()
-        
-        # 2. Agentes activos hoy (con al menos una actividad)
-        agentes_activos_hoy = RegistroActividad.objects.filter(
-            fecha=hoy
-        ).values('agente').distinct().count()
-        
-        # 3. Tiempo promedio de llamada
-        tiempo_llamadas = RegistroActividad.objects.filter(
-            fecha=hoy,
-            tipo_actividad='LLAMADA',
-            tiempo_conversacion__gt=0
-        ).aggregate(
-            promedio=Avg('tiempo_conversacion'),
-            total=Sum('tiempo_conversacion')
-        )
-        
-        # 4. Comparación con ayer
-        ayer = hoy - timedelta(days=1)
-        llamadas_ayer = RegistroActividad.objects.filter(
-            fecha=ayer,
-            tipo_actividad='LLAMADA'
-        ).count()
-        
-        variacion_llamadas = 0
-        if llamadas_ayer > 0:
-            variacion_llamadas = round(((llamadas_hoy - llamadas_ayer) / llamadas_ayer) * 100, 1)
-        
-        context['estadisticas_hoy'] = {
-            'llamadas_atendidas': llamadas_hoy,
-            'agentes_activos': agentes_activos_hoy,
-            'tiempo_promedio_llamada': round(tiempo_llamadas['promedio'] or 0, 1),
-            'tiempo_total_conversacion': tiempo_llamadas['total'] or 0,
-            'variacion_llamadas_vs_ayer': variacion_llamadas,
-            'llamadas_ayer': llamadas_ayer
-        }
-        
-        # 5. Programación para mañana
-        manana = hoy + timedelta(days=1)
-        agentes_programados_manana = ProgramaDiario.objects.filter(
-            fecha=manana
-        ).count()
-        
-        context['programacion_manana'] = {
-            'agentes_programados': agentes_programados_manana,
-            'fecha': manana
-        }
+        # Contadores de ayer, hoy y mañana (una lectura, compartida por petición)
+        instantanea = InstantaneaDashboard.de(request)
+        context['estadisticas_hoy'] = instantanea.estadisticas_hoy
+        context['programacion_manana'] = instantanea.programacion_manana
         
     except Exception as e:
         # En caso de error, retornar estructura vacía
@@ -0,0 +1,119 @@
+# dashboard/cuantiles.py
+"""
+Sketch de cuantiles fusionable (estilo t-digest).
+
+Resume una distribución de adherencias en, como máximo, ~``compresion``
+centroides (media, peso). Dos sketches se fusionan concatenando y
+recomprimiendo sus centroides, así que los percentiles de un rango de fechas
+salen de fusionar los sketches diarios guardados, sin volver a recorrer
+agentes. Serializado ocupa unos pocos KB.
+"""
+
+import numpy as np
+
+
+class SketchCuantiles:
+    """
+    t-digest con función de escala k1 (más resolución en las colas)
+    """
+
+    def __init__(self, compresion=100, medias=None, pesos=None):
+        self.compresion = compresion
+        self.medias = np.asarray(medias if medias is not None else [], dtype=np.float64)
+        self.pesos = np.asarray(pesos if pesos is not None else [], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.medias)
+
+    @property
+    def total(self):
+        return float(self.pesos.sum())
+
+    def agregar(self, valores):
+        """Agrega un lote de valores (cada uno con peso 1)"""
+        valores = np.asarray(valores, dtype=np.float64).ravel()
+        valores = valores[~np.isnan(valores)]
+        if len(valores):
+            self.medias = np.concatenate([self.medias, valores])
+            self.pesos = np.concatenate([self.pesos, np.ones(len(valores))])
+            self._comprimir()
+        return self
+
+    def fusionar(self, otro):
+        """Fusiona otro sketch en este y lo devuelve"""
+        if len(otro):
+            self.medias = np.concatenate([self.medias, otro.medias])
+            self.pesos = np.concatenate([self.pesos, otro.pesos])
+            self._comprimir()
+        return self
+
+    @classmethod
+    def fusionar_todos(cls, sketches, compresion=100):
+        resultado = cls(compresion)
+        sketches = [s for s in sketches if len(s)]
+        if sketches:
+            resultado.medias = np.concatenate([s.medias for s in sketches])
+            resultado.pesos = np.concatenate([s.pesos for s in sketches])
+            resultado._comprimir()
+        return resultado
+
+    def _comprimir(self):
+        if len(self.medias) <= self.compresion:
+            orden = np.argsort(self.medias, kind='stable')
+            self.medias, self.pesos = self.medias[orden], self.pesos[orden]
+            return
+
+        orden = np.argsort(self.medias, kind='stable')
+        medias, pesos = self.medias[orden], self.pesos[orden]
+        total = pesos.sum()
+
+        # Límite k1: k(q) = δ/(2π)·asin(2q-1); un centroide no cruza una unidad de k
+        def k(q):
+            return self.compresion / (2 * np.pi) * np.arcsin(2 * min(max(q, 0.0), 1.0) - 1)
+
+        nuevas_medias, nuevos_pesos = [], []
+        media_actual, peso_actual = medias[0], pesos[0]
+        acumulado = 0.0
+        k_limite = k(0.0) + 1
+
+        for media, peso in zip(medias[1:].tolist(), pesos[1:].tolist()):
+            if k((acumulado + peso_actual + peso) / total) <= k_limite:
+                media_actual += (media - media_actual) * peso / (peso_actual + peso)
+                peso_actual += peso
+            else:
+                nuevas_medias.append(media_actual)
+                nuevos_pesos.append(peso_actual)
+                acumulado += peso_actual
+                k_limite = k(acumulado / total) + 1
+                media_actual, peso_actual = media, peso
+
+        nuevas_medias.append(media_actual)
+        nuevos_pesos.append(peso_actual)
+        self.medias = np.array(nuevas_medias)
+        self.pesos = np.array(nuevos_pesos)
+
+    def cuantil(self, q):
+        """Valor aproximado del cuantil q (0-1); None si el sketch está vacío"""
+        if not len(self.medias):
+            return None
+        if len(self.medias) == 1:
+            return float(self.medias[0])
+
+        # Centro de masa acumulado de cada centroide
+        acumulado = np.cumsum(self.pesos) - self.pesos / 2
+        objetivo = q * self.total
+        return float(np.interp(objetivo, acumulado, self.medias))
+
+    def cuantiles(self, qs):
+        return {q: self.cuantil(q) for q in qs}
+
+    def a_bytes(self):
+        """Serializa como float32 intercalados (media, peso)"""
+        return np.column_stack([self.medias, self.pesos]).astype(np.float32).tobytes()
+
+    @classmethod
+    def desde_bytes(cls, datos, compresion=100):
+        if not datos:
+            return cls(compresion)
+        pares = np.frombuffer(bytes(datos), dtype=np.float32).reshape(-1, 2)
+        return cls(compresion, pares[:, 0], pares[:, 1])
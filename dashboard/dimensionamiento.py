@@ -0,0 +1,188 @@
+# dashboard/dimensionamiento.py
+"""
+Dimensionamiento Erlang C por intervalo.
+
+A partir de las llamadas registradas (``llamadas_atendidas`` y
+``tiempo_conversacion`` de las actividades LLAMADA) se obtiene el volumen y el
+AHT de cada intervalo de cada día, se calculan los agentes que Erlang C exige
+para el nivel de servicio objetivo y se comparan con los agentes programados.
+Todo se resuelve sobre matrices (días × intervalos): la recursión de Erlang B
+avanza un agente a la vez para todas las celdas, así que un mes de intervalos
+de 15 minutos se calcula en milisegundos.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+
+from .cargador import CargadorDatos
+
+MINUTOS_DIA = 24 * 60
+LIMITE_AGENTES_EXTRA = 100
+
+
+def _etiqueta(minuto):
+    return f"{minuto // 60:02d}:{minuto % 60:02d}"
+
+
+def _reparto(fechas, fecha_inicio, inicio_min, fin_min, intervalo, slots, dias):
+    """
+    Índice plano (día, intervalo) y peso de cada tramo de fila: una actividad
+    reparte sus llamadas entre los intervalos que cubre, en proporción a los
+    minutos de cada uno (las que cruzan la medianoche siguen en el día siguiente)
+    """
+    dia = (fechas.to_numpy() - np.datetime64(fecha_inicio, 'D')).astype('timedelta64[D]').astype(np.int64)
+    inicio = dia * MINUTOS_DIA + inicio_min.to_numpy(np.int64)
+    fin = np.maximum(dia * MINUTOS_DIA + fin_min.to_numpy(np.int64), inicio + 1)
+
+    primero = inicio // intervalo
+    tramos = (fin - 1) // intervalo - primero + 1
+    fila = np.repeat(np.arange(len(inicio)), tramos)
+    slot = primero[fila] + np.arange(len(fila)) - np.repeat(np.cumsum(tramos) - tramos, tramos)
+    minutos = np.minimum(fin[fila], (slot + 1) * intervalo) - np.maximum(inicio[fila], slot * intervalo)
+    peso = minutos / (fin - inicio)[fila]
+
+    dentro = (slot >= 0) & (slot < dias * slots)
+    return fila[dentro], slot[dentro], peso[dentro]
+
+
+class Dimensionamiento:
+    """
+    Volumen, AHT, agentes requeridos (Erlang C) y programados por intervalo
+    """
+
+    @staticmethod
+    def nivel_servicio_objetivo():
+        return (
+            getattr(settings, 'ADHERENCIA_NIVEL_SERVICIO', 0.8),
+            getattr(settings, 'ADHERENCIA_TIEMPO_SERVICIO', 20),
+        )
+
+    @staticmethod
+    def agentes_requeridos(trafico, aht, nivel=None, tiempo_objetivo=None):
+        """
+        Mínimo de agentes por celda para atender `nivel` (0-1) de las llamadas
+        antes de `tiempo_objetivo` segundos. `trafico` en Erlangs, `aht` en
+        minutos (mismas dimensiones o escalar).
+        """
+        nivel_defecto, tiempo_defecto = Dimensionamiento.nivel_servicio_objetivo()
+        nivel = nivel_defecto if nivel is None else nivel
+        tiempo_objetivo = tiempo_defecto if tiempo_objetivo is None else tiempo_objetivo
+        if not 0 < nivel < 1 or not tiempo_objetivo > 0:
+            raise ValueError("El nivel debe estar entre 0 y 1 (exclusivo) y el tiempo objetivo ser positivo")
+
+        trafico = np.nan_to_num(np.asarray(trafico, dtype=np.float64), nan=0.0, posinf=0.0)
+        aht = np.broadcast_to(np.asarray(aht, dtype=np.float64), trafico.shape)
+        requeridos = np.zeros(trafico.shape, dtype=np.int32)
+        pendientes = trafico > 0
+        erlang_b = np.ones_like(trafico)
+        espera = tiempo_objetivo / 60  # minutos, igual que el AHT
+
+        # Tope de seguridad: muy por encima de lo que pide cualquier celda real
+        tope = int(trafico.max(initial=0) * 2) + LIMITE_AGENTES_EXTRA
+        n = 0
+        while pendientes.any() and n < tope:
+            n += 1
+            erlang_b = trafico * erlang_b / (n + trafico * erlang_b)
+            candidatas = pendientes & (n > trafico)
+            if not candidatas.any():
+                continue
+            with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+                prob_espera = n * erlang_b / (n - trafico * (1 - erlang_b))
+                servicio = 1 - prob_espera * np.exp(-(n - trafico) * espera / aht)
+            cumplen = candidatas & (servicio >= nivel)
+            requeridos[cumplen] = n
+            pendientes &= ~cumplen
+        requeridos[pendientes] = tope
+        return requeridos
+
+    @staticmethod
+    def demanda(fecha_inicio, fecha_fin, intervalo=15, agente_ids=None):
+        """
+        Matrices (días × intervalos) de llamadas y minutos de conversación.
+        Se carga también el día anterior por las llamadas que cruzan la
+        medianoche hacia el primer día.
+        """
+        dias = (fecha_fin - fecha_inicio).days + 1
+        slots = MINUTOS_DIA // intervalo
+        llamadas = CargadorDatos.cargar_actividades(
+            fecha_inicio - timedelta(days=1), fecha_fin, tipos=['LLAMADA'], agente_ids=agente_ids
+        )
+        fila, indice, peso = _reparto(
+            llamadas['fecha'], fecha_inicio, llamadas['inicio_min'], llamadas['fin_min'],
+            intervalo, slots, dias
+        )
+
+        def matriz(columna):
+            return np.bincount(
+                indice, weights=llamadas[columna].to_numpy(np.float64)[fila] * peso, minlength=dias * slots
+            ).reshape(dias, slots)
+
+        return matriz('llamadas'), matriz('conversacion')
+
+    @staticmethod
+    def programados(fecha_inicio, fecha_fin, intervalo=15, agente_ids=None):
+        """
+        Agentes programados promedio en cada intervalo (días × intervalos).
+        Los turnos que cruzan la medianoche siguen en el día siguiente, como
+        las llamadas en demanda (incluidos los del día anterior al rango).
+        """
+        dias = (fecha_fin - fecha_inicio).days + 1
+        slots = MINUTOS_DIA // intervalo
+        programas = CargadorDatos.cargar_programas(
+            fecha_inicio - timedelta(days=1), fecha_fin, agente_ids=agente_ids
+        )
+
+        # Diferencias por minuto absoluto del rango (+1 al entrar, -1 al
+        # salir) y suma acumulada
+        total = dias * MINUTOS_DIA
+        diferencias = np.zeros(total + 1, dtype=np.int32)
+        if len(programas):
+            dia = (programas['fecha'].to_numpy() - np.datetime64(fecha_inicio, 'D')).astype(
+                'timedelta64[D]').astype(np.int64)
+            inicio = np.clip(dia * MINUTOS_DIA + programas['inicio_min'].to_numpy(np.int64), 0, total)
+            fin = np.clip(dia * MINUTOS_DIA + programas['fin_min'].to_numpy(np.int64), 0, total)
+            np.add.at(diferencias, inicio, 1)
+            np.add.at(diferencias, fin, -1)
+        por_minuto = np.cumsum(diferencias[:total])
+        return por_minuto.reshape(dias, slots, intervalo).mean(axis=2)
+
+    @staticmethod
+    def comparar(fecha_inicio, fecha_fin, intervalo=15, nivel=None, tiempo_objetivo=None,
+                 agente_ids=None):
+        """
+        Requeridos vs. programados por día e intervalo. Devuelve matrices
+        NumPy y un resumen con los intervalos con déficit.
+        """
+        if MINUTOS_DIA % intervalo:
+            raise ValueError("El intervalo debe dividir el día (p. ej. 15, 30 o 60)")
+
+        llamadas, conversacion = Dimensionamiento.demanda(
+            fecha_inicio, fecha_fin, intervalo, agente_ids
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aht = np.where(llamadas > 0, conversacion / llamadas, 0.0)
+        trafico = llamadas * aht / intervalo
+        requeridos = Dimensionamiento.agentes_requeridos(trafico, aht, nivel, tiempo_objetivo)
+        programados = Dimensionamiento.programados(fecha_inicio, fecha_fin, intervalo, agente_ids)
+        brecha = programados - requeridos
+
+        deficit = np.clip(-brecha, 0, None)
+        exceso = np.clip(brecha, 0, None)
+        return {
+            'fechas': [fecha_inicio + timedelta(days=i) for i in range(llamadas.shape[0])],
+            'intervalos': [_etiqueta(m) for m in range(0, MINUTOS_DIA, intervalo)],
+            'llamadas': llamadas,
+            'aht': aht,
+            'trafico': trafico,
+            'requeridos': requeridos,
+            'programados': programados,
+            'brecha': brecha,
+            'resumen': {
+                'intervalos_con_demanda': int((requeridos > 0).sum()),
+                'intervalos_con_deficit': int((deficit > 0.5).sum()),
+                'horas_agente_faltantes': round(float(deficit.sum()) * intervalo / 60, 1),
+                'horas_agente_sobrantes': round(float(exceso[requeridos > 0].sum()) * intervalo / 60, 1),
+            },
+        }
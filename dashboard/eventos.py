@@ -0,0 +1,88 @@
+# dashboard/eventos.py
+"""
+Lectura paginada de los eventos crudos de RegistroActividad.
+
+Las páginas siguen el orden (fecha, hora_inicio, id) y cada una arranca
+después de la última fila de la anterior (paginación por clave, sin OFFSET):
+el cursor es esa clave codificada y la consulta usa el índice
+``registro_keyset_idx`` (o ``registro_agente_keyset_idx`` al filtrar por
+agente), así que la página 100.000 cuesta lo mismo que la primera.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+
+from django.db.models import Q
+
+from .models import RegistroActividad
+
+CAMPOS = (
+    'id', 'fecha', 'hora_inicio', 'hora_fin', 'tipo_actividad', 'duracion_minutos',
+    'llamadas_atendidas', 'tiempo_conversacion', 'agente__codigo',
+)
+LIMITE_MAXIMO = 5000
+
+
+class EventosActividad:
+    """
+    Páginas de actividades en orden (fecha, hora_inicio, id)
+    """
+
+    @staticmethod
+    def codificar_cursor(actividad):
+        """Cursor opaco con la clave de la última actividad de la página"""
+        clave = [actividad.fecha.isoformat(), actividad.hora_inicio.isoformat(), actividad.id]
+        return base64.urlsafe_b64encode(json.dumps(clave).encode()).decode()
+
+    @staticmethod
+    def decodificar_cursor(cursor):
+        """(fecha, hora_inicio, id) del cursor; ValueError si no es válido"""
+        try:
+            fecha, hora_inicio, actividad_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return date.fromisoformat(fecha), datetime.fromisoformat(hora_inicio), int(actividad_id)
+        except (TypeError, json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ValueError(f"Cursor inválido: {cursor}") from e
+
+    @staticmethod
+    def pagina(cursor=None, limite=1000, agente_ids=None, tipos=None,
+               fecha_inicio=None, fecha_fin=None):
+        """
+        Hasta `limite` actividades después de `cursor` y el cursor de la
+        página siguiente (None si no hay más)
+        """
+        actividades = RegistroActividad.objects.select_related('agente').only(*CAMPOS)
+        if agente_ids:
+            actividades = actividades.filter(agente_id__in=agente_ids)
+        if tipos:
+            actividades = actividades.filter(tipo_actividad__in=tipos)
+        if fecha_inicio:
+            actividades = actividades.filter(fecha__gte=fecha_inicio)
+        if fecha_fin:
+            actividades = actividades.filter(fecha__lte=fecha_fin)
+        if cursor:
+            fecha, hora_inicio, actividad_id = EventosActividad.decodificar_cursor(cursor)
+            actividades = actividades.filter(
+                Q(fecha__gt=fecha)
+                | Q(fecha=fecha, hora_inicio__gt=hora_inicio)
+                | Q(fecha=fecha, hora_inicio=hora_inicio, id__gt=actividad_id)
+            )
+
+        # Una fila de más dice si hay página siguiente sin contar
+        filas = list(actividades.order_by('fecha', 'hora_inicio', 'id')[:limite + 1])
+        siguiente = EventosActividad.codificar_cursor(filas[limite - 1]) if len(filas) > limite else None
+        return filas[:limite], siguiente
+
+    @staticmethod
+    def serializar(actividad):
+        return {
+            'id': actividad.id,
+            'agente': actividad.agente.codigo,
+            'fecha': actividad.fecha.isoformat(),
+            'hora_inicio': actividad.hora_inicio.isoformat(),
+            'hora_fin': actividad.hora_fin.isoformat(),
+            'tipo': actividad.tipo_actividad,
+            'duracion_minutos': actividad.duracion_minutos,
+            'llamadas_atendidas': actividad.llamadas_atendidas,
+            'tiempo_conversacion': actividad.tiempo_conversacion,
+        }
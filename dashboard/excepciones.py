@@ -0,0 +1,185 @@
+# dashboard/excepciones.py
+"""
+Excepciones de adherencia por agente-día.
+
+Para cada día se arman las máscaras minuto a minuto (agentes × 1440) de
+programación, de actividad productiva y de cualquier actividad con estado, se
+codifica cada minuto (en adherencia, ausente, trabajo sin programar o estado
+incorrecto) y la matriz completa se comprime por rachas (run-length) en una
+sola pasada vectorizada. Cada racha es un tramo (agente, fecha, tipo, inicio,
+fin) que se guarda en ExcepcionAdherencia.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+
+from .analizador import MINUTOS_DIA, filas_por_dia, mascaras_agentes
+from .archivo import TIPOS_PRODUCTIVOS
+from .cargador import CargadorDatos
+from .models import Agente, ExcepcionAdherencia
+
+# Código de cada minuto; 0 = en adherencia
+TIPOS_EXCEPCION = [codigo for codigo, _ in ExcepcionAdherencia.TIPO_EXCEPCION]
+AUSENTE, SIN_PROGRAMAR, ESTADO = 1, 2, 3
+
+
+def segmentos(codigos):
+    """
+    Rachas de códigos distintos de 0 en cada fila de una matriz (filas ×
+    minutos): arrays (fila, inicio, fin, codigo) con fin exclusivo
+    """
+    filas, minutos = codigos.shape
+    # Una columna de ceros al final de cada fila: ninguna racha cruza filas
+    plano = np.zeros((filas, minutos + 1), dtype=np.int8)
+    plano[:, :minutos] = codigos
+    plano = plano.ravel()
+
+    inicios = np.flatnonzero(np.diff(plano, prepend=0) != 0)
+    fines = np.append(inicios[1:], len(plano))
+    con_excepcion = plano[inicios] != 0
+    inicios, fines = inicios[con_excepcion], fines[con_excepcion]
+    fila = inicios // (minutos + 1)
+    desplazamiento = fila * (minutos + 1)
+    return fila, inicios - desplazamiento, fines - desplazamiento, plano[inicios]
+
+
+class MotorExcepciones:
+    """
+    Tramos fuera de adherencia de cada agente-día
+    """
+
+    @staticmethod
+    def codigos_dia(programas, actividades):
+        """Agentes y matriz (agentes × minutos del día) de códigos de excepción"""
+        agentes = np.union1d(programas['agente_id'].to_numpy(), actividades['agente_id'].to_numpy())
+        programado = mascaras_agentes(programas, agentes, 0, MINUTOS_DIA)
+        productivo = mascaras_agentes(
+            actividades[actividades['tipo'].isin(TIPOS_PRODUCTIVOS)], agentes, 0, MINUTOS_DIA
+        )
+        # Un registro AUSENTE no es un estado: cuenta como ausencia
+        con_estado = mascaras_agentes(
+            actividades[actividades['tipo'] != 'AUSENTE'], agentes, 0, MINUTOS_DIA
+        )
+
+        codigos = np.zeros(programado.shape, dtype=np.int8)
+        codigos[programado & ~con_estado] = AUSENTE
+        codigos[programado & con_estado & ~productivo] = ESTADO
+        codigos[~programado & productivo] = SIN_PROGRAMAR
+        return agentes, codigos
+
+    @staticmethod
+    def calcular(fecha_inicio, fecha_fin, agente_ids=None):
+        """
+        Tramos del rango en arrays compactos: agente_id, fecha, tipo (índice
+        en TIPOS_EXCEPCION), inicio_min, fin_min. Los turnos que cruzan la
+        medianoche cuentan en el día siguiente desde las 00:00.
+        """
+        dias = (fecha_fin - fecha_inicio).days + 1
+        desde = fecha_inicio - timedelta(days=1)
+        programas, limites_programas = filas_por_dia(
+            CargadorDatos.cargar_programas(desde, fecha_fin, agente_ids=agente_ids), fecha_inicio, dias
+        )
+        actividades, limites_actividades = filas_por_dia(
+            CargadorDatos.cargar_actividades(desde, fecha_fin, agente_ids=agente_ids), fecha_inicio, dias
+        )
+
+        partes = []
+        for d in range(dias):
+            agentes, codigos = MotorExcepciones.codigos_dia(
+                programas.iloc[limites_programas[d]:limites_programas[d + 1]],
+                actividades.iloc[limites_actividades[d]:limites_actividades[d + 1]],
+            )
+            fila, inicio, fin, codigo = segmentos(codigos)
+            partes.append({
+                'agente_id': agentes[fila].astype(np.int32),
+                'fecha': np.full(len(fila), np.datetime64(fecha_inicio + timedelta(days=d), 'D')),
+                'tipo': (codigo - 1).astype(np.int8),
+                'inicio_min': inicio.astype(np.int16),
+                'fin_min': fin.astype(np.int16),
+            })
+
+        return {
+            columna: np.concatenate([parte[columna] for parte in partes])
+            for columna in ('agente_id', 'fecha', 'tipo', 'inicio_min', 'fin_min')
+        }
+
+    @staticmethod
+    def guardar(fecha_inicio, fecha_fin, agente_ids=None):
+        """Recalcula y reemplaza los tramos guardados del rango; devuelve cuántos"""
+        tramos = MotorExcepciones.calcular(fecha_inicio, fecha_fin, agente_ids)
+        excepciones = [
+            ExcepcionAdherencia(
+                agente_id=agente_id,
+                fecha=fecha,
+                tipo=TIPOS_EXCEPCION[tipo],
+                inicio_min=inicio,
+                fin_min=fin,
+                minutos=fin - inicio,
+            )
+            for agente_id, fecha, tipo, inicio, fin in zip(
+                tramos['agente_id'].tolist(), tramos['fecha'].tolist(), tramos['tipo'].tolist(),
+                tramos['inicio_min'].tolist(), tramos['fin_min'].tolist(),
+            )
+        ]
+
+        with transaction.atomic():
+            existentes = ExcepcionAdherencia.objects.filter(fecha__range=[fecha_inicio, fecha_fin])
+            if agente_ids is not None:
+                existentes = existentes.filter(agente_id__in=agente_ids)
+            existentes.delete()
+            ExcepcionAdherencia.objects.bulk_create(excepciones, batch_size=5000)
+        return len(excepciones)
+
+    @staticmethod
+    def peores(fecha, minimo=1, limite=20, tipo=None, agente_ids=None):
+        """
+        Tramos más largos del día con al menos `minimo` minutos. Usa los
+        tramos guardados; si el día no se calculó, se calculan al vuelo.
+        """
+        guardadas = ExcepcionAdherencia.objects.filter(fecha=fecha)
+        if agente_ids is not None:
+            guardadas = guardadas.filter(agente_id__in=agente_ids)
+
+        if guardadas.exists():
+            guardadas = guardadas.filter(minutos__gte=minimo)
+            if tipo:
+                guardadas = guardadas.filter(tipo=tipo)
+            filas = list(guardadas.order_by('-minutos', 'agente_id', 'inicio_min').values_list(
+                'agente_id', 'tipo', 'inicio_min', 'fin_min'
+            )[:limite])
+        else:
+            tramos = MotorExcepciones.calcular(fecha, fecha, agente_ids)
+            minutos = tramos['fin_min'].astype(np.int32) - tramos['inicio_min']
+            validos = minutos >= minimo
+            if tipo:
+                validos &= tramos['tipo'] == TIPOS_EXCEPCION.index(tipo)
+            indices = np.flatnonzero(validos)
+            # Orden estable: más minutos primero, luego agente e inicio
+            orden = np.lexsort((
+                tramos['inicio_min'][indices], tramos['agente_id'][indices], -minutos[indices]
+            ))[:limite]
+            indices = indices[orden]
+            filas = list(zip(
+                tramos['agente_id'][indices].tolist(),
+                [TIPOS_EXCEPCION[t] for t in tramos['tipo'][indices].tolist()],
+                tramos['inicio_min'][indices].tolist(),
+                tramos['fin_min'][indices].tolist(),
+            ))
+
+        agentes = Agente.objects.in_bulk({agente_id for agente_id, _, _, _ in filas})
+        nombres = dict(ExcepcionAdherencia.TIPO_EXCEPCION)
+        return [
+            {
+                'agente_id': agente_id,
+                'codigo': agentes[agente_id].codigo,
+                'nombre': f"{agentes[agente_id].nombre} {agentes[agente_id].apellido}",
+                'tipo': tipo_excepcion,
+                'descripcion': nombres[tipo_excepcion],
+                'inicio': f"{inicio // 60:02d}:{inicio % 60:02d}",
+                'fin': f"{fin // 60:02d}:{fin % 60:02d}",
+                'minutos': fin - inicio,
+            }
+            for agente_id, tipo_excepcion, inicio, fin in filas
+        ]
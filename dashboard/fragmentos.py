@@ -0,0 +1,59 @@
+# dashboard/fragmentos.py
+"""
+Versión de los datos para el caché de fragmentos de las plantillas.
+
+Las claves de ``{% cache %}`` incluyen ``version_datos``: cada cambio en
+programas, actividades, resúmenes o agentes incrementa la versión (ver
+``signals.py``) y los fragmentos anteriores dejan de usarse. Las vistas leen
+una versión vigente que se renueva como mucho cada
+ADHERENCIA_FRAGMENTOS_DEMORA segundos, así que con actividades entrando sin
+parar un supervisor que refresca cada 30 s sigue leyendo HTML en caché.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CLAVE_VERSION = 'adherencia:datos:version'
+CLAVE_VIGENTE = 'adherencia:datos:vigente'
+
+
+class VersionDatos:
+    """
+    Versión de los datos para las claves del caché de fragmentos
+    """
+
+    @staticmethod
+    def version():
+        # Versión inicial única para no reutilizar claves de una versión perdida
+        return cache.get_or_set(CLAVE_VERSION, time.time_ns, timeout=None)
+
+    @staticmethod
+    def vigente():
+        """Versión que usan las plantillas (con demora acotada)"""
+        return cache.get_or_set(
+            CLAVE_VIGENTE, VersionDatos.version,
+            timeout=getattr(settings, 'ADHERENCIA_FRAGMENTOS_DEMORA', 30),
+        )
+
+    @staticmethod
+    def invalidar(inmediato=False):
+        """
+        Nueva versión de los datos; con `inmediato` las plantillas la ven ya
+        (p. ej. tras regenerar los datos a pedido del usuario)
+        """
+        try:
+            cache.incr(CLAVE_VERSION)
+        except ValueError:
+            pass  # sin versión en caché: la próxima consulta crea una nueva
+        if inmediato:
+            cache.delete(CLAVE_VIGENTE)
+
+    @staticmethod
+    def contexto():
+        """Variables de plantilla para las claves de {% cache %}"""
+        return {
+            'version_datos': VersionDatos.vigente(),
+            'cache_fragmentos': getattr(settings, 'ADHERENCIA_FRAGMENTOS_SEGUNDOS', 300),
+        }
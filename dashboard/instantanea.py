@@ -0,0 +1,117 @@
+# dashboard/instantanea.py
+"""
+Instantánea de los números del dashboard para una petición.
+
+Encabezado, barra lateral y tarjetas muestran los mismos conteos (agentes
+FT/PT, meta de KPI, llamadas y programas del día). La instantánea los junta en
+una consulta por tabla: un agregado condicional sobre Agente, la meta activa
+y los contadores de ayer, hoy y mañana (ContadorDiario por clave primaria).
+Cada parte se consulta la primera vez que se usa y queda memorizada en la
+petición (``InstantaneaDashboard.de(request)``), así que vistas y context
+processors comparten las mismas consultas.
+"""
+
+from datetime import date, timedelta
+
+from django.db.models import Count, Q
+from django.utils.functional import cached_property
+
+from .contadores import ContadoresDiarios
+from .models import Agente, KPIMeta
+
+ATRIBUTO = '_instantanea_dashboard'
+
+
+def supervisor_de(request):
+    """Filtro de equipo ?supervisor=<id>; None si no viene o no es válido"""
+    try:
+        return int(request.GET.get('supervisor') or 0) or None
+    except ValueError:
+        return None
+
+
+class InstantaneaDashboard:
+    """
+    Números compartidos por vistas y context processors de una petición
+    """
+
+    def __init__(self, supervisor_id=None, hoy=None):
+        self.supervisor_id = supervisor_id
+        self.hoy = hoy or date.today()
+        self.ayer = self.hoy - timedelta(days=1)
+        self.manana = self.hoy + timedelta(days=1)
+
+    @staticmethod
+    def de(request):
+        """Instantánea de la petición (se crea una sola vez por petición)"""
+        if request is None:
+            return InstantaneaDashboard()
+        instantanea = getattr(request, ATRIBUTO, None)
+        if instantanea is None:
+            instantanea = InstantaneaDashboard(supervisor_de(request))
+            setattr(request, ATRIBUTO, instantanea)
+        return instantanea
+
+    @cached_property
+    def agentes(self):
+        """
+        Conteos de agentes en un agregado condicional: registrados, activos,
+        FT y PT activos, y los mismos del equipo (`equipo_*`, todos si no
+        hay filtro de supervisor)
+        """
+        activo = Q(activo=True)
+        equipo = activo & Q(supervisor_id=self.supervisor_id) if self.supervisor_id else activo
+        return Agente.objects.aggregate(
+            registrados=Count('id'),
+            activos=Count('id', filter=activo),
+            ft=Count('id', filter=activo & Q(tipo_contrato='FT')),
+            pt=Count('id', filter=activo & Q(tipo_contrato='PT')),
+            equipo_activos=Count('id', filter=equipo),
+            equipo_ft=Count('id', filter=equipo & Q(tipo_contrato='FT')),
+            equipo_pt=Count('id', filter=equipo & Q(tipo_contrato='PT')),
+        )
+
+    @cached_property
+    def kpi_meta(self):
+        return KPIMeta.objects.filter(activo=True).first()
+
+    @cached_property
+    def contadores(self):
+        """ContadorDiario de ayer, hoy y mañana en una consulta"""
+        return ContadoresDiarios.dias(self.ayer, self.hoy, self.manana)
+
+    @property
+    def estado_sistema(self):
+        hoy = self.contadores[self.hoy]
+        if hoy.programas and hoy.actividades:
+            return 'activo'
+        return 'parcial' if hoy.programas else 'inactivo'
+
+    @property
+    def adherencia_rapida(self):
+        """Actividades productivas por agente programado hoy (indicador del encabezado)"""
+        hoy = self.contadores[self.hoy]
+        if not hoy.actividades or not hoy.programas:
+            return 0
+        return round(hoy.actividades_productivas / hoy.programas * 100, 1)
+
+    @property
+    def estadisticas_hoy(self):
+        hoy, ayer = self.contadores[self.hoy], self.contadores[self.ayer]
+        variacion = 0
+        if ayer.llamadas > 0:
+            variacion = round((hoy.llamadas - ayer.llamadas) / ayer.llamadas * 100, 1)
+        return {
+            'llamadas_atendidas': hoy.llamadas,
+            'agentes_activos': hoy.agentes_activos,
+            'tiempo_promedio_llamada': round(
+                hoy.minutos_conversacion / hoy.llamadas_con_conversacion, 1
+            ) if hoy.llamadas_con_conversacion else 0,
+            'tiempo_total_conversacion': hoy.minutos_conversacion,
+            'variacion_llamadas_vs_ayer': variacion,
+            'llamadas_ayer': ayer.llamadas,
+        }
+
+    @property
+    def programacion_manana(self):
+        return {'agentes_programados': self.contadores[self.manana].programas, 'fecha': self.manana}
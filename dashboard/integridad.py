@@ -0,0 +1,162 @@
+# dashboard/integridad.py
+"""
+Verificación de integridad de datos con pocas consultas.
+
+Todas las invariantes de una tabla se evalúan en un único ``aggregate`` con
+agregados condicionales (``Count(filter=...)``, ``Avg(filter=...)``); los
+solapamientos de actividades usan una función de ventana. En total son cuatro
+consultas, independientemente del número de agentes, y las comprobaciones sobre
+actividades se limitan a los últimos ``dias`` días (índice por fecha).
+"""
+
+from datetime import date, timedelta
+
+from django.db.models import Avg, Count, Exists, F, Max, OuterRef, Q, Subquery, Window
+from django.db.models.expressions import RowRange
+
+from .models import Agente, ProgramaDiario, RegistroActividad
+
+OK = 'ok'
+ADVERTENCIA = 'advertencia'
+ERROR = 'error'
+
+# Código de salida del comando según el peor nivel encontrado
+CODIGOS_SALIDA = {OK: 0, ADVERTENCIA: 1, ERROR: 2}
+
+
+def _verificacion(nombre, descripcion, valor, falla, nivel=ERROR):
+    return {
+        'nombre': nombre,
+        'descripcion': descripcion,
+        'valor': round(float(valor), 2) if isinstance(valor, float) else valor,
+        'nivel': nivel if falla else OK,
+    }
+
+
+class VerificadorIntegridad:
+    """
+    Evalúa las invariantes de los datos y arma un reporte serializable a JSON
+    """
+
+    @staticmethod
+    def _agentes():
+        return Agente.objects.order_by().aggregate(
+            total=Count('pk'),
+            ft=Count('pk', filter=Q(tipo_contrato='FT')),
+            pt=Count('pk', filter=Q(tipo_contrato='PT')),
+            horas_semana_invalidas=Count(
+                'pk',
+                filter=Q(tipo_contrato='FT') & ~Q(horas_semana=40)
+                | Q(tipo_contrato='PT') & ~Q(horas_semana=20)
+            ),
+        )
+
+    @staticmethod
+    def _programas(desde):
+        programas = ProgramaDiario.objects.order_by()
+        if desde:
+            programas = programas.filter(fecha__gte=desde)
+        return programas.aggregate(
+            total=Count('pk'),
+            horas_ft=Avg('horas_planificadas', filter=Q(agente__tipo_contrato='FT')),
+            horas_pt=Avg('horas_planificadas', filter=Q(agente__tipo_contrato='PT')),
+            sin_horas=Count('pk', filter=Q(horas_planificadas__lte=0)),
+        )
+
+    @staticmethod
+    def _actividades(desde):
+        actividades = RegistroActividad.objects.order_by()
+        if desde:
+            actividades = actividades.filter(fecha__gte=desde)
+
+        programa = ProgramaDiario.objects.filter(
+            agente_id=OuterRef('agente_id'), fecha=OuterRef('fecha')
+        )
+        return actividades.annotate(
+            turno_inicio=Subquery(programa.values('inicio_min')[:1]),
+            turno_fin=Subquery(programa.values('fin_min')[:1]),
+            agente_existe=Exists(Agente.objects.filter(pk=OuterRef('agente_id'))),
+        ).aggregate(
+            total=Count('pk'),
+            duracion_cero=Count('pk', filter=Q(duracion_minutos=0)),
+            duracion_negativa=Count('pk', filter=Q(duracion_minutos__lt=0)),
+            huerfanas=Count('pk', filter=Q(turno_inicio__isnull=True)),
+            fuera_de_turno=Count(
+                'pk',
+                filter=Q(turno_inicio__isnull=False)
+                & (Q(inicio_min__lt=F('turno_inicio')) | Q(fin_min__gt=F('turno_fin')))
+            ),
+            agentes_inexistentes=Count('pk', filter=Q(agente_existe=False)),
+        )
+
+    @staticmethod
+    def _solapadas(desde):
+        """Actividades que empiezan antes de que termine alguna anterior del mismo agente y día"""
+        actividades = RegistroActividad.objects.order_by()
+        if desde:
+            actividades = actividades.filter(fecha__gte=desde)
+        return actividades.annotate(
+            fin_previo=Window(
+                Max('fin_min'),
+                partition_by=[F('agente_id'), F('fecha')],
+                order_by=[F('inicio_min').asc(), F('pk').asc()],
+                frame=RowRange(start=None, end=-1),
+            )
+        ).filter(inicio_min__lt=F('fin_previo')).count()
+
+    @staticmethod
+    def verificar(dias=7):
+        """
+        Reporte con todas las verificaciones. ``dias`` acota programas y
+        actividades a los últimos días (None o 0 = toda la tabla).
+        """
+        desde = date.today() - timedelta(days=dias) if dias else None
+        agentes = VerificadorIntegridad._agentes()
+        programas = VerificadorIntegridad._programas(desde)
+        actividades = VerificadorIntegridad._actividades(desde)
+        solapadas = VerificadorIntegridad._solapadas(desde)
+
+        horas_ft = float(programas['horas_ft'] or 0)
+        horas_pt = float(programas['horas_pt'] or 0)
+
+        verificaciones = [
+            _verificacion('agentes', 'Agentes registrados', agentes['total'],
+                          agentes['total'] == 0),
+            _verificacion('horas_semana', 'Agentes con horas semanales distintas al contrato',
+                          agentes['horas_semana_invalidas'], agentes['horas_semana_invalidas'] > 0),
+            _verificacion('programas', 'Programas en el período', programas['total'],
+                          programas['total'] == 0),
+            _verificacion('horas_ft', 'Horas planificadas promedio FT (mín. 7h)', horas_ft,
+                          programas['horas_ft'] is not None and horas_ft < 7),
+            _verificacion('horas_pt', 'Horas planificadas promedio PT (máx. 5h)', horas_pt,
+                          horas_pt > 5),
+            _verificacion('programas_sin_horas', 'Programas sin horas planificadas',
+                          programas['sin_horas'], programas['sin_horas'] > 0),
+            _verificacion('actividades', 'Actividades en el período', actividades['total'],
+                          actividades['total'] == 0, ADVERTENCIA),
+            _verificacion('agentes_inexistentes', 'Actividades de agentes inexistentes',
+                          actividades['agentes_inexistentes'], actividades['agentes_inexistentes'] > 0),
+            _verificacion('huerfanas', 'Actividades sin programa del agente ese día',
+                          actividades['huerfanas'], actividades['huerfanas'] > 0),
+            _verificacion('solapadas', 'Actividades solapadas del mismo agente',
+                          solapadas, solapadas > 0),
+            _verificacion('fuera_de_turno', 'Actividades fuera del horario programado',
+                          actividades['fuera_de_turno'], actividades['fuera_de_turno'] > 0,
+                          ADVERTENCIA),
+            _verificacion('duracion_negativa', 'Actividades con duración negativa',
+                          actividades['duracion_negativa'], actividades['duracion_negativa'] > 0),
+            _verificacion('duracion_cero', 'Actividades con duración cero',
+                          actividades['duracion_cero'], actividades['duracion_cero'] > 0,
+                          ADVERTENCIA),
+        ]
+
+        niveles = {v['nivel'] for v in verificaciones}
+        estado = ERROR if ERROR in niveles else ADVERTENCIA if ADVERTENCIA in niveles else OK
+        return {
+            'fecha': date.today().isoformat(),
+            'desde': desde.isoformat() if desde else None,
+            'estado': estado,
+            'codigo_salida': CODIGOS_SALIDA[estado],
+            'agentes': {'total': agentes['total'], 'ft': agentes['ft'], 'pt': agentes['pt']},
+            'verificaciones': verificaciones,
+        }
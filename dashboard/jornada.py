@@ -0,0 +1,142 @@
+# dashboard/jornada.py
+"""
+Jornada de un agente: turno programado, actividades en orden y huecos.
+
+Todas las fechas pedidas se leen en dos consultas (programas y actividades
+del agente con ``fecha__in``). Los días cerrados (anteriores a hoy) quedan en
+caché por agente-día; los cambios en programas o actividades borran las
+claves de sus agente-día (señal ``datos_modificados``) y los cambios sin
+filas conocidas cambian la versión de todas.
+"""
+
+import time
+from datetime import date
+
+from django.core.cache import cache
+
+from .models import ProgramaDiario, RegistroActividad
+
+CLAVE_VERSION = 'adherencia:jornada:version'
+
+
+def _hora(minuto):
+    minuto %= 1440
+    return f"{minuto // 60:02d}:{minuto % 60:02d}"
+
+
+class JornadaAgente:
+    """
+    Línea de tiempo de un agente por día, para el Gantt de la matriz
+    """
+
+    @staticmethod
+    def version():
+        # Versión inicial única para no reutilizar claves de una versión perdida
+        return cache.get_or_set(CLAVE_VERSION, time.time_ns, timeout=None)
+
+    @staticmethod
+    def invalidar(filas=None):
+        """
+        Borra las jornadas en caché de los agente-día de `filas` (agente_id,
+        fecha, fin_min); sin filas, descarta todas
+        """
+        if not filas:
+            try:
+                cache.incr(CLAVE_VERSION)
+            except ValueError:
+                pass  # sin versión en caché: la próxima consulta crea una nueva
+            return
+        version = JornadaAgente.version()
+        cache.delete_many({JornadaAgente._clave(version, agente_id, fecha) for agente_id, fecha, _ in filas})
+
+    @staticmethod
+    def _clave(version, agente_id, fecha):
+        return f"adherencia:jornada:v{version}:{agente_id}:{fecha.isoformat()}"
+
+    @staticmethod
+    def huecos(actividades, programa=None):
+        """
+        Tramos sin actividad entre el primer y el último minuto de la jornada
+        (turno o actividades), con los minutos que caen dentro del turno
+        """
+        tramos = actividades + ([programa] if programa else [])
+        if not tramos:
+            return []
+        cubierto = min(t['inicio_min'] for t in tramos)
+        fin = max(t['fin_min'] for t in tramos)
+
+        huecos = []
+        for actividad in sorted(actividades, key=lambda a: a['inicio_min']) + [{'inicio_min': fin, 'fin_min': fin}]:
+            if actividad['inicio_min'] > cubierto:
+                inicio, hasta = cubierto, actividad['inicio_min']
+                programados = 0
+                if programa:
+                    programados = max(0, min(hasta, programa['fin_min']) - max(inicio, programa['inicio_min']))
+                huecos.append({
+                    'inicio_min': inicio,
+                    'fin_min': hasta,
+                    'inicio': _hora(inicio),
+                    'fin': _hora(hasta),
+                    'minutos': hasta - inicio,
+                    'minutos_programados': programados,
+                })
+            cubierto = max(cubierto, actividad['fin_min'])
+        return huecos
+
+    @staticmethod
+    def jornadas(agente_id, fechas):
+        """Jornada de cada fecha, en orden cronológico"""
+        fechas = sorted(set(fechas))
+        hoy = date.today()
+        version = JornadaAgente.version()
+        claves = {fecha: JornadaAgente._clave(version, agente_id, fecha) for fecha in fechas if fecha < hoy}
+        en_cache = cache.get_many(claves.values())
+        jornadas = {fecha: en_cache[clave] for fecha, clave in claves.items() if clave in en_cache}
+
+        faltantes = [fecha for fecha in fechas if fecha not in jornadas]
+        if faltantes:
+            calculadas = JornadaAgente._calcular(agente_id, faltantes)
+            jornadas.update(calculadas)
+            cache.set_many({claves[fecha]: calculadas[fecha] for fecha in faltantes if fecha in claves})
+        return [jornadas[fecha] for fecha in fechas]
+
+    @staticmethod
+    def _calcular(agente_id, fechas):
+        """Jornadas de `fechas` en dos consultas"""
+        programas = {
+            programa['fecha']: programa
+            for programa in ProgramaDiario.objects.filter(agente_id=agente_id, fecha__in=fechas).values(
+                'fecha', 'turno', 'inicio_min', 'fin_min'
+            )
+        }
+        actividades = {fecha: [] for fecha in fechas}
+        for actividad in RegistroActividad.objects.filter(agente_id=agente_id, fecha__in=fechas).order_by(
+            'fecha', 'hora_inicio', 'id'
+        ).values('fecha', 'tipo_actividad', 'inicio_min', 'fin_min', 'llamadas_atendidas'):
+            actividades[actividad['fecha']].append({
+                'tipo': actividad['tipo_actividad'],
+                'inicio_min': actividad['inicio_min'],
+                'fin_min': actividad['fin_min'],
+                'inicio': _hora(actividad['inicio_min']),
+                'fin': _hora(actividad['fin_min']),
+                'llamadas': actividad['llamadas_atendidas'],
+            })
+
+        jornadas = {}
+        for fecha in fechas:
+            programa = programas.get(fecha)
+            if programa:
+                programa = {
+                    'turno': programa['turno'],
+                    'inicio_min': programa['inicio_min'],
+                    'fin_min': programa['fin_min'],
+                    'inicio': _hora(programa['inicio_min']),
+                    'fin': _hora(programa['fin_min']),
+                }
+            jornadas[fecha] = {
+                'fecha': fecha.isoformat(),
+                'programa': programa,
+                'actividades': actividades[fecha],
+                'huecos': JornadaAgente.huecos(actividades[fecha], programa),
+            }
+        return jornadas
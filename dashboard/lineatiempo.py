@@ -0,0 +1,214 @@
+# dashboard/lineatiempo.py
+"""
+Líneas de tiempo por agente-día en bitsets empaquetados.
+
+Cada LineaTiempoAgente guarda los minutos programados y los minutos en cada
+tipo de actividad como bitsets de 1440 bits (``np.packbits``, 180 bytes). Para
+saber qué agentes estaban en un estado en un minuto, o cuántos programados
+estaban productivos en cada minuto, basta con AND/OR entre bitsets de todos
+los agentes y contar bits por columna, sin volver a leer RegistroActividad.
+
+Los cambios en programas y actividades (save, delete y bulk_create) marcan
+como pendientes las líneas afectadas y las reconstruyen al confirmar la
+transacción (ver ``invalidar_lineas_tiempo``). Las lecturas no escriben:
+calculan en memoria las que sigan pendientes, y
+``construir_lineas_tiempo --pendientes`` (tarea programada) guarda las que
+quedaron marcadas, p. ej. si el proceso cayó antes de reconstruirlas.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+
+from .analizador import MINUTOS_DIA, filas_por_dia, mascaras_agentes
+from .archivo import TIPOS_ACTIVIDAD, TIPOS_PRODUCTIVOS
+from .cargador import CargadorDatos
+from .models import LineaTiempoAgente
+
+BYTES_DIA = MINUTOS_DIA // 8
+INDICE_TIPO = {tipo: i for i, tipo in enumerate(TIPOS_ACTIVIDAD)}
+
+
+class LineaTiempo:
+    """
+    Construcción, mantenimiento y consultas de las líneas de tiempo
+    """
+
+    @staticmethod
+    def _calcular(fecha_inicio, fecha_fin, agente_ids=None):
+        """
+        Líneas del rango (opcionalmente solo de `agente_ids`) calculadas desde
+        programas y actividades, sin guardar
+        """
+        dias = (fecha_fin - fecha_inicio).days + 1
+        desde = fecha_inicio - timedelta(days=1)
+        programas, limites_programas = filas_por_dia(
+            CargadorDatos.cargar_programas(desde, fecha_fin, agente_ids=agente_ids),
+            fecha_inicio, dias,
+        )
+        actividades, limites_actividades = filas_por_dia(
+            CargadorDatos.cargar_actividades(desde, fecha_fin, agente_ids=agente_ids),
+            fecha_inicio, dias,
+        )
+
+        lineas = []
+        for d in range(dias):
+            fecha = fecha_inicio + timedelta(days=d)
+            programas_dia = programas.iloc[limites_programas[d]:limites_programas[d + 1]]
+            actividades_dia = actividades.iloc[limites_actividades[d]:limites_actividades[d + 1]]
+            agentes = np.union1d(
+                programas_dia['agente_id'].to_numpy(), actividades_dia['agente_id'].to_numpy()
+            )
+            if agente_ids is not None:
+                # Agentes pedidos sin datos: líneas vacías, ya no pendientes
+                agentes = np.union1d(agentes, np.asarray(list(agente_ids), dtype=np.int32))
+
+            programado = np.packbits(
+                mascaras_agentes(programas_dia, agentes, 0, MINUTOS_DIA), axis=1
+            )
+            estados = np.zeros((len(agentes), len(TIPOS_ACTIVIDAD), BYTES_DIA), dtype=np.uint8)
+            tipo = actividades_dia['tipo'].to_numpy()
+            for t, nombre in enumerate(TIPOS_ACTIVIDAD):
+                estados[:, t] = np.packbits(
+                    mascaras_agentes(actividades_dia[tipo == nombre], agentes, 0, MINUTOS_DIA), axis=1
+                )
+
+            lineas.extend(
+                LineaTiempoAgente(
+                    agente_id=agente_id, fecha=fecha, pendiente=False,
+                    programado=programado[i].tobytes(), estados=estados[i].tobytes(),
+                )
+                for i, agente_id in enumerate(agentes.tolist())
+            )
+        return lineas
+
+    @staticmethod
+    def construir(fecha_inicio, fecha_fin, agente_ids=None):
+        """
+        (Re)construye las líneas de tiempo del rango (opcionalmente solo de
+        `agente_ids`). Devuelve cuántas se guardaron.
+        """
+        # Dentro de atomic las lecturas van a default: la línea no puede
+        # quedar al día con datos atrasados de la réplica
+        with transaction.atomic():
+            # Las líneas existentes se bloquean antes de leer los datos: una
+            # invalidación concurrente espera al commit y vuelve a marcarlas
+            existentes = LineaTiempoAgente.objects.select_for_update().filter(
+                fecha__range=[fecha_inicio, fecha_fin]
+            )
+            if agente_ids is not None:
+                existentes = existentes.filter(agente_id__in=agente_ids)
+            existentes = {
+                (agente_id, fecha): pk for pk, agente_id, fecha in existentes.values_list('pk', 'agente_id', 'fecha')
+            }
+
+            lineas = LineaTiempo._calcular(fecha_inicio, fecha_fin, agente_ids)
+            for linea in lineas:
+                linea.pk = existentes.pop((linea.agente_id, linea.fecha), None)
+
+            # Las existentes se actualizan en su lugar (no borrar y crear: se
+            # perdería la marca de una invalidación en espera); las nuevas se
+            # ignoran si otra transacción ya creó la línea pendiente
+            LineaTiempoAgente.objects.filter(pk__in=existentes.values()).delete()
+            LineaTiempoAgente.objects.bulk_update(
+                [linea for linea in lineas if linea.pk], ['pendiente', 'programado', 'estados'], batch_size=2000
+            )
+            LineaTiempoAgente.objects.bulk_create(
+                [linea for linea in lineas if not linea.pk], batch_size=2000, ignore_conflicts=True
+            )
+        return len(lineas)
+
+    @staticmethod
+    def actualizar(fecha):
+        """
+        Deja al día las líneas de la fecha: reconstruye las pendientes o todo
+        el día si nunca se construyó. Devuelve cuántas se reconstruyeron.
+        """
+        with transaction.atomic():
+            pendientes = list(LineaTiempoAgente.objects.filter(
+                fecha=fecha, pendiente=True
+            ).values_list('agente_id', flat=True))
+            if pendientes:
+                return LineaTiempo.construir(fecha, fecha, agente_ids=pendientes)
+            if not LineaTiempoAgente.objects.filter(fecha=fecha).exists():
+                return LineaTiempo.construir(fecha, fecha)
+        return 0
+
+    @staticmethod
+    def fechas_pendientes():
+        """Fechas con líneas pendientes de reconstruir"""
+        return list(LineaTiempoAgente.objects.filter(pendiente=True).order_by(
+            'fecha'
+        ).values_list('fecha', flat=True).distinct())
+
+    @staticmethod
+    def cargar(fecha, agente_ids=None):
+        """
+        Bitsets del día: agentes (ids), programado (agentes × 180) y estados
+        (agentes × tipos × 180), todos uint8. Solo lee: las líneas pendientes
+        (o el día entero si nunca se construyó) se calculan en memoria y las
+        guarda construir_lineas_tiempo --pendientes
+        """
+        lineas = LineaTiempoAgente.objects.filter(fecha=fecha)
+        if agente_ids is not None:
+            lineas = lineas.filter(agente_id__in=agente_ids)
+        filas, pendientes = {}, set()
+        for agente_id, programado, estados, pendiente in lineas.values_list(
+            'agente_id', 'programado', 'estados', 'pendiente'
+        ):
+            if pendiente:
+                pendientes.add(agente_id)
+            else:
+                filas[agente_id] = (programado, estados)
+        if not filas and not pendientes and not LineaTiempoAgente.objects.filter(fecha=fecha).exists():
+            calculadas = LineaTiempo._calcular(fecha, fecha, agente_ids)
+        elif pendientes:
+            calculadas = LineaTiempo._calcular(fecha, fecha, pendientes)
+        else:
+            calculadas = []
+        for linea in calculadas:
+            filas[linea.agente_id] = (linea.programado, linea.estados)
+
+        orden = sorted(filas)
+        agentes = np.array(orden, dtype=np.int32)
+        programado = np.frombuffer(
+            b''.join(bytes(filas[a][0]) for a in orden), dtype=np.uint8
+        ).reshape(len(orden), BYTES_DIA)
+        estados = np.frombuffer(
+            b''.join(bytes(filas[a][1]) for a in orden), dtype=np.uint8
+        ).reshape(len(orden), len(TIPOS_ACTIVIDAD), BYTES_DIA)
+        return agentes, programado, estados
+
+    @staticmethod
+    def union_estados(estados, tipos):
+        """OR de los bitsets de `tipos` (agentes × 180)"""
+        return np.bitwise_or.reduce(estados[:, [INDICE_TIPO[t] for t in tipos]], axis=1)
+
+    @staticmethod
+    def en_estado(fecha, minuto, tipos, agente_ids=None):
+        """Ids de los agentes en alguno de `tipos` en el minuto del día `minuto`"""
+        agentes, _, estados = LineaTiempo.cargar(fecha, agente_ids)
+        if not len(agentes):
+            return []
+        bits = LineaTiempo.union_estados(estados, tipos)[:, minuto // 8]
+        return agentes[(bits >> (7 - minuto % 8)) & 1 == 1].tolist()
+
+    @staticmethod
+    def ocupacion(fecha, inicio_min=8 * 60, fin_min=20 * 60, agente_ids=None):
+        """
+        Igual que ocupacion_dia para ventanas dentro del día, con AND entre
+        bitsets y conteo de bits por minuto sobre todos los agentes
+        """
+        _, programado, estados = LineaTiempo.cargar(fecha, agente_ids)
+        productivo = LineaTiempo.union_estados(estados, TIPOS_PRODUCTIVOS)
+
+        def por_minuto(bits):
+            return np.unpackbits(bits, axis=1)[:, inicio_min:fin_min].sum(axis=0, dtype=np.int32)
+
+        return {
+            'inicio_min': inicio_min,
+            'programados': por_minuto(programado),
+            'activos': por_minuto(programado & productivo),
+            'activos_total': por_minuto(productivo),
+        }
@@ -0,0 +1,170 @@
+# dashboard/lote.py
+"""
+Cálculo de adherencia por agente-día en lote, fuera de la capa web.
+
+El rango de fechas se parte en tramos de días (shards) que calculan procesos
+independientes: cada uno carga programas y actividades de su tramo (base de
+datos + archivo, ver CargadorDatos), arma las máscaras minuto a minuto
+(agentes × 1440) y escribe su parte en ``<salida>.partes/``. Una parte
+existente es un tramo terminado, así que un proceso interrumpido se retoma
+donde quedó. Al final las partes se unen en la salida (CSV, NDJSON o .npz).
+"""
+
+import csv
+import io
+import json
+import math
+import os
+import shutil
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+
+from .analizador import MINUTOS_DIA, filas_por_dia, mascaras_agentes
+from .cargador import CargadorDatos
+from .routers import lectura_analitica
+
+FORMATOS = ('csv', 'ndjson', 'npz')
+COLUMNAS = (
+    'fecha', 'agente_id', 'codigo', 'tipo_contrato', 'minutos_programados',
+    'minutos_adherentes', 'minutos_productivos', 'minutos_sin_programar', 'adherencia',
+)
+
+# Agentes (id -> (codigo, tipo_contrato)) de cada proceso, ver _iniciar_proceso
+_agentes = {}
+
+
+def _iniciar_proceso(agentes):
+    """Inicializador de cada proceso: Django listo y agentes en memoria"""
+    import django
+    django.setup()
+    _agentes.update(agentes)
+
+
+def _calcular_tramo(fecha_inicio, fecha_fin, agente_ids, destino, formato):
+    """Trabajo de cada proceso: calcula el tramo y escribe su parte"""
+    inicio = time.perf_counter()
+    with lectura_analitica():
+        columnas = CalculoLote.calcular(fecha_inicio, fecha_fin, agente_ids, _agentes)
+    CalculoLote.escribir(columnas, destino, formato)
+    return fecha_inicio, fecha_fin, len(columnas['agente_id']), time.perf_counter() - inicio
+
+
+class CalculoLote:
+    """
+    Adherencia por agente-día en tramos paralelos con salida a archivo
+    """
+
+    @staticmethod
+    def tramos(fecha_inicio, fecha_fin, dias_por_tramo=1):
+        """[(inicio, fin)] consecutivos de hasta `dias_por_tramo` días"""
+        tramos = []
+        fecha = fecha_inicio
+        while fecha <= fecha_fin:
+            fin = min(fecha + timedelta(days=dias_por_tramo - 1), fecha_fin)
+            tramos.append((fecha, fin))
+            fecha = fin + timedelta(days=1)
+        return tramos
+
+    @staticmethod
+    def calcular(fecha_inicio, fecha_fin, agente_ids=None, agentes=None):
+        """
+        Columnas (arrays) con la adherencia de cada agente-día del rango. Los
+        turnos que cruzan la medianoche cuentan en el día siguiente desde las
+        00:00, como en excepciones.py
+        """
+        agentes = agentes or {}
+        dias = (fecha_fin - fecha_inicio).days + 1
+        desde = fecha_inicio - timedelta(days=1)
+        programas, limites_programas = filas_por_dia(
+            CargadorDatos.cargar_programas(desde, fecha_fin, agente_ids=agente_ids), fecha_inicio, dias
+        )
+        actividades, limites_actividades = filas_por_dia(
+            CargadorDatos.cargar_productivas(desde, fecha_fin, agente_ids=agente_ids), fecha_inicio, dias
+        )
+
+        partes = []
+        for d in range(dias):
+            programas_dia = programas.iloc[limites_programas[d]:limites_programas[d + 1]]
+            productivas_dia = actividades.iloc[limites_actividades[d]:limites_actividades[d + 1]]
+            ids = np.union1d(programas_dia['agente_id'].to_numpy(), productivas_dia['agente_id'].to_numpy())
+            programado = mascaras_agentes(programas_dia, ids, 0, MINUTOS_DIA)
+            productivo = mascaras_agentes(productivas_dia, ids, 0, MINUTOS_DIA)
+
+            minutos_programados = programado.sum(axis=1, dtype=np.int32)
+            minutos_adherentes = (programado & productivo).sum(axis=1, dtype=np.int32)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                adherencia = np.round(minutos_adherentes / minutos_programados * 100, 2)
+            partes.append({
+                'fecha': np.full(len(ids), np.datetime64(fecha_inicio + timedelta(days=d), 'D')),
+                'agente_id': ids.astype(np.int32),
+                'codigo': np.array([agentes.get(i, ('', ''))[0] for i in ids.tolist()], dtype='U10'),
+                'tipo_contrato': np.array([agentes.get(i, ('', ''))[1] for i in ids.tolist()], dtype='U4'),
+                'minutos_programados': minutos_programados,
+                'minutos_adherentes': minutos_adherentes,
+                'minutos_productivos': productivo.sum(axis=1, dtype=np.int32),
+                'minutos_sin_programar': (productivo & ~programado).sum(axis=1, dtype=np.int32),
+                # NaN: agente con actividad pero sin minutos programados
+                'adherencia': adherencia.astype(np.float32),
+            })
+
+        return {columna: np.concatenate([parte[columna] for parte in partes]) for columna in COLUMNAS}
+
+    @staticmethod
+    def _registros(columnas):
+        """Filas como dicts listos para CSV/JSON (adherencia NaN -> None, float32 -> 2 decimales)"""
+        listas = {columna: valores.tolist() for columna, valores in columnas.items()}
+        listas['fecha'] = [str(fecha) for fecha in columnas['fecha']]
+        listas['adherencia'] = [None if math.isnan(a) else round(a, 2) for a in listas['adherencia']]
+        for i in range(len(listas['agente_id'])):
+            yield {columna: listas[columna][i] for columna in COLUMNAS}
+
+    @staticmethod
+    def escribir(columnas, destino, formato):
+        """Escribe una parte de forma atómica (temporal + rename)"""
+        destino = Path(destino)
+        temporal = destino.with_name(destino.name + '.tmp')
+        if formato == 'npz':
+            with open(temporal, 'wb') as archivo:
+                np.savez_compressed(archivo, **columnas)
+        elif formato == 'csv':
+            with open(temporal, 'w', newline='', encoding='utf-8') as archivo:
+                escritor = csv.DictWriter(archivo, fieldnames=COLUMNAS)
+                escritor.writeheader()
+                escritor.writerows(CalculoLote._registros(columnas))
+        else:
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                for registro in CalculoLote._registros(columnas):
+                    archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        os.replace(temporal, destino)
+
+    @staticmethod
+    def unir(partes, salida, formato):
+        """Une las partes (en orden) en el archivo de salida"""
+        salida = Path(salida)
+        temporal = salida.with_name(salida.name + '.tmp')
+        if formato == 'npz':
+            columnas = {columna: [] for columna in COLUMNAS}
+            for parte in partes:
+                with np.load(parte) as datos:
+                    for columna in COLUMNAS:
+                        columnas[columna].append(datos[columna])
+            with open(temporal, 'wb') as archivo:
+                np.savez_compressed(archivo, **{
+                    columna: np.concatenate(valores) if valores else np.array([])
+                    for columna, valores in columnas.items()
+                })
+        else:
+            with open(temporal, 'wb') as archivo:
+                if formato == 'csv':
+                    encabezado = io.StringIO()
+                    csv.writer(encabezado).writerow(COLUMNAS)
+                    archivo.write(encabezado.getvalue().encode('utf-8'))
+                for parte in partes:
+                    with open(parte, 'rb') as origen:
+                        if formato == 'csv':
+                            origen.readline()  # encabezado de la parte
+                        shutil.copyfileobj(origen, archivo)
+        os.replace(temporal, salida)
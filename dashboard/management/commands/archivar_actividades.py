@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import TruncMonth
+
+from dashboard.archivo import ArchivoActividad
+from dashboard.models import RegistroActividad
+
+
+class Command(BaseCommand):
+    help = "Mueve las actividades de meses cerrados al archivo columnar (.npy)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasta',
+            help="Último mes a archivar (AAAA-MM). Por defecto, el mes anterior al actual",
+        )
+        parser.add_argument(
+            '--lote', type=int, default=50000,
+            help="Filas leídas por lote desde la base de datos",
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Solo muestra los meses y filas que se archivarían",
+        )
+
+    def handle(self, *args, **options):
+        mes_actual = date.today().replace(day=1)
+        if options['hasta']:
+            try:
+                anio, mes = (int(x) for x in options['hasta'].split('-'))
+                limite = (date(anio, mes, 1) + timedelta(days=32)).replace(day=1)
+            except ValueError:
+                raise CommandError("--hasta debe tener el formato AAAA-MM")
+            if limite > mes_actual:
+                raise CommandError("Solo se pueden archivar meses cerrados")
+        else:
+            limite = mes_actual
+
+        meses = (
+            RegistroActividad.objects.filter(fecha__lt=limite)
+            .annotate(mes=TruncMonth('fecha'))
+            .values_list('mes', flat=True)
+            .distinct()
+            .order_by('mes')
+        )
+
+        total = 0
+        for primer_dia in meses:
+            if options['dry_run']:
+                filas = RegistroActividad.objects.filter(
+                    fecha__year=primer_dia.year, fecha__month=primer_dia.month
+                ).count()
+                self.stdout.write(f"{primer_dia:%Y-%m}: {filas} filas por archivar")
+            else:
+                filas = ArchivoActividad.archivar_mes(
+                    primer_dia.year, primer_dia.month, lote=options['lote']
+                )
+                self.stdout.write(f"{primer_dia:%Y-%m}: {filas} filas archivadas")
+            total += filas
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"Dry-run: {total} filas no se movieron"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {total} filas movidas a {ArchivoActividad.directorio()}"
+            ))
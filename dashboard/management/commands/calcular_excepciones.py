@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.excepciones import MotorExcepciones
+from dashboard.routers import lectura_analitica
+
+
+class Command(BaseCommand):
+    help = "Calcula y guarda los tramos fuera de adherencia de cada agente-día"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Fecha inicial (AAAA-MM-DD). Por defecto, ayer")
+        parser.add_argument('--hasta', help="Fecha final (AAAA-MM-DD). Por defecto, ayer")
+
+    def handle(self, *args, **options):
+        ayer = date.today() - timedelta(days=1)
+        try:
+            desde = date.fromisoformat(options['desde']) if options['desde'] else ayer
+            hasta = date.fromisoformat(options['hasta']) if options['hasta'] else ayer
+        except ValueError:
+            raise CommandError("Las fechas deben tener el formato AAAA-MM-DD")
+        if desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta")
+
+        # Lee de la réplica analítica; los tramos se escriben en default
+        with lectura_analitica():
+            guardados = MotorExcepciones.guardar(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {guardados} excepciones guardadas ({desde} a {hasta})"
+        ))
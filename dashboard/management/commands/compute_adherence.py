@@ -0,0 +1,136 @@
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from dashboard.lote import FORMATOS, CalculoLote, _calcular_tramo, _iniciar_proceso
+from dashboard.models import Agente
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula la adherencia por agente-día en procesos paralelos (un tramo "
+        "de días por tarea) y la escribe en CSV, NDJSON o .npz. Si se "
+        "interrumpe, volver a ejecutarlo retoma los tramos pendientes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('salida', help="Archivo de salida (.csv, .ndjson o .npz)")
+        parser.add_argument('--desde', help="Fecha inicial (AAAA-MM-DD). Por defecto, ayer")
+        parser.add_argument('--hasta', help="Fecha final (AAAA-MM-DD). Por defecto, ayer")
+        parser.add_argument('--agente', action='append', default=[],
+                            help="Código de agente (repetible). Por defecto, todos")
+        parser.add_argument('--contrato', choices=[codigo for codigo, _ in Agente.TIPO_CONTRATO],
+                            help="Solo agentes con este tipo de contrato")
+        parser.add_argument('--formato', choices=FORMATOS,
+                            help="Formato de salida. Por defecto, según la extensión")
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                            help="Procesos en paralelo. Por defecto, uno por CPU")
+        parser.add_argument('--dias-por-tramo', type=int, default=1,
+                            help="Días que calcula cada tarea (por defecto 1)")
+        parser.add_argument('--reiniciar', action='store_true',
+                            help="Descarta las partes de una ejecución anterior (obligatorio si "
+                                 "cambiaron los argumentos)")
+        parser.add_argument('--conservar-partes', action='store_true',
+                            help="No borra las partes al terminar")
+
+    def handle(self, *args, **options):
+        ayer = date.today() - timedelta(days=1)
+        try:
+            desde = date.fromisoformat(options['desde']) if options['desde'] else ayer
+            hasta = date.fromisoformat(options['hasta']) if options['hasta'] else ayer
+        except ValueError:
+            raise CommandError("Las fechas deben tener el formato AAAA-MM-DD")
+        if desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta")
+        if options['procesos'] < 1 or options['dias_por_tramo'] < 1:
+            raise CommandError("--procesos y --dias-por-tramo deben ser mayores que 0")
+
+        salida = Path(options['salida'])
+        formato = options['formato'] or salida.suffix.lstrip('.').lower()
+        if formato not in FORMATOS:
+            raise CommandError(f"Formato no soportado: {formato!r} (use {', '.join(FORMATOS)})")
+
+        # Filtros de agente y contrato -> ids; los códigos viajan a cada proceso
+        agentes = Agente.objects.all()
+        if options['agente']:
+            agentes = agentes.filter(codigo__in=options['agente'])
+        if options['contrato']:
+            agentes = agentes.filter(tipo_contrato=options['contrato'])
+        agentes = {
+            agente_id: (codigo, tipo_contrato)
+            for agente_id, codigo, tipo_contrato in agentes.values_list('id', 'codigo', 'tipo_contrato')
+        }
+        faltantes = set(options['agente']) - {codigo for codigo, _ in agentes.values()}
+        if faltantes:
+            raise CommandError(f"Agentes no encontrados: {', '.join(sorted(faltantes))}")
+        agente_ids = sorted(agentes) if options['agente'] or options['contrato'] else None
+
+        # Las partes solo se retoman si vienen de una ejecución con los mismos argumentos
+        manifiesto = {
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'agentes': sorted(options['agente']),
+            'contrato': options['contrato'],
+            'dias_por_tramo': options['dias_por_tramo'],
+            'formato': formato,
+        }
+        partes = salida.with_name(salida.name + '.partes')
+        ruta_manifiesto = partes / 'manifiesto.json'
+        if partes.exists() and not options['reiniciar']:
+            try:
+                anterior = json.loads(ruta_manifiesto.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                anterior = None
+            if anterior != manifiesto and any(p.name != ruta_manifiesto.name for p in partes.iterdir()):
+                raise CommandError(
+                    f"{partes} tiene partes de una ejecución con otros argumentos "
+                    f"({anterior or 'sin manifiesto'}); use --reiniciar para descartarlas"
+                )
+        if options['reiniciar'] and partes.exists():
+            shutil.rmtree(partes)
+        partes.mkdir(parents=True, exist_ok=True)
+        ruta_manifiesto.write_text(json.dumps(manifiesto, indent=2), encoding='utf-8')
+
+        tramos = CalculoLote.tramos(desde, hasta, options['dias_por_tramo'])
+        destinos = {tramo: partes / f"{tramo[0]}_{tramo[1]}.{formato}" for tramo in tramos}
+        pendientes = [tramo for tramo in tramos if not destinos[tramo].exists()]
+        if len(pendientes) < len(tramos):
+            self.stdout.write(f"↩️  Retomando: {len(tramos) - len(pendientes)} de {len(tramos)} tramos ya calculados")
+
+        # Cada proceso abre sus propias conexiones
+        connections.close_all()
+        inicio = time.perf_counter()
+        filas = 0
+        procesos = min(options['procesos'], len(pendientes)) or 1
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso,
+                                 initargs=(agentes,)) as ejecutor:
+            tareas = [
+                ejecutor.submit(_calcular_tramo, tramo[0], tramo[1], agente_ids, destinos[tramo], formato)
+                for tramo in pendientes
+            ]
+            for hechos, tarea in enumerate(as_completed(tareas), start=1):
+                tramo_inicio, tramo_fin, cantidad, segundos = tarea.result()
+                filas += cantidad
+                self.stdout.write(
+                    f"📅 {tramo_inicio}{'' if tramo_inicio == tramo_fin else f' a {tramo_fin}'}: "
+                    f"{cantidad} agente-días en {segundos:.1f} s ({hechos}/{len(pendientes)})"
+                )
+
+        CalculoLote.unir([destinos[tramo] for tramo in tramos], salida, formato)
+        if not options['conservar_partes']:
+            shutil.rmtree(partes)
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {salida} ({formato}): {filas} agente-días nuevos en {len(pendientes)} tramos, "
+            f"{segundos:.1f} s con {procesos} procesos "
+            f"({filas / segundos if segundos else 0:.0f} agente-días/s, "
+            f"{len(pendientes) / segundos if segundos else 0:.2f} tramos/s)"
+        ))
@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.lineatiempo import LineaTiempo
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye las líneas de tiempo (bitsets por agente-día). Con "
+        "--pendientes guarda solo las marcadas por cambios posteriores "
+        "(para ejecutar periódicamente; las lecturas no escriben)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Fecha inicial (AAAA-MM-DD). Por defecto, ayer")
+        parser.add_argument('--hasta', help="Fecha final (AAAA-MM-DD). Por defecto, ayer")
+        parser.add_argument('--pendientes', action='store_true',
+                            help="Reconstruye solo las líneas pendientes, de cualquier fecha")
+
+    def handle(self, *args, **options):
+        if options['pendientes']:
+            fechas = LineaTiempo.fechas_pendientes()
+            guardadas = sum(LineaTiempo.actualizar(fecha) for fecha in fechas)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {guardadas} líneas pendientes reconstruidas en {len(fechas)} días"
+            ))
+            return
+
+        ayer = date.today() - timedelta(days=1)
+        try:
+            desde = date.fromisoformat(options['desde']) if options['desde'] else ayer
+            hasta = date.fromisoformat(options['hasta']) if options['hasta'] else ayer
+        except ValueError:
+            raise CommandError("Las fechas deben tener el formato AAAA-MM-DD")
+        if desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta")
+
+        # Día a día: cada uno en su transacción y con memoria acotada
+        guardadas = 0
+        fecha = desde
+        while fecha <= hasta:
+            guardadas += LineaTiempo.construir(fecha, fecha)
+            fecha += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {guardadas} líneas de tiempo reconstruidas ({desde} a {hasta})"
+        ))
@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.optimizador import OptimizadorTurnos
+
+
+class Command(BaseCommand):
+    help = (
+        "Programa turnos (ProgramaDiario) eligiendo horas de inicio que minimizan "
+        "la falta y el exceso de cobertura frente a la dotación requerida histórica"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Fecha inicial (AAAA-MM-DD). Por defecto, el próximo lunes")
+        parser.add_argument('--hasta', help="Fecha final (AAAA-MM-DD). Por defecto, desde + 6 días")
+        parser.add_argument('--intervalo', type=int, default=15, help="Minutos por intervalo")
+        parser.add_argument('--semanas', type=int, default=4,
+                            help="Semanas de historia para estimar la dotación requerida")
+        parser.add_argument('--reemplazar', action='store_true',
+                            help="Reemplaza los programas existentes del rango")
+        parser.add_argument('--dry-run', action='store_true', help="Calcula sin guardar")
+
+    def handle(self, *args, **options):
+        hoy = date.today()
+        try:
+            desde = (date.fromisoformat(options['desde']) if options['desde']
+                     else hoy + timedelta(days=7 - hoy.weekday()))
+            hasta = (date.fromisoformat(options['hasta']) if options['hasta']
+                     else desde + timedelta(days=6))
+        except ValueError:
+            raise CommandError("Las fechas deben tener el formato AAAA-MM-DD")
+        if desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta")
+        if options['intervalo'] <= 0 or 1440 % options['intervalo']:
+            raise CommandError("El intervalo debe dividir el día (p. ej. 15, 30 o 60)")
+
+        requeridos = OptimizadorTurnos.requeridos_historicos(
+            desde, hasta, options['intervalo'], options['semanas']
+        )
+        resumen, programas = OptimizadorTurnos.planificar(
+            desde, hasta, requeridos=requeridos, intervalo=options['intervalo'],
+            reemplazar=options['reemplazar'], guardar=not options['dry_run']
+        )
+
+        self.stdout.write(f"📅 {resumen['dias']} días laborables ({desde} a {hasta})")
+        self.stdout.write(f"   • Horas-agente faltantes: {resumen['horas_faltantes']}")
+        self.stdout.write(f"   • Horas-agente sobrantes: {resumen['horas_sobrantes']}")
+        if options['dry_run']:
+            self.stdout.write(f"🔍 Simulación: {len(programas)} turnos sin guardar")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ {len(programas)} turnos programados"))
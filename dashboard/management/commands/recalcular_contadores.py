@@ -0,0 +1,36 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.contadores import ContadoresDiarios
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los contadores diarios desde programas y actividades. "
+        "Las escrituras posteriores los mantienen al día solas"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Fecha inicial (AAAA-MM-DD). Por defecto, hace 7 días")
+        parser.add_argument('--hasta', help="Fecha final (AAAA-MM-DD). Por defecto, dentro de 7 días")
+
+    def handle(self, *args, **options):
+        hoy = date.today()
+        try:
+            desde = date.fromisoformat(options['desde']) if options['desde'] else hoy - timedelta(days=7)
+            hasta = date.fromisoformat(options['hasta']) if options['hasta'] else hoy + timedelta(days=7)
+        except ValueError:
+            raise CommandError("Las fechas deben tener el formato AAAA-MM-DD")
+        if desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta")
+
+        # Día a día: cada uno en su transacción
+        dias = 0
+        fecha = desde
+        while fecha <= hasta:
+            dias += ContadoresDiarios.recalcular(fecha, fecha)
+            fecha += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Contadores recalculados: {dias} días con datos ({desde} a {hasta})"
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.reparacion import REGLAS, ReparadorDatos
+
+
+class Command(BaseCommand):
+    help = "Corrige datos inválidos con UPDATEs por conjuntos (por rangos de id)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--regla', action='append', choices=REGLAS,
+                            help="Regla a aplicar (repetible). Por defecto, todas")
+        parser.add_argument('--lote', type=int, default=ReparadorDatos.LOTE,
+                            help="Tamaño del rango de ids por UPDATE")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Solo cuenta las filas que se corregirían")
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError("--lote debe ser positivo")
+
+        if options['dry_run']:
+            resultado = ReparadorDatos.contar(options['regla'])
+            verbo = 'a corregir'
+        else:
+            resultado = ReparadorDatos.reparar(options['regla'], lote=options['lote'])
+            verbo = 'corregidas'
+
+        for nombre, filas in resultado.items():
+            self.stdout.write(f"   • {ReparadorDatos.descripcion(nombre)}: {filas} filas {verbo}")
+
+        total = sum(resultado.values())
+        if options['dry_run']:
+            self.stdout.write(f"🔍 Simulación: {total} filas {verbo}")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ {total} filas corregidas"))
+            if total:
+                self.stdout.write("   Recalcule los resúmenes afectados con: python manage.py resumir_adherencia")
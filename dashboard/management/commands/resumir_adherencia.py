@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.routers import lectura_analitica
+from dashboard.utils import CalculadorAdherencia
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula los resúmenes diarios (con sketch de cuantiles) por tipo de "
+        "contrato y por equipo. Las vistas solo leen los guardados: ejecutar "
+        "cada noche (ayer) y con --faltantes para completar huecos"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Fecha inicial (AAAA-MM-DD). Por defecto, ayer")
+        parser.add_argument('--hasta', help="Fecha final (AAAA-MM-DD). Por defecto, ayer")
+        parser.add_argument('--faltantes', action='store_true',
+                            help="Solo los días del rango que aún no tienen resumen")
+
+    def handle(self, *args, **options):
+        ayer = date.today() - timedelta(days=1)
+        try:
+            desde = date.fromisoformat(options['desde']) if options['desde'] else ayer
+            hasta = date.fromisoformat(options['hasta']) if options['hasta'] else ayer
+        except ValueError:
+            raise CommandError("Las fechas deben tener el formato AAAA-MM-DD")
+        if desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta")
+
+        # Lee de la réplica analítica; los resúmenes se escriben en default
+        with lectura_analitica():
+            if options['faltantes']:
+                dias = CalculadorAdherencia.dias_sin_resumen(desde, hasta)
+                if not dias:
+                    self.stdout.write("ℹ️  No hay días sin resumen en el rango")
+                    return
+                desde, hasta = dias[0], dias[-1]
+            guardados = CalculadorAdherencia.actualizar_resumenes_diarios(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {guardados} resúmenes diarios actualizados ({desde} a {hasta})"
+        ))
@@ -0,0 +1,37 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.integridad import VerificadorIntegridad
+from dashboard.routers import lectura_analitica
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica la integridad de los datos y emite un reporte JSON. "
+        "Código de salida: 0 ok, 1 advertencias, 2 errores"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=7,
+                            help="Días recientes a revisar en programas y actividades (0 = todo)")
+        parser.add_argument('--salida', help="Escribe el reporte en este archivo en vez de stdout")
+        parser.add_argument('--indent', type=int, default=None, help="Sangría del JSON")
+
+    def handle(self, *args, **options):
+        if options['dias'] < 0:
+            raise CommandError("--dias no puede ser negativo")
+
+        with lectura_analitica():
+            reporte = VerificadorIntegridad.verificar(dias=options['dias'])
+        contenido = json.dumps(reporte, ensure_ascii=False, indent=options['indent'])
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(contenido + '\n')
+        else:
+            self.stdout.write(contenido)
+
+        if reporte['codigo_salida']:
+            sys.exit(reporte['codigo_salida'])
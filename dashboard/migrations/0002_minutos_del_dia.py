@@ -0,0 +1,91 @@
+# Generated by Django 5.1.7 on 2026-10-19 01:39
+
+from django.db import migrations, models
+from django.utils import timezone
+
+LOTE = 5000
+
+
+def _minuto(valor, fecha=None):
+    if hasattr(valor, 'date'):
+        local = timezone.localtime(valor) if timezone.is_aware(valor) else valor
+        dias = (local.date() - fecha).days if fecha is not None else 0
+        return dias * 1440 + local.hour * 60 + local.minute
+    return valor.hour * 60 + valor.minute
+
+
+def _por_lotes(modelo):
+    """Recorre la tabla por rangos de id para no cargarla completa"""
+    ultimo_id = 0
+    while True:
+        lote = list(modelo.objects.filter(id__gt=ultimo_id).order_by('id')[:LOTE])
+        if not lote:
+            break
+        yield lote
+        ultimo_id = lote[-1].id
+
+
+def rellenar_minutos(apps, schema_editor):
+    ProgramaDiario = apps.get_model('dashboard', 'ProgramaDiario')
+    RegistroActividad = apps.get_model('dashboard', 'RegistroActividad')
+
+    for lote in _por_lotes(ProgramaDiario):
+        for programa in lote:
+            programa.inicio_min = _minuto(programa.hora_inicio)
+            programa.fin_min = _minuto(programa.hora_fin)
+            if programa.fin_min <= programa.inicio_min:
+                programa.fin_min += 1440
+            programa.minutos_planificados = int(round(float(programa.horas_planificadas) * 60))
+        ProgramaDiario.objects.bulk_update(
+            lote, ['inicio_min', 'fin_min', 'minutos_planificados']
+        )
+
+    for lote in _por_lotes(RegistroActividad):
+        for actividad in lote:
+            actividad.inicio_min = _minuto(actividad.hora_inicio, actividad.fecha)
+            actividad.fin_min = _minuto(actividad.hora_fin, actividad.fecha)
+        RegistroActividad.objects.bulk_update(lote, ['inicio_min', 'fin_min'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='programadiario',
+            name='fin_min',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='programadiario',
+            name='inicio_min',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='programadiario',
+            name='minutos_planificados',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='registroactividad',
+            name='fin_min',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='registroactividad',
+            name='inicio_min',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.RunPython(rellenar_minutos, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='programadiario',
+            index=models.Index(fields=['fecha', 'inicio_min', 'fin_min', 'agente'], name='programa_fecha_min_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroactividad',
+            index=models.Index(fields=['fecha', 'tipo_actividad', 'inicio_min', 'fin_min', 'agente'], name='registro_fecha_tipo_min_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-19 01:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_minutos_del_dia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenAdherenciaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('tipo_contrato', models.CharField(choices=[('PT', 'Part-Time'), ('FT', 'Full-Time'), ('TEMP', 'Temporal')], max_length=4)),
+                ('cantidad_agentes', models.IntegerField(default=0)),
+                ('adherencia_suma', models.FloatField(default=0)),
+                ('minutos_planificados', models.BigIntegerField(default=0)),
+                ('minutos_productivos', models.BigIntegerField(default=0)),
+                ('sketch', models.BinaryField()),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['fecha', 'tipo_contrato'],
+                'unique_together': {('fecha', 'tipo_contrato')},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-19 01:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_resumen_adherencia_diaria'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenEquipoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('cantidad_agentes', models.IntegerField(default=0)),
+                ('adherencia_suma', models.FloatField(default=0)),
+                ('minutos_planificados', models.BigIntegerField(default=0)),
+                ('minutos_productivos', models.BigIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['fecha'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='agente',
+            index=models.Index(fields=['supervisor', 'activo', 'tipo_contrato'], name='agente_supervisor_idx'),
+        ),
+        migrations.AddField(
+            model_name='resumenequipodiario',
+            name='supervisor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_equipo', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='resumenequipodiario',
+            unique_together={('supervisor', 'fecha')},
+        ),
+    ]
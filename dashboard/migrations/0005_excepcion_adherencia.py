@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_resumen_equipo_diario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExcepcionAdherencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('tipo', models.CharField(choices=[('AUSENTE', 'Ausente en horario programado'), ('SIN_PROG', 'Trabajo fuera de programación'), ('ESTADO', 'Estado no productivo en horario programado')], max_length=8)),
+                ('inicio_min', models.SmallIntegerField()),
+                ('fin_min', models.SmallIntegerField()),
+                ('minutos', models.SmallIntegerField()),
+                ('agente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='excepciones', to='dashboard.agente')),
+            ],
+            options={
+                'ordering': ['fecha', 'agente', 'inicio_min'],
+                'indexes': [models.Index(fields=['fecha', 'minutos'], name='excepcion_fecha_min_idx')],
+            },
+        ),
+    ]
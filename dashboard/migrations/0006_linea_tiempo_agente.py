@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_excepcion_adherencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LineaTiempoAgente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('programado', models.BinaryField(default=b'')),
+                ('estados', models.BinaryField(default=b'')),
+                ('pendiente', models.BooleanField(default=True)),
+                ('agente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas_tiempo', to='dashboard.agente')),
+            ],
+            options={
+                'ordering': ['fecha', 'agente'],
+                'unique_together': {('fecha', 'agente')},
+            },
+        ),
+    ]
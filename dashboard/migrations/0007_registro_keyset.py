@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_linea_tiempo_agente'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registroactividad',
+            index=models.Index(fields=['fecha', 'hora_inicio', 'id'], name='registro_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroactividad',
+            index=models.Index(fields=['agente', 'fecha', 'hora_inicio', 'id'], name='registro_agente_keyset_idx'),
+        ),
+        # Después de crear el nuevo: en MySQL la FK de agente necesita un índice
+        migrations.RemoveIndex(
+            model_name='registroactividad',
+            name='dashboard_r_agente__7b30a4_idx',
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:32
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+DIAS_POR_LOTE = 31
+
+
+def recalcular_contadores(apps, schema_editor):
+    """Cuenta los programas y actividades existentes, por lotes de un mes"""
+    # Misma lógica que recalcular_contadores (agregados de los modelos)
+    from dashboard.contadores import ContadoresDiarios
+
+    rangos = [
+        apps.get_model('dashboard', nombre).objects.aggregate(desde=Min('fecha'), hasta=Max('fecha'))
+        for nombre in ('ProgramaDiario', 'RegistroActividad')
+    ]
+    fechas = [rango[clave] for rango in rangos for clave in ('desde', 'hasta') if rango[clave]]
+    if not fechas:
+        return
+    desde, hasta = min(fechas), max(fechas)
+    while desde <= hasta:
+        ContadoresDiarios.recalcular(desde, min(desde + timedelta(days=DIAS_POR_LOTE - 1), hasta))
+        desde += timedelta(days=DIAS_POR_LOTE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_registro_keyset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorDiario',
+            fields=[
+                ('fecha', models.DateField(primary_key=True, serialize=False)),
+                ('programas', models.IntegerField(default=0)),
+                ('minutos_programados', models.IntegerField(default=0)),
+                ('actividades', models.IntegerField(default=0)),
+                ('actividades_productivas', models.IntegerField(default=0)),
+                ('llamadas', models.IntegerField(default=0)),
+                ('llamadas_con_conversacion', models.IntegerField(default=0)),
+                ('minutos_conversacion', models.IntegerField(default=0)),
+                ('agentes_activos', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AgenteActivoDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('agente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.agente')),
+            ],
+            options={
+                'unique_together': {('fecha', 'agente')},
+            },
+        ),
+        migrations.RunPython(recalcular_contadores, migrations.RunPython.noop),
+    ]
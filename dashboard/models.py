@@ -1,6 +1,260 @@
-from django.db import models
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+
+def minuto_del_dia(valor, fecha=None):
+    """
+    Minuto del día (0-1439) para un TimeField o DateTimeField.
+    Con ``fecha``, los DateTimeField de días posteriores suman 1440 por día
+    (actividades que cruzan la medianoche).
+    """
+    if hasattr(valor, 'date'):
+        local = timezone.localtime(valor) if timezone.is_aware(valor) else valor
+        dias = (local.date() - fecha).days if fecha is not None else 0
+        return dias * 1440 + local.hour * 60 + local.minute
+    return valor.hour * 60 + valor.minute
+
+
+class MinutosQuerySet(models.QuerySet):
+    """
+    QuerySet que completa las columnas de minutos también en bulk_create,
+    que no pasa por Model.save()
+    """
+
+    @transaction.atomic
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.calcular_minutos()
+        creados = super().bulk_create(objs, *args, **kwargs)
+        if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+            # No se sabe qué filas entraron: se recuentan sus días
+            from .contadores import ContadoresDiarios
+            for fecha in {obj.fecha for obj in objs}:
+                ContadoresDiarios.recalcular(fecha, fecha)
+        else:
+            contar(self.model, objs)
+        registrar_cambios(self.model, [(obj.agente_id, obj.fecha, obj.fin_min) for obj in objs])
+        return creados
+
+    @transaction.atomic
+    def delete(self):
+        # Aportes a los contadores por día en una consulta, antes de borrar
+        por_fecha = {
+            fila.pop('fecha'): fila
+            for fila in self.order_by().values('fecha').annotate(**self.model.agregados_contador())
+        }
+        # Agente-día borrados (con el fin_min mayor, que decide si toca el día siguiente)
+        filas = list(self.order_by().values_list('agente_id', 'fecha').annotate(ultimo_fin=Max('fin_min')))
+        resultado = super().delete()
+        sumar_contadores(por_fecha, signo=-1)
+        if self.model is RegistroActividad:
+            actualizar_agentes_activos({(agente_id, fecha) for agente_id, fecha, _ in filas}, agregados=False)
+        registrar_cambios(self.model, filas)
+        return resultado
+
+
+# Se envía al confirmar la transacción en que cambiaron programas o
+# actividades (save, delete, bulk_create o delete de un QuerySet), una vez por
+# modelo, con sender=modelo y filas=[(agente_id, fecha, fin_min)]
+datos_modificados = Signal()
+
+
+def registrar_cambios(modelo, filas):
+    """
+    Marca las líneas de tiempo de `filas` y avisa a datos_modificados al
+    confirmar la transacción (una sola vez por modelo y transacción)
+    """
+    filas = list(filas)
+    invalidar_lineas_tiempo(filas)
+    al_confirmar(
+        ('datos_modificados', modelo),
+        lambda acumuladas: datos_modificados.send(sender=modelo, filas=sorted(acumuladas)),
+        filas,
+    )
+
+
+def contar(modelo, objetos, anteriores=()):
+    """
+    Suma a los contadores diarios los aportes de `objetos` y resta los de
+    `anteriores` (filas borradas o la versión previa de una fila guardada):
+    cada día recibe un solo UPDATE con la diferencia neta
+    """
+    por_fecha = defaultdict(lambda: defaultdict(int))
+    for signo, grupo in ((1, objetos), (-1, anteriores)):
+        for obj in grupo:
+            for campo, valor in obj.aportes_contador().items():
+                por_fecha[obj.fecha][campo] += signo * valor
+    sumar_contadores(por_fecha)
+    if modelo is RegistroActividad:
+        # Solo cambian las presencias de los agente-día que entran o salen
+        despues = {(obj.agente_id, obj.fecha) for obj in objetos}
+        antes = {(obj.agente_id, obj.fecha) for obj in anteriores}
+        actualizar_agentes_activos(despues - antes, agregados=True)
+        actualizar_agentes_activos(antes - despues, agregados=False)
+
+
+def sumar_contadores(por_fecha, signo=1):
+    """
+    Suma (o resta) a ContadorDiario los aportes {fecha: {campo: valor}} con
+    F(): cada día es un UPDATE atómico, sin leer el valor anterior
+    """
+    for fecha, aportes in por_fecha.items():
+        cambios = {campo: F(campo) + signo * valor for campo, valor in aportes.items() if valor}
+        if not cambios or ContadorDiario.objects.filter(fecha=fecha).update(**cambios):
+            continue
+        if signo < 0 or any(valor < 0 for valor in aportes.values()):
+            continue  # día nunca contado: lo pone al día recalcular_contadores
+        try:
+            with transaction.atomic():
+                ContadorDiario.objects.create(fecha=fecha, **aportes)
+        except IntegrityError:
+            # Otro proceso creó el día entre el UPDATE y el INSERT
+            ContadorDiario.objects.filter(fecha=fecha).update(**cambios)
+
+
+def actualizar_agentes_activos(pares, agregados=True):
+    """
+    Mantiene AgenteActivoDia para los (agente_id, fecha) de `pares` (alta al
+    agregar actividades; baja si ya no le queda ninguna) y recuenta
+    ContadorDiario.agentes_activos de esos días en un UPDATE
+    """
+    pares = set(pares)
+    if not pares:
+        return
+    if agregados:
+        AgenteActivoDia.objects.bulk_create(
+            [AgenteActivoDia(agente_id=agente_id, fecha=fecha) for agente_id, fecha in pares],
+            ignore_conflicts=True,
+        )
+    else:
+        por_fecha = defaultdict(set)
+        for agente_id, fecha in pares:
+            por_fecha[fecha].add(agente_id)
+        for fecha, agentes in por_fecha.items():
+            AgenteActivoDia.objects.filter(fecha=fecha, agente_id__in=agentes).exclude(Exists(
+                RegistroActividad.objects.filter(agente_id=OuterRef('agente_id'), fecha=OuterRef('fecha'))
+            )).delete()
+
+    ContadorDiario.objects.filter(fecha__in={fecha for _, fecha in pares}).update(
+        agentes_activos=Coalesce(Subquery(
+            AgenteActivoDia.objects.filter(fecha=OuterRef('fecha')).order_by().values('fecha')
+            .annotate(n=Count('id')).values('n')
+        ), 0)
+    )
+
+
+def al_confirmar(nombre, accion, elementos):
+    """
+    Acumula `elementos` y llama una sola vez a accion(elementos) al confirmar
+    la transacción en curso (de inmediato fuera de una transacción): las
+    escrituras de una misma transacción comparten la llamada
+    """
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        accion(set(elementos))
+        return
+    acumulados = conexion.__dict__.setdefault('adherencia_al_confirmar', {})
+    pendiente = acumulados.get(nombre)
+    # Tras un rollback la llamada ya no está registrada: se empieza de nuevo
+    if pendiente is None or not any(pendiente['ejecutar'] in entrada for entrada in conexion.run_on_commit):
+        pendiente = acumulados[nombre] = {'elementos': set()}
+
+        def ejecutar(pendiente=pendiente):
+            if acumulados.get(nombre) is pendiente:
+                del acumulados[nombre]
+            accion(pendiente['elementos'])
+
+        pendiente['ejecutar'] = ejecutar
+        # Un fallo aquí no afecta a lo ya confirmado: se registra y sigue
+        transaction.on_commit(ejecutar, robust=True)
+    pendiente['elementos'].update(elementos)
+
+
+def reconstruir_lineas_tiempo(agentes_dia):
+    """Reconstruye las líneas de tiempo de los (agente_id, fecha) indicados"""
+    from .lineatiempo import LineaTiempo
+
+    # Un agente borrado en la misma transacción ya no tiene líneas
+    existentes = set(Agente.objects.filter(
+        id__in={agente_id for agente_id, _ in agentes_dia}
+    ).values_list('id', flat=True))
+    por_fecha = defaultdict(set)
+    for agente_id, fecha in agentes_dia:
+        if agente_id in existentes:
+            por_fecha[fecha].add(agente_id)
+    for fecha, agentes in sorted(por_fecha.items()):
+        LineaTiempo.construir(fecha, fecha, agente_ids=agentes)
+
+
+def invalidar_lineas_tiempo(filas):
+    """
+    Marca como pendientes las líneas de tiempo (LineaTiempoAgente) de los
+    agente-día de `filas` (agente_id, fecha, fin_min); un fin_min > 1440
+    toca también el día siguiente. Las que no existen se crean pendientes.
+    Al confirmar la transacción se reconstruyen; la marca queda si el
+    proceso cae antes (construir_lineas_tiempo --pendientes)
+    """
+    por_fecha = defaultdict(set)
+    for agente_id, fecha, fin_min in filas:
+        por_fecha[fecha].add(agente_id)
+        if fin_min > 1440:
+            por_fecha[fecha + timedelta(days=1)].add(agente_id)
+
+    for fecha, agentes in por_fecha.items():
+        actualizadas = LineaTiempoAgente.objects.filter(
+            fecha=fecha, agente_id__in=agentes
+        ).update(pendiente=True)
+        if actualizadas < len(agentes):
+            LineaTiempoAgente.objects.bulk_create(
+                [LineaTiempoAgente(agente_id=agente_id, fecha=fecha) for agente_id in agentes],
+                ignore_conflicts=True,
+            )
+
+    if getattr(settings, 'ADHERENCIA_LINEAS_TIEMPO', True):
+        al_confirmar('lineas_tiempo', reconstruir_lineas_tiempo, {
+            (agente_id, fecha) for fecha, agentes in por_fecha.items() for agente_id in agentes
+        })
+
+
+class MinutosModel(models.Model):
+    """
+    Base de ProgramaDiario y RegistroActividad: completa las columnas de
+    minutos al guardar y mantiene al día las líneas de tiempo y los
+    contadores diarios
+    """
+    
+    class Meta:
+        abstract = True
+    
+    # Fila y contadores en la misma transacción (ver ContadoresDiarios.recalcular)
+    @transaction.atomic
+    def save(self, *args, **kwargs):
+        self.calcular_minutos()
+        anterior = type(self).objects.filter(pk=self.pk).first() if self.pk else None
+        super().save(*args, **kwargs)
+        filas = [(self.agente_id, self.fecha, self.fin_min)]
+        if anterior:
+            filas.append((anterior.agente_id, anterior.fecha, anterior.fin_min))
+        contar(type(self), [self], anteriores=[anterior] if anterior else [])
+        registrar_cambios(type(self), filas)
+    
+    @transaction.atomic
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        contar(type(self), [], anteriores=[self])
+        registrar_cambios(type(self), [(self.agente_id, self.fecha, self.fin_min)])
+        return resultado
+
 
 class Agente(models.Model):
     TIPO_CONTRATO = [
@@ -21,6 +275,10 @@ class Agente(models.Model):
     
     class Meta:
         ordering = ['codigo']
+        indexes = [
+            models.Index(fields=['supervisor', 'activo', 'tipo_contrato'],
+                         name='agente_supervisor_idx'),
+        ]
     
     def __str__(self):
         return f"{self.codigo} - {self.nombre} {self.apellido}"
@@ -33,7 +291,7 @@ class Agente(models.Model):
     def es_full_time(self):
         return self.tipo_contrato == 'FT'
 
-class ProgramaDiario(models.Model):
+class ProgramaDiario(MinutosModel):
     agente = models.ForeignKey(Agente, on_delete=models.CASCADE, related_name='programas')
     fecha = models.DateField()
     turno = models.CharField(max_length=50)
@@ -41,15 +299,41 @@ class ProgramaDiario(models.Model):
     hora_fin = models.TimeField()
     horas_planificadas = models.DecimalField(max_digits=4, decimal_places=2)
     pausas_planificadas = models.DecimalField(max_digits=4, decimal_places=2, default=1.0)
+    # Columnas desnormalizadas (se calculan en save/bulk_create)
+    inicio_min = models.SmallIntegerField(default=0)
+    fin_min = models.SmallIntegerField(default=0)  # > 1440 si el turno cruza la medianoche
+    minutos_planificados = models.PositiveSmallIntegerField(default=0)
+    
+    objects = MinutosQuerySet.as_manager()
     
     class Meta:
         unique_together = ['agente', 'fecha']
         ordering = ['fecha', 'hora_inicio']
+        indexes = [
+            models.Index(fields=['fecha', 'inicio_min', 'fin_min', 'agente'],
+                         name='programa_fecha_min_idx'),
+        ]
     
     def __str__(self):
         return f"{self.agente.codigo} - {self.fecha}"
+    
+    def calcular_minutos(self):
+        self.inicio_min = minuto_del_dia(self.hora_inicio)
+        self.fin_min = minuto_del_dia(self.hora_fin)
+        if self.fin_min <= self.inicio_min:
+            self.fin_min += 1440
+        self.minutos_planificados = int(round(float(self.horas_planificadas) * 60))
+    
+    def aportes_contador(self):
+        """Lo que suma el programa a su ContadorDiario"""
+        return {'programas': 1, 'minutos_programados': self.minutos_planificados}
+    
+    @staticmethod
+    def agregados_contador():
+        """aportes_contador como agregados de un queryset"""
+        return {'programas': Count('id'), 'minutos_programados': Sum('minutos_planificados', default=0)}
 
-class RegistroActividad(models.Model):
+class RegistroActividad(MinutosModel):
     TIPO_ACTIVIDAD = [
         ('LLAMADA', 'En llamada'),
         ('PAUSA', 'Pausa activa'),
@@ -60,6 +344,7 @@ class RegistroActividad(models.Model):
         ('ALMUERZO', 'Almuerzo'),
         ('AUSENTE', 'Ausente'),
     ]
+    TIPOS_PRODUCTIVOS = ['LLAMADA', 'DISPO', 'CAPAC', 'ADMIN']
     
     agente = models.ForeignKey(Agente, on_delete=models.CASCADE, related_name='actividades')
     fecha = models.DateField()
@@ -69,16 +354,56 @@ class RegistroActividad(models.Model):
     duracion_minutos = models.IntegerField()
     llamadas_atendidas = models.IntegerField(default=0)
     tiempo_conversacion = models.IntegerField(default=0)  # en minutos
+    # Minuto local del día (se calculan en save/bulk_create)
+    inicio_min = models.SmallIntegerField(default=0)
+    fin_min = models.SmallIntegerField(default=0)  # > 1440 si cruza la medianoche
+    
+    objects = MinutosQuerySet.as_manager()
     
     class Meta:
         ordering = ['-fecha', '-hora_inicio']
         indexes = [
-            models.Index(fields=['agente', 'fecha']),
             models.Index(fields=['tipo_actividad', 'fecha']),
+            models.Index(fields=['fecha', 'tipo_actividad', 'inicio_min', 'fin_min', 'agente'],
+                         name='registro_fecha_tipo_min_idx'),
+            # Paginación por clave (ver eventos.py); el de agente reemplaza a (agente, fecha)
+            models.Index(fields=['fecha', 'hora_inicio', 'id'], name='registro_keyset_idx'),
+            models.Index(fields=['agente', 'fecha', 'hora_inicio', 'id'],
+                         name='registro_agente_keyset_idx'),
         ]
     
     def __str__(self):
         return f"{self.agente.codigo} - {self.tipo_actividad} - {self.fecha}"
+    
+    def calcular_minutos(self):
+        self.inicio_min = minuto_del_dia(self.hora_inicio, self.fecha)
+        self.fin_min = minuto_del_dia(self.hora_fin, self.fecha)
+    
+    def aportes_contador(self):
+        """Lo que suma la actividad a su ContadorDiario"""
+        llamada = self.tipo_actividad == 'LLAMADA'
+        conversacion = llamada and self.tiempo_conversacion > 0
+        return {
+            'actividades': 1,
+            'actividades_productivas': int(self.tipo_actividad in self.TIPOS_PRODUCTIVOS),
+            'llamadas': int(llamada),
+            'llamadas_con_conversacion': int(conversacion),
+            'minutos_conversacion': self.tiempo_conversacion if conversacion else 0,
+        }
+    
+    @staticmethod
+    def agregados_contador():
+        """aportes_contador como agregados de un queryset"""
+        conversacion = models.Q(tipo_actividad='LLAMADA', tiempo_conversacion__gt=0)
+        return {
+            'actividades': Count('id'),
+            'actividades_productivas': Count(
+                'id', filter=models.Q(tipo_actividad__in=RegistroActividad.TIPOS_PRODUCTIVOS)
+            ),
+            'llamadas': Count('id', filter=models.Q(tipo_actividad='LLAMADA')),
+            'llamadas_con_conversacion': Count('id', filter=conversacion),
+            'minutos_conversacion': Sum('tiempo_conversacion', filter=conversacion, default=0),
+        }
 
 class KPIMeta(models.Model):
     nombre = models.CharField(max_length=100)
@@ -109,4 +434,137 @@ class FactorImpacto(models.Model):
     ])
     
     def __str__(self):
-        return f"{self.nombre} ({self.impacto_porcentaje}%)"
\ No newline at end of file
+        return f"{self.nombre} ({self.impacto_porcentaje}%)"
+
+
+class ResumenAdherenciaDiaria(models.Model):
+    """
+    Agregado diario por tipo de contrato, con el sketch de cuantiles de las
+    adherencias agente-día (ver dashboard/cuantiles.py)
+    """
+    fecha = models.DateField()
+    tipo_contrato = models.CharField(max_length=4, choices=Agente.TIPO_CONTRATO)
+    cantidad_agentes = models.IntegerField(default=0)
+    adherencia_suma = models.FloatField(default=0)
+    minutos_planificados = models.BigIntegerField(default=0)
+    minutos_productivos = models.BigIntegerField(default=0)
+    sketch = models.BinaryField()
+    actualizado = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['fecha', 'tipo_contrato']
+        ordering = ['fecha', 'tipo_contrato']
+    
+    def __str__(self):
+        return f"{self.fecha} - {self.tipo_contrato}"
+    
+    @property
+    def adherencia_promedio(self):
+        return round(self.adherencia_suma / self.cantidad_agentes, 2) if self.cantidad_agentes else 0
+
+
+
+class ResumenEquipoDiario(models.Model):
+    """
+    Agregado diario por equipo (agentes de un mismo supervisor)
+    """
+    fecha = models.DateField()
+    supervisor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='resumenes_equipo')
+    cantidad_agentes = models.IntegerField(default=0)
+    adherencia_suma = models.FloatField(default=0)
+    minutos_planificados = models.BigIntegerField(default=0)
+    minutos_productivos = models.BigIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['supervisor', 'fecha']
+        ordering = ['fecha']
+    
+    def __str__(self):
+        return f"{self.fecha} - {self.supervisor}"
+    
+    @property
+    def adherencia_promedio(self):
+        return round(self.adherencia_suma / self.cantidad_agentes, 2) if self.cantidad_agentes else 0
+
+class ExcepcionAdherencia(models.Model):
+    """
+    Tramo de un agente-día fuera de adherencia (ver dashboard/excepciones.py)
+    """
+    TIPO_EXCEPCION = [
+        ('AUSENTE', 'Ausente en horario programado'),
+        ('SIN_PROG', 'Trabajo fuera de programación'),
+        ('ESTADO', 'Estado no productivo en horario programado'),
+    ]
+    
+    agente = models.ForeignKey(Agente, on_delete=models.CASCADE, related_name='excepciones')
+    fecha = models.DateField()
+    tipo = models.CharField(max_length=8, choices=TIPO_EXCEPCION)
+    # Minutos del día [inicio_min, fin_min)
+    inicio_min = models.SmallIntegerField()
+    fin_min = models.SmallIntegerField()
+    minutos = models.SmallIntegerField()
+    
+    class Meta:
+        ordering = ['fecha', 'agente', 'inicio_min']
+        indexes = [
+            models.Index(fields=['fecha', 'minutos'], name='excepcion_fecha_min_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.agente} - {self.fecha} {self.get_tipo_display()} ({self.minutos} min)"
+
+
+
+class LineaTiempoAgente(models.Model):
+    """
+    Línea de tiempo de un agente-día: un bitset empaquetado (np.packbits,
+    1440 bits = 180 bytes) de los minutos programados y uno por tipo de
+    actividad, en el orden de RegistroActividad.TIPO_ACTIVIDAD (ver
+    dashboard/lineatiempo.py). `pendiente` indica que sus programas o
+    actividades cambiaron y hay que reconstruirla.
+    """
+    agente = models.ForeignKey(Agente, on_delete=models.CASCADE, related_name='lineas_tiempo')
+    fecha = models.DateField()
+    programado = models.BinaryField(default=b'')
+    estados = models.BinaryField(default=b'')
+    pendiente = models.BooleanField(default=True)
+    
+    class Meta:
+        unique_together = ['fecha', 'agente']
+        ordering = ['fecha', 'agente']
+    
+    def __str__(self):
+        return f"{self.agente_id} - {self.fecha}"
+
+
+class ContadorDiario(models.Model):
+    """
+    Totales del día que se mantienen al escribir programas y actividades
+    (save, delete, bulk_create y delete de querysets), para leer las
+    estadísticas del encabezado con una lectura por clave primaria
+    """
+    fecha = models.DateField(primary_key=True)
+    programas = models.IntegerField(default=0)
+    minutos_programados = models.IntegerField(default=0)
+    actividades = models.IntegerField(default=0)
+    actividades_productivas = models.IntegerField(default=0)
+    llamadas = models.IntegerField(default=0)
+    llamadas_con_conversacion = models.IntegerField(default=0)
+    minutos_conversacion = models.IntegerField(default=0)
+    agentes_activos = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-fecha']
+    
+    def __str__(self):
+        return f"{self.fecha} - {self.actividades} actividades"
+
+
+class AgenteActivoDia(models.Model):
+    """Agentes con al menos una actividad en el día (para agentes_activos)"""
+    agente = models.ForeignKey(Agente, on_delete=models.CASCADE)
+    fecha = models.DateField()
+    
+    class Meta:
+        unique_together = ['fecha', 'agente']
@@ -0,0 +1,188 @@
+# dashboard/optimizador.py
+"""
+Optimizador de horarios de inicio de turno.
+
+Dada la dotación requerida por intervalo (p. ej. la de Erlang C, ver
+``Dimensionamiento``) y el contrato de cada agente (``horas_semana`` repartidas
+en los días laborables), elige la hora de inicio de cada turno minimizando la
+falta y el exceso de cobertura. Se trabaja sobre el vector de cobertura de cada
+día: una asignación voraz (turnos más largos primero) seguida de pasadas de
+búsqueda local que reubican cada turno en su mejor inicio con los demás fijos.
+El costo de cada inicio posible sale de una suma por ventana sobre sumas
+prefijas, así que una semana de 1.000 agentes se resuelve en segundos.
+"""
+
+import math
+from datetime import time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+
+from .dimensionamiento import MINUTOS_DIA, Dimensionamiento
+from .models import Agente, ProgramaDiario
+
+PESO_FALTANTE = 3.0   # un intervalo sin cubrir pesa más que uno sobrado
+PESO_SOBRANTE = 1.0
+
+
+def _hora(minuto):
+    return f"{minuto // 60:02d}:{minuto % 60:02d}"
+
+
+class OptimizadorTurnos:
+    """
+    Asignación de turnos por día sobre vectores de cobertura
+    """
+
+    PASADAS = 5
+
+    @staticmethod
+    def _costos(cobertura, requeridos, largo):
+        """Variación del costo cuadrático al agregar un turno de `largo` en cada inicio"""
+        diferencia = cobertura - requeridos
+        delta = (2 * diferencia + 1) * np.where(diferencia < 0, PESO_FALTANTE, PESO_SOBRANTE)
+        acumulado = np.concatenate(([0.0], np.cumsum(delta)))
+        return acumulado[largo:] - acumulado[:-largo]
+
+    @staticmethod
+    def _mejor_inicio(cobertura, requeridos, largo, primero, ultimo):
+        ultimo = max(primero, min(ultimo - largo, len(requeridos) - largo))
+        costos = OptimizadorTurnos._costos(cobertura, requeridos, largo)[primero:ultimo + 1]
+        return primero + int(np.argmin(costos))
+
+    @staticmethod
+    def optimizar_dia(requeridos, largos, primero=0, ultimo=None, base=None):
+        """
+        requeridos: agentes requeridos por intervalo; largos: intervalos de turno
+        de cada agente; [primero, ultimo): ventana de intervalos en que pueden
+        caer los turnos; base: cobertura ya programada. Devuelve (inicios, cobertura).
+        """
+        requeridos = np.asarray(requeridos, dtype=np.float64)
+        largos = np.asarray(largos, dtype=np.int64)
+        ultimo = len(requeridos) if ultimo is None else ultimo
+        cobertura = np.zeros(len(requeridos)) if base is None else np.asarray(base, dtype=np.float64).copy()
+        inicios = np.zeros(len(largos), dtype=np.int64)
+        orden = np.argsort(-largos, kind='stable')
+
+        for i in orden:
+            largo = largos[i]
+            inicios[i] = OptimizadorTurnos._mejor_inicio(cobertura, requeridos, largo, primero, ultimo)
+            cobertura[inicios[i]:inicios[i] + largo] += 1
+
+        # Búsqueda local: reubicar cada turno con el resto fijo
+        for _ in range(OptimizadorTurnos.PASADAS):
+            cambios = 0
+            for i in orden:
+                largo, actual = largos[i], inicios[i]
+                cobertura[actual:actual + largo] -= 1
+                nuevo = OptimizadorTurnos._mejor_inicio(cobertura, requeridos, largo, primero, ultimo)
+                cobertura[nuevo:nuevo + largo] += 1
+                if nuevo != actual:
+                    inicios[i] = nuevo
+                    cambios += 1
+            if not cambios:
+                break
+        return inicios, cobertura
+
+    @staticmethod
+    def requeridos_historicos(fecha_inicio, fecha_fin, intervalo=15, semanas=4):
+        """
+        Requeridos por día e intervalo: promedio (redondeado hacia arriba) del
+        mismo día de la semana en las `semanas` anteriores a fecha_inicio
+        """
+        desde = fecha_inicio - timedelta(weeks=semanas)
+        historia = Dimensionamiento.comparar(desde, fecha_inicio - timedelta(days=1), intervalo)
+        dia_semana = np.array([f.weekday() for f in historia['fechas']])
+
+        filas = []
+        fecha = fecha_inicio
+        while fecha <= fecha_fin:
+            mismos = historia['requeridos'][dia_semana == fecha.weekday()]
+            filas.append(np.ceil(mismos.mean(axis=0)) if len(mismos) else
+                         np.zeros(MINUTOS_DIA // intervalo))
+            fecha += timedelta(days=1)
+        return np.array(filas)
+
+    @staticmethod
+    def planificar(fecha_inicio, fecha_fin, requeridos=None, agentes=None, intervalo=15,
+                   apertura_min=8 * 60, cierre_min=20 * 60, reemplazar=False, guardar=True):
+        """
+        Programa los días laborables del rango. Sin `reemplazar`, los programas
+        existentes se respetan y cuentan como cobertura base. Devuelve un
+        resumen y la lista de ProgramaDiario (guardados con bulk_create si
+        `guardar`).
+        """
+        if requeridos is None:
+            requeridos = OptimizadorTurnos.requeridos_historicos(fecha_inicio, fecha_fin, intervalo)
+        if agentes is None:
+            agentes = Agente.objects.filter(activo=True)
+        agentes = list(agentes.values_list('id', 'tipo_contrato', 'horas_semana'))
+
+        # Turno diario = horas_semana repartidas en 5 días, en intervalos enteros
+        largos = np.array([
+            max(1, round(horas_semana / 5 * 60 / intervalo)) for _, _, horas_semana in agentes
+        ], dtype=np.int64)
+        primero, ultimo = apertura_min // intervalo, math.ceil(cierre_min / intervalo)
+
+        existentes = {}
+        if not reemplazar:
+            for agente_id, fecha, inicio, fin in ProgramaDiario.objects.filter(
+                fecha__range=[fecha_inicio, fecha_fin],
+                agente_id__in=[agente_id for agente_id, _, _ in agentes],
+            ).values_list('agente_id', 'fecha', 'inicio_min', 'fin_min'):
+                existentes.setdefault(fecha, []).append((agente_id, inicio, fin))
+
+        programas = []
+        resumen = {'dias': 0, 'turnos': 0, 'horas_faltantes': 0.0, 'horas_sobrantes': 0.0}
+        fecha = fecha_inicio
+        for fila in np.asarray(requeridos, dtype=np.float64):
+            if fecha.weekday() < 5:
+                base = np.zeros(len(fila))
+                fijos = set()
+                for agente_id, inicio, fin in existentes.get(fecha, []):
+                    base[inicio // intervalo:math.ceil(min(fin, MINUTOS_DIA) / intervalo)] += 1
+                    fijos.add(agente_id)
+                libres = [i for i, (agente_id, _, _) in enumerate(agentes) if agente_id not in fijos]
+
+                inicios, cobertura = OptimizadorTurnos.optimizar_dia(
+                    fila, largos[libres], primero, ultimo, base
+                )
+                for i, inicio in zip(libres, inicios.tolist()):
+                    agente_id, tipo_contrato, _ = agentes[i]
+                    programas.append(OptimizadorTurnos._programa(
+                        agente_id, tipo_contrato, fecha, inicio * intervalo, int(largos[i]) * intervalo
+                    ))
+
+                resumen['dias'] += 1
+                resumen['turnos'] += len(libres)
+                resumen['horas_faltantes'] += float(np.clip(fila - cobertura, 0, None).sum()) * intervalo / 60
+                resumen['horas_sobrantes'] += float(np.clip(cobertura - fila, 0, None).sum()) * intervalo / 60
+            fecha += timedelta(days=1)
+
+        resumen['horas_faltantes'] = round(resumen['horas_faltantes'], 1)
+        resumen['horas_sobrantes'] = round(resumen['horas_sobrantes'], 1)
+
+        if guardar:
+            with transaction.atomic():
+                if reemplazar:
+                    ProgramaDiario.objects.filter(
+                        fecha__range=[fecha_inicio, fecha_fin],
+                        agente_id__in=[agente_id for agente_id, _, _ in agentes],
+                    ).delete()
+                ProgramaDiario.objects.bulk_create(programas, batch_size=2000)
+        return resumen, programas
+
+    @staticmethod
+    def _programa(agente_id, tipo_contrato, fecha, inicio_min, minutos):
+        fin_min = (inicio_min + minutos) % MINUTOS_DIA
+        return ProgramaDiario(
+            agente_id=agente_id,
+            fecha=fecha,
+            turno=f"Optimizado{' PT' if tipo_contrato == 'PT' else ''} "
+                  f"({_hora(inicio_min)}-{_hora(fin_min)})",
+            hora_inicio=time(inicio_min // 60, inicio_min % 60),
+            hora_fin=time(fin_min // 60, fin_min % 60),
+            horas_planificadas=(Decimal(minutos) / 60).quantize(Decimal('0.01')),
+            pausas_planificadas=Decimal('1.0') if minutos >= 8 * 60 else Decimal('0.5'),
+        )
@@ -0,0 +1,147 @@
+# dashboard/ranking.py
+"""
+Ranking de adherencia sobre toda la población de agentes.
+
+Los minutos planificados y productivos de cada agente se obtienen en una sola
+consulta agrupada (subconsultas correlacionadas sobre ProgramaDiario y
+RegistroActividad) y se suman los meses archivados. El ranking ordenado queda
+en caché por versión de los datos (ver fragmentos.py) y la paginación busca
+el cursor (adherencia, id) con bisección, sin OFFSET ni volver a calcular la
+población: cada página cuesta lo mismo con 50 o con 5.000 agentes.
+"""
+
+import bisect
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .archivo import ArchivoActividad, TIPOS_PRODUCTIVOS
+from .fragmentos import VersionDatos
+from .models import Agente, ProgramaDiario, RegistroActividad
+
+
+def _clave(orden):
+    """Clave de orden creciente: 'top' = mejor adherencia primero"""
+    if orden == 'top':
+        return lambda f: (-f['adherencia'], f['id'])
+    return lambda f: (f['adherencia'], f['id'])
+
+
+def _suma_por_agente(queryset, campo):
+    """Subconsulta correlacionada: SUM(campo) del agente externo"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(agente=OuterRef('pk'))
+            .order_by()
+            .values('agente')
+            .annotate(total=Sum(campo))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+class RankingAgentes:
+    """
+    Top-K / bottom-K de agentes por adherencia con paginación por cursor
+    """
+
+    @staticmethod
+    def agentes(tipo_contrato=None, supervisor_id=None, activo=True):
+        agentes = Agente.objects.filter(activo=activo)
+        if tipo_contrato:
+            agentes = agentes.filter(tipo_contrato=tipo_contrato)
+        if supervisor_id:
+            agentes = agentes.filter(supervisor_id=supervisor_id)
+        return agentes
+
+    @staticmethod
+    def calcular(fecha_inicio, fecha_fin, tipo_contrato=None, supervisor_id=None):
+        """
+        Adherencia de todos los agentes filtrados en una sola consulta.
+        Devuelve una lista de dicts (solo agentes con programación).
+        """
+        programas = ProgramaDiario.objects.filter(fecha__range=[fecha_inicio, fecha_fin])
+        productivas = ArchivoActividad.sin_archivadas(RegistroActividad.objects.filter(
+            fecha__range=[fecha_inicio, fecha_fin],
+            tipo_actividad__in=TIPOS_PRODUCTIVOS
+        ), fecha_inicio, fecha_fin)
+
+        filas = RankingAgentes.agentes(tipo_contrato, supervisor_id).annotate(
+            planificado=_suma_por_agente(programas, 'minutos_planificados'),
+            productivo=_suma_por_agente(productivas, 'duracion_minutos'),
+        ).filter(planificado__gt=0).values_list(
+            'id', 'codigo', 'nombre', 'apellido', 'tipo_contrato', 'planificado', 'productivo'
+        )
+
+        archivado = {}
+        if ArchivoActividad.meses_en_rango(fecha_inicio, fecha_fin):
+            archivado = ArchivoActividad.tiempo_productivo_por_agente(fecha_inicio, fecha_fin)
+
+        resultados = []
+        for agente_id, codigo, nombre, apellido, tipo, planificado, productivo in filas:
+            productivo += archivado.get(agente_id, 0)
+            resultados.append({
+                'id': agente_id,
+                'codigo': codigo,
+                'nombre': f"{nombre} {apellido}",
+                'tipo_contrato': tipo,
+                'adherencia': round(min(productivo / planificado * 100, 100), 2),
+                'tiempo_productivo': productivo,
+                'tiempo_planificado': planificado,
+            })
+        return resultados
+
+    @staticmethod
+    def codificar_cursor(fila):
+        return f"{fila['adherencia']:.2f}_{fila['id']}"
+
+    @staticmethod
+    def decodificar_cursor(cursor):
+        """'87.50_123' -> (87.5, 123); ValueError si el cursor no es válido"""
+        adherencia, agente_id = cursor.split('_')
+        return float(adherencia), int(agente_id)
+
+    @staticmethod
+    def ordenado(fecha_inicio, fecha_fin, tipo_contrato=None, supervisor_id=None, orden='top'):
+        """
+        calcular ordenado según `orden`, en caché por versión vigente de los
+        datos: las páginas siguientes no vuelven a consultar la población
+        """
+        clave = (f"adherencia:ranking:{VersionDatos.vigente()}:{fecha_inicio}:{fecha_fin}:"
+                 f"{tipo_contrato or ''}:{supervisor_id or ''}:{orden}")
+        return cache.get_or_set(
+            clave,
+            lambda: sorted(
+                RankingAgentes.calcular(fecha_inicio, fecha_fin, tipo_contrato, supervisor_id),
+                key=_clave(orden),
+            ),
+            timeout=getattr(settings, 'ADHERENCIA_FRAGMENTOS_SEGUNDOS', 300),
+        )
+
+    @staticmethod
+    def pagina(filas, limite=10, orden='top', cursor=None):
+        """
+        Página de `limite` filas de un ranking ya ordenado por `orden` (ver
+        ordenado): adherencia desc para 'top', asc para 'bottom', desempatando
+        por id. Devuelve (filas, siguiente_cursor).
+        """
+        clave = _clave(orden)
+        desde = 0
+        if cursor:
+            adherencia, agente_id = RankingAgentes.decodificar_cursor(cursor)
+            desde = bisect.bisect_right(filas, clave({'adherencia': adherencia, 'id': agente_id}), key=clave)
+
+        seleccion = filas[desde:desde + limite]
+        siguiente = None
+        if desde + limite < len(filas):
+            siguiente = RankingAgentes.codificar_cursor(seleccion[-1])
+        return seleccion, siguiente
+
+    @staticmethod
+    def top(fecha_inicio, fecha_fin, k=5, tipo_contrato=None, supervisor_id=None, orden='top'):
+        filas = RankingAgentes.ordenado(fecha_inicio, fecha_fin, tipo_contrato, supervisor_id, orden)
+        return RankingAgentes.pagina(filas, limite=k, orden=orden)[0]
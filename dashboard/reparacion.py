@@ -0,0 +1,127 @@
+# dashboard/reparacion.py
+"""
+Correcciones de datos por conjuntos.
+
+Cada regla es un ``UPDATE ... WHERE`` con ``Case/When`` que se ejecuta por
+rangos de id (cada rango en su propia sentencia, así los bloqueos duran poco),
+en lugar de recorrer la tabla completa con ``save()`` fila por fila. El modo
+simulación cuenta las filas afectadas de todas las reglas de un modelo en una
+sola consulta con agregados condicionales.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Case, Count, Exists, F, Max, Min, OuterRef, Q, Value, When
+
+from .contadores import ContadoresDiarios
+from .models import Agente, ProgramaDiario, RegistroActividad, datos_modificados
+
+
+def _es_part_time():
+    return Exists(Agente.objects.filter(pk=OuterRef('agente_id'), tipo_contrato='PT'))
+
+
+def _reglas():
+    """{nombre: (descripción, modelo, condición, cambios)}"""
+    return {
+        'duraciones_negativas': (
+            'Actividades con duración negativa',
+            RegistroActividad,
+            Q(duracion_minutos__lt=0),
+            {'duracion_minutos': -F('duracion_minutos')},
+        ),
+        'horas_semana': (
+            'Horas semanales distintas a las del contrato (FT 40h / PT 20h)',
+            Agente,
+            Q(tipo_contrato='FT') & ~Q(horas_semana=40) | Q(tipo_contrato='PT') & ~Q(horas_semana=20),
+            {'horas_semana': Case(When(tipo_contrato='FT', then=Value(40)), default=Value(20))},
+        ),
+        'horas_planificadas_cero': (
+            'Programas sin horas planificadas (PT 4h / resto 8h)',
+            ProgramaDiario,
+            Q(horas_planificadas__lte=0),
+            {
+                'horas_planificadas': Case(
+                    When(_es_part_time(), then=Value(Decimal('4.00'))),
+                    default=Value(Decimal('8.00')),
+                ),
+                'minutos_planificados': Case(
+                    When(_es_part_time(), then=Value(240)), default=Value(480)
+                ),
+            },
+        ),
+        'horas_pt_excedidas': (
+            'Programas PT con más de 5h planificadas (se normalizan a 4h)',
+            ProgramaDiario,
+            Q(horas_planificadas__gt=5) & Q(_es_part_time()),
+            {'horas_planificadas': Value(Decimal('4.00')), 'minutos_planificados': Value(240)},
+        ),
+    }
+
+
+REGLAS = tuple(_reglas())
+
+
+class ReparadorDatos:
+    """
+    Aplica (o simula) las reglas de corrección por rangos de id
+    """
+
+    LOTE = 100000
+
+    @staticmethod
+    def _seleccionar(nombres=None):
+        reglas = _reglas()
+        if nombres:
+            desconocidas = set(nombres) - set(reglas)
+            if desconocidas:
+                raise ValueError(f"Reglas desconocidas: {', '.join(sorted(desconocidas))}")
+            reglas = {nombre: reglas[nombre] for nombre in REGLAS if nombre in nombres}
+        return reglas
+
+    @staticmethod
+    def contar(nombres=None):
+        """Filas afectadas por regla, un único agregado condicional por modelo"""
+        reglas = ReparadorDatos._seleccionar(nombres)
+        por_modelo = {}
+        for nombre, (_, modelo, condicion, _) in reglas.items():
+            por_modelo.setdefault(modelo, {})[nombre] = Count('pk', filter=condicion)
+
+        conteos = {}
+        for modelo, agregados in por_modelo.items():
+            conteos.update(modelo.objects.order_by().aggregate(**agregados))
+        return {nombre: conteos[nombre] for nombre in reglas}
+
+    @staticmethod
+    def _rangos(modelo, lote):
+        limites = modelo.objects.aggregate(minimo=Min('pk'), maximo=Max('pk'))
+        if limites['minimo'] is None:
+            return
+        desde = limites['minimo']
+        while desde <= limites['maximo']:
+            yield desde, desde + lote
+            desde += lote
+
+    @staticmethod
+    def reparar(nombres=None, lote=None):
+        """Ejecuta las reglas; devuelve las filas actualizadas por regla"""
+        lote = lote or ReparadorDatos.LOTE
+        actualizadas = {}
+        for nombre, (_, modelo, condicion, cambios) in ReparadorDatos._seleccionar(nombres).items():
+            actualizadas[nombre] = 0
+            fechas = set()
+            for desde, hasta in ReparadorDatos._rangos(modelo, lote):
+                filas = modelo.objects.filter(condicion, pk__gte=desde, pk__lt=hasta)
+                if modelo in (ProgramaDiario, RegistroActividad):
+                    # update() no pasa por save(): los días tocados se recuentan después
+                    fechas.update(filas.order_by().values_list('fecha', flat=True).distinct())
+                actualizadas[nombre] += filas.update(**cambios)
+            if fechas:
+                ContadoresDiarios.recalcular(min(fechas), max(fechas))
+            if actualizadas[nombre]:
+                datos_modificados.send(sender=modelo, filas=[])
+        return actualizadas
+
+    @staticmethod
+    def descripcion(nombre):
+        return _reglas()[nombre][0]
@@ -0,0 +1,95 @@
+# dashboard/routers.py
+"""
+Router de base de datos para lecturas analíticas.
+
+Las lecturas de los modelos de ``dashboard`` hechas dentro de
+``lectura_analitica()`` (vistas del dashboard, APIs, comandos de cálculo) van
+al alias ``ADHERENCIA_DB_ANALITICA`` (una réplica); todo lo demás, incluidas
+las escrituras y el simulador, usa ``default``. Si el alias no está definido en
+DATABASES, todo sigue en ``default``.
+
+Con ``AdherenciaDBMiddleware`` las lecturas son pegajosas: después de una
+escritura en la misma petición (o en las últimas
+``ADHERENCIA_DB_PEGAJOSA_SEGUNDOS`` del mismo navegador) se vuelve a leer de
+``default`` para ver los propios cambios aunque la réplica vaya atrasada.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+COOKIE_PRIMARIA = 'adherencia_db_primaria'
+
+_analitica = ContextVar('adherencia_lectura_analitica', default=False)
+# Estado de la petición en curso: {'escribio': bool}; None fuera de una petición
+_peticion = ContextVar('adherencia_peticion_db', default=None)
+
+
+def alias_analitica():
+    alias = getattr(settings, 'ADHERENCIA_DB_ANALITICA', 'analytics')
+    return alias if alias in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def lectura_analitica():
+    """Contexto (o decorador, ``@lectura_analitica()``) de lecturas analíticas"""
+    token = _analitica.set(True)
+    try:
+        yield
+    finally:
+        _analitica.reset(token)
+
+
+class RouterAnalitica:
+    """
+    Lecturas analíticas a la réplica; escrituras siempre a default
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'dashboard' or not _analitica.get():
+            return None
+        peticion = _peticion.get()
+        if peticion is not None and peticion['escribio']:
+            return DEFAULT_DB_ALIAS
+        # Dentro de una transacción de default se lee lo que ella ve
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias_analitica()
+
+    def db_for_write(self, model, **hints):
+        # Solo las escrituras de dashboard (las únicas lecturas que van a la
+        # réplica) fijan default; las del caché o las sesiones no
+        peticion = _peticion.get()
+        if (peticion is not None and model._meta.app_label == 'dashboard'
+                and getattr(settings, 'ADHERENCIA_DB_PEGAJOSA', True)):
+            peticion['escribio'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # default y la réplica contienen los mismos datos
+        return True
+
+
+class AdherenciaDBMiddleware:
+    """
+    Lecturas pegajosas a default tras una escritura (read-your-writes)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pegajosa = getattr(settings, 'ADHERENCIA_DB_PEGAJOSA', True)
+        token = _peticion.set({'escribio': pegajosa and COOKIE_PRIMARIA in request.COOKIES})
+        try:
+            response = self.get_response(request)
+            escribio = _peticion.get()['escribio']
+        finally:
+            _peticion.reset(token)
+
+        segundos = getattr(settings, 'ADHERENCIA_DB_PEGAJOSA_SEGUNDOS', 5)
+        if pegajosa and segundos and escribio and COOKIE_PRIMARIA not in request.COOKIES:
+            response.set_cookie(COOKIE_PRIMARIA, '1', max_age=segundos, httponly=True, samesite='Lax')
+        return response
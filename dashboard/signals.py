@@ -0,0 +1,56 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .contadores import ContadoresDiarios
+from .fragmentos import VersionDatos
+from .impacto import SimuladorImpacto
+from .jornada import JornadaAgente
+from .models import (
+    Agente, FactorImpacto, KPIMeta, ProgramaDiario, RegistroActividad, ResumenAdherenciaDiaria,
+    ResumenEquipoDiario, al_confirmar, datos_modificados,
+)
+
+
+@receiver(post_save, sender=FactorImpacto)
+@receiver(post_delete, sender=FactorImpacto)
+def invalidar_impacto(sender, **kwargs):
+    """Las simulaciones en caché dejan de valer al cambiar un factor"""
+    SimuladorImpacto.invalidar()
+
+
+@receiver(datos_modificados)
+@receiver(post_save, sender=Agente)
+@receiver(post_delete, sender=Agente)
+@receiver(post_save, sender=KPIMeta)
+@receiver(post_delete, sender=KPIMeta)
+@receiver(post_save, sender=ResumenAdherenciaDiaria)
+@receiver(post_save, sender=ResumenEquipoDiario)
+def invalidar_fragmentos(sender, **kwargs):
+    """Los fragmentos de plantilla en caché dejan de valer al cambiar los datos"""
+    VersionDatos.invalidar()
+
+
+@receiver(datos_modificados)
+@receiver(post_delete, sender=Agente)
+def invalidar_jornadas(sender, filas=None, **kwargs):
+    """Las jornadas en caché de los agente-día modificados dejan de valer"""
+    JornadaAgente.invalidar(filas)
+
+
+@receiver(pre_delete, sender=Agente)
+def anotar_dias_agente(sender, instance, **kwargs):
+    """
+    El borrado en cascada de programas y actividades no pasa por
+    MinutosQuerySet.delete: se anotan los días del agente para recontarlos
+    """
+    instance._dias_con_datos = set(
+        ProgramaDiario.objects.filter(agente=instance).values_list('fecha', flat=True).distinct()
+    ).union(RegistroActividad.objects.filter(agente=instance).values_list('fecha', flat=True).distinct())
+
+
+@receiver(post_delete, sender=Agente)
+def recontar_dias_agente(sender, instance, **kwargs):
+    """Los contadores de esos días se rehacen al confirmar el borrado"""
+    dias = getattr(instance, '_dias_con_datos', None)
+    if dias:
+        al_confirmar('contadores', ContadoresDiarios.recalcular_dias, dias)
@@ -1,3 +1,1290 @@
-from django.test import TestCase
+import importlib
+import json
+import math
+import os
+import tempfile
+from concurrent.futures import Executor, Future
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import models
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .admin import PaginadorEstimado
+from .analizador import AnalizadorProblemas, CuboAdherencia, intervalos, ocupacion_dia
+from .archivo import ArchivoActividad
+from .cargador import CargadorDatos
+from .columnas import TIPO_COLUMNAS, RespuestaColumnar
+from .contadores import ContadoresDiarios
+from .cuantiles import SketchCuantiles
+from .dimensionamiento import Dimensionamiento
+from .eventos import EventosActividad
+from .excepciones import MotorExcepciones, segmentos
+from .fragmentos import VersionDatos
+from .impacto import SimuladorImpacto
+from .instantanea import InstantaneaDashboard
+from .jornada import JornadaAgente
+from .lote import CalculoLote, _calcular_tramo
+from .lineatiempo import LineaTiempo
+from .models import (
+    Agente, AgenteActivoDia, ContadorDiario, ExcepcionAdherencia, FactorImpacto, LineaTiempoAgente,
+    ProgramaDiario, RegistroActividad, ResumenAdherenciaDiaria, ResumenEquipoDiario,
+)
+from .optimizador import OptimizadorTurnos
+from .ranking import RankingAgentes
+from .reparacion import ReparadorDatos
+from .routers import COOKIE_PRIMARIA, AdherenciaDBMiddleware, RouterAnalitica, lectura_analitica
+from .utils import CalculadorAdherencia, SimuladorDatos
+
+FECHA = date.today() - timedelta(days=3)
+
+
+def crear_agente(codigo, tipo_contrato='FT', supervisor=None):
+    return Agente.objects.create(
+        codigo=codigo, nombre='Agente', apellido=codigo, tipo_contrato=tipo_contrato,
+        email=f'{codigo.lower()}@test.com', fecha_ingreso=date(2024, 1, 1), supervisor=supervisor,
+    )
+
+
+def programa(agente, fecha, inicio, fin, horas=8):
+    return ProgramaDiario(
+        agente=agente, fecha=fecha, turno=f'{inicio}-{fin}',
+        hora_inicio=time.fromisoformat(inicio), hora_fin=time.fromisoformat(fin),
+        horas_planificadas=Decimal(horas),
+    )
+
+
+def actividad(agente, fecha, inicio, minutos, tipo='LLAMADA', conversacion=0, duracion=None):
+    hora_inicio = timezone.make_aware(datetime.combine(fecha, time.fromisoformat(inicio)))
+    return RegistroActividad(
+        agente=agente, fecha=fecha, hora_inicio=hora_inicio,
+        hora_fin=hora_inicio + timedelta(minutes=minutos), tipo_actividad=tipo,
+        duracion_minutos=minutos if duracion is None else duracion,
+        llamadas_atendidas=int(tipo == 'LLAMADA'), tiempo_conversacion=conversacion,
+    )
+
+
+def mes_cerrado():
+    """Primer día del mes anterior al anterior"""
+    return (date.today().replace(day=1) - timedelta(days=40)).replace(day=1)
+
+
+class ArchivoActividadTest(TestCase):
+    """Ida y vuelta del archivo columnar"""
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        ajustes = override_settings(ADHERENCIA_ARCHIVO_DIR=self.directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        mes = mes_cerrado()
+        self.anio, self.mes = mes.year, mes.month
+        self.desde, self.hasta = mes, (mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        self.agentes = [crear_agente('AGT001'), crear_agente('AGT002', 'PT')]
+        # duracion_minutos distinta del tramo: el archivo debe guardar la de la base
+        RegistroActividad.objects.bulk_create([
+            actividad(agente, mes + timedelta(days=dia), inicio, minutos, tipo,
+                      conversacion=minutos // 2, duracion=minutos - 5)
+            for agente in self.agentes
+            for dia in (0, 9, 20)
+            for inicio, minutos, tipo in (('08:00', 45, 'LLAMADA'), ('09:00', 15, 'PAUSA'), ('23:40', 30, 'DISPO'))
+        ])
+
+    def cargar(self):
+        df = CargadorDatos.cargar_actividades(self.desde, self.hasta)
+        return sorted(map(tuple, df.astype({'tipo': str}).to_numpy().tolist()))
+
+    def contadores(self):
+        return [
+            (c.actividades, c.llamadas, c.minutos_conversacion, c.agentes_activos)
+            for c in ContadoresDiarios.dias(*(self.desde + timedelta(days=d) for d in (0, 9, 20))).values()
+        ]
+
+    def test_ida_y_vuelta(self):
+        antes, contadores = self.cargar(), self.contadores()
+        productivo = ArchivoActividad.sin_archivadas(
+            RegistroActividad.objects.filter(tipo_actividad__in=RegistroActividad.TIPOS_PRODUCTIVOS),
+            self.desde, self.hasta,
+        ).values('agente_id').order_by('agente_id').annotate(total=models.Sum('duracion_minutos'))
+
+        esperado = {fila['agente_id']: fila['total'] for fila in productivo}
+        movidas = ArchivoActividad.archivar_mes(self.anio, self.mes)
+
+        self.assertEqual(movidas, len(antes))
+        self.assertFalse(RegistroActividad.objects.filter(fecha__range=[self.desde, self.hasta]).exists())
+        self.assertEqual(self.cargar(), antes)
+        self.assertEqual(ArchivoActividad.tiempo_productivo_por_agente(self.desde, self.hasta), esperado)
+        # Los contadores históricos no cambian al archivar
+        self.assertEqual(self.contadores(), contadores)
+        self.assertEqual(contadores[0], (6, 2, 44, 2))
+
+    def test_mes_abierto(self):
+        with self.assertRaises(ValueError):
+            ArchivoActividad.archivar_mes(date.today().year, date.today().month)
+
+    def test_corte_entre_escritura_y_borrado(self):
+        antes = self.cargar()
+        with mock.patch.object(models.QuerySet, 'delete', side_effect=RuntimeError('corte')):
+            with self.assertRaises(RuntimeError):
+                ArchivoActividad.archivar_mes(self.anio, self.mes)
+        # Archivadas y aún en la base: se leen una sola vez
+        self.assertEqual(self.cargar(), antes)
+
+        ArchivoActividad.archivar_mes(self.anio, self.mes)
+        columnas = ArchivoActividad.cargar_mes(self.anio, self.mes)
+        self.assertEqual(len(columnas['id']), len(antes))
+        self.assertEqual(len(np.unique(columnas['id'])), len(antes))
+        self.assertEqual(self.cargar(), antes)
+
+
+class MinutosDelDiaTest(TestCase):
+    """Columnas de minutos: save, turnos nocturnos y relleno de la migración 0002"""
+
+    def setUp(self):
+        self.agente = crear_agente('AGT001')
+
+    def test_turno_y_actividad_nocturnos(self):
+        turno = programa(self.agente, FECHA, '22:00', '06:00')
+        turno.save()
+        nocturna = actividad(self.agente, FECHA, '23:30', 60)
+        nocturna.save()
+        self.assertEqual((turno.inicio_min, turno.fin_min, turno.minutos_planificados), (1320, 1800, 480))
+        self.assertEqual((nocturna.inicio_min, nocturna.fin_min), (1410, 1470))
+
+    def test_relleno_de_la_migracion(self):
+        ProgramaDiario.objects.bulk_create([programa(self.agente, FECHA, '22:00', '06:00')])
+        RegistroActividad.objects.bulk_create([
+            actividad(self.agente, FECHA, '09:15', 30), actividad(self.agente, FECHA, '23:50', 20),
+        ])
+        esperado = sorted(RegistroActividad.objects.values_list('inicio_min', 'fin_min'))
+        ProgramaDiario.objects.update(inicio_min=0, fin_min=0, minutos_planificados=0)
+        RegistroActividad.objects.update(inicio_min=0, fin_min=0)
+
+        migracion = importlib.import_module('dashboard.migrations.0002_minutos_del_dia')
+        migracion.rellenar_minutos(apps, None)
+
+        self.assertEqual(sorted(RegistroActividad.objects.values_list('inicio_min', 'fin_min')), esperado)
+        self.assertEqual(esperado[-1], (1430, 1450))
+        self.assertEqual(
+            list(ProgramaDiario.objects.values_list('inicio_min', 'fin_min', 'minutos_planificados')),
+            [(1320, 1800, 480)],
+        )
+
+
+class AnalizadorProblemasTest(SimpleTestCase):
+    """Análisis en una pasada de un vector de ocupación de 08:00 a 10:00"""
+
+    def setUp(self):
+        activos = np.r_[np.full(60, 10), np.full(60, 3)]
+        activos_total = activos + np.r_[np.full(30, 2), np.zeros(90, dtype=int)]
+        self.ocupacion = {
+            'inicio_min': 480,
+            'programados': np.full(120, 10),
+            'activos': activos,
+            'activos_total': activos_total,
+        }
+
+    def test_resumen_por_hora(self):
+        problemas = AnalizadorProblemas.analizar(self.ocupacion)
+        self.assertEqual(problemas['resumen_por_hora']['08:00']['adherencia'], 100.0)
+        self.assertEqual(problemas['resumen_por_hora']['09:00']['adherencia'], 30.0)
+        self.assertEqual(problemas['resumen_por_hora']['09:00']['consistencia'], 0.0)
+        self.assertEqual(problemas['histograma_por_hora']['09:00']['20-40%'], 60)
+        self.assertEqual(problemas['histograma_por_hora']['08:00']['80-100%'], 60)
+        self.assertEqual(
+            problemas['horas_criticas'],
+            [{'hora': '09:00', 'minutos_criticos': 60, 'adherencia_promedio': 30.0}],
+        )
+
+    def test_rachas_y_peores_minutos(self):
+        problemas = AnalizadorProblemas.analizar(self.ocupacion, peores=3)
+        self.assertEqual(
+            [(h['inicio'], h['fin'], h['minutos']) for h in problemas['huecos_productividad']],
+            [('09:00', '10:00', 60)],
+        )
+        self.assertEqual(
+            [(s['inicio'], s['fin'], s['adherencia_promedio']) for s in problemas['sobrecargas']],
+            [('08:00', '08:30', 120.0)],
+        )
+        self.assertEqual([m['minuto'] for m in problemas['peores_minutos']], ['09:00', '09:01', '09:02'])
+
+    def test_minutos_sin_programacion(self):
+        self.ocupacion['programados'] = np.zeros(120, dtype=int)
+        problemas = AnalizadorProblemas.analizar(self.ocupacion)
+        self.assertEqual(problemas['peores_minutos'], [])
+        self.assertEqual(problemas['huecos_productividad'], [])
+        self.assertEqual(problemas['resumen_por_hora']['08:00']['adherencia'], 0)
+
+
+class SketchCuantilesTest(SimpleTestCase):
+    """Sketch de cuantiles: precisión, fusión y serialización"""
+
+    def setUp(self):
+        self.valores = np.random.default_rng(7).uniform(0, 100, 20000)
+
+    def test_cuantiles_aproximados(self):
+        sketch = SketchCuantiles().agregar(self.valores)
+        self.assertLessEqual(len(sketch), 100)
+        self.assertEqual(sketch.total, len(self.valores))
+        for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+            self.assertAlmostEqual(sketch.cuantil(q), np.quantile(self.valores, q), delta=1.0)
+
+    def test_fusion_y_bytes(self):
+        partes = [
+            SketchCuantiles.desde_bytes(SketchCuantiles().agregar(parte).a_bytes())
+            for parte in np.array_split(self.valores, 30)
+        ]
+        fusionado = SketchCuantiles.fusionar_todos(partes)
+        self.assertEqual(fusionado.total, len(self.valores))
+        for q in (0.1, 0.5, 0.9):
+            self.assertAlmostEqual(fusionado.cuantil(q), np.quantile(self.valores, q), delta=1.0)
+
+    def test_vacio_y_nan(self):
+        self.assertIsNone(SketchCuantiles().cuantil(0.5))
+        self.assertIsNone(SketchCuantiles.desde_bytes(b'').cuantil(0.5))
+        self.assertEqual(SketchCuantiles().agregar([np.nan, 40.0]).cuantil(0.5), 40.0)
+
+
+class ResumenesAlVueloTest(TestCase):
+    """Días cerrados sin resumen guardado: se calculan al vuelo, sin escribir"""
+
+    def setUp(self):
+        self.supervisor = User.objects.create_user('supervisor')
+        self.agentes = [crear_agente(f'AGT00{i}', supervisor=self.supervisor) for i in range(1, 5)]
+        self.dias = [FECHA - timedelta(days=1), FECHA]
+        ProgramaDiario.objects.bulk_create([
+            programa(agente, fecha, '08:00', '16:00') for agente in self.agentes for fecha in self.dias
+        ])
+        RegistroActividad.objects.bulk_create([
+            actividad(agente, fecha, '08:00', 60 * (i + 1) + 30 * d)
+            for i, agente in enumerate(self.agentes) for d, fecha in enumerate(self.dias)
+        ])
+        # Solo el primer día tiene resúmenes guardados
+        CalculadorAdherencia.actualizar_resumenes_diarios(self.dias[0], self.dias[0])
+        self.diarias = CalculadorAdherencia.adherencias_por_agente(None, self.dias[0], self.dias[1], por_dia=True)
+
+    def test_percentiles(self):
+        guardados = ResumenAdherenciaDiaria.objects.count()
+        percentiles = CalculadorAdherencia.percentiles_adherencia('FT', self.dias[0], self.dias[1])
+        self.assertEqual(percentiles['agentes_dia'], 8)
+        self.assertEqual(percentiles['promedio'], round(self.diarias['adherencia'].mean(), 2))
+        self.assertEqual(percentiles['p50'], round(self.diarias['adherencia'].median(), 2))
+        self.assertEqual(ResumenAdherenciaDiaria.objects.count(), guardados)
+
+    def test_equipos(self):
+        guardados = ResumenEquipoDiario.objects.count()
+        equipo, = CalculadorAdherencia.resumen_equipos(self.dias[0], self.dias[1], por_dia=True)
+        self.assertEqual(equipo['agentes_dia'], 8)
+        self.assertEqual(equipo['adherencia_promedio'], round(self.diarias['adherencia'].mean(), 2))
+        self.assertEqual([d['fecha'] for d in equipo['dias']], [f.strftime('%Y-%m-%d') for f in self.dias])
+        self.assertEqual(ResumenEquipoDiario.objects.count(), guardados)
+
+
+class RankingAgentesTest(TestCase):
+    """Ranking de toda la población con paginación por cursor"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('supervisor')
+        agentes = [crear_agente(f'AGT{i:03d}', 'FT' if i % 3 else 'PT') for i in range(1, 13)]
+        ProgramaDiario.objects.bulk_create([programa(agente, FECHA, '08:00', '16:00') for agente in agentes])
+        # Adherencias repetidas de a pares para probar el desempate por id
+        RegistroActividad.objects.bulk_create([
+            actividad(agente, FECHA, '08:00', 48 * (i // 2 + 1)) for i, agente in enumerate(agentes)
+        ])
+
+    def recorrer(self, orden, limite=5, **filtros):
+        vistos, cursor = [], None
+        while True:
+            filas = RankingAgentes.ordenado(FECHA, FECHA, orden=orden, **filtros)
+            pagina, cursor = RankingAgentes.pagina(filas, limite=limite, orden=orden, cursor=cursor)
+            vistos.extend((f['adherencia'], f['id']) for f in pagina)
+            if cursor is None:
+                return vistos
+
+    def test_paginas_en_orden(self):
+        todos = [(f['adherencia'], f['id']) for f in RankingAgentes.calcular(FECHA, FECHA)]
+        self.assertEqual(self.recorrer('top'), sorted(todos, key=lambda f: (-f[0], f[1])))
+        self.assertEqual(self.recorrer('bottom', limite=4), sorted(todos))
+        self.assertEqual(len(self.recorrer('top', tipo_contrato='PT')), 4)
+        self.assertEqual(RankingAgentes.top(FECHA, FECHA, k=1)[0]['adherencia'], 60.0)
+
+    def test_paginas_desde_el_cache(self):
+        filas = RankingAgentes.ordenado(FECHA, FECHA)
+        with mock.patch.object(RankingAgentes, 'calcular') as calcular:
+            self.assertEqual(RankingAgentes.ordenado(FECHA, FECHA), filas)
+        calcular.assert_not_called()
+
+    def test_parametros_de_la_api(self):
+        self.client.force_login(self.usuario)
+        for parametros, estado in (
+            ('dias=x', 400), ('tipo=XX', 400), ('cursor=abc', 400), ('orden=medio', 400),
+            ('dias=-5', 200), ('dias=100000', 200), ('tipo=PT&limite=2', 200),
+        ):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get(f'/api/ranking-agentes/?{parametros}').status_code, estado)
+
+
+class ResumenEquiposTest(TestCase):
+    """Agregados por equipo desde ResumenEquipoDiario"""
+
+    def setUp(self):
+        self.supervisores = [User.objects.create_user(f'sup{i}', first_name=f'Sup {i}') for i in (1, 2)]
+        self.dia = FECHA
+        agentes = [
+            crear_agente(f'AGT00{i}', supervisor=self.supervisores[i % 2]) for i in range(1, 5)
+        ] + [crear_agente('AGT009')]  # sin supervisor
+        ProgramaDiario.objects.bulk_create([programa(agente, self.dia, '08:00', '16:00') for agente in agentes])
+        RegistroActividad.objects.bulk_create([
+            actividad(agente, self.dia, '08:00', 120 * i) for i, agente in enumerate(agentes, 1)
+        ])
+        CalculadorAdherencia.actualizar_resumenes_diarios(self.dia, self.dia)
+
+    def test_equipos(self):
+        equipos = CalculadorAdherencia.resumen_equipos(self.dia, self.dia)
+        # sup1: AGT002 (50%) y AGT004 (100%); sup2: AGT001 (25%) y AGT003 (75%)
+        self.assertEqual(
+            [(e['supervisor'], e['agentes_dia'], e['adherencia_promedio']) for e in equipos],
+            [('Sup 1', 2, 75.0), ('Sup 2', 2, 50.0)],
+        )
+        equipo, = CalculadorAdherencia.resumen_equipos(
+            self.dia, self.dia, supervisor_id=self.supervisores[1].id, por_dia=True
+        )
+        self.assertEqual(equipo['dias'], [{'fecha': str(self.dia), 'agentes': 2, 'adherencia': 50.0}])
+
+    def test_dias_sin_resumen_de_equipo(self):
+        self.assertEqual(CalculadorAdherencia.dias_sin_resumen(self.dia, self.dia), [])
+        # Día resumido antes de existir los agregados por equipo
+        ResumenEquipoDiario.objects.all().delete()
+        self.assertEqual(CalculadorAdherencia.dias_sin_resumen(self.dia, self.dia), [self.dia])
+
+    def test_apis(self):
+        self.client.force_login(self.supervisores[0])
+        respuesta = self.client.get('/api/equipos/?dias=5').json()
+        self.assertEqual([e['supervisor_id'] for e in respuesta['equipos']], [s.id for s in self.supervisores])
+        detalle = self.client.get(f'/api/equipos/{self.supervisores[0].id}/?dias=5').json()
+        self.assertEqual(detalle['equipo']['agentes_dia'], 2)
+        self.assertEqual([a['codigo'] for a in detalle['agentes']], ['AGT004', 'AGT002'])
+        for url, estado in (
+            ('/api/equipos/?dias=x', 400),
+            ('/api/equipos/?dias=-3', 200),
+            (f'/api/equipos/{self.supervisores[0].id}/?dias=x', 400),
+            ('/api/equipos/999999/', 404),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, estado)
+
+
+class AdminTablaGrandeTest(TestCase):
+    """Admin de las tablas grandes: conteo estimado, filtro de agente y copia de semana"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@test.com', 'clave'))
+        self.agentes = [crear_agente('AGT001'), crear_agente('AGT002')]
+        ProgramaDiario.objects.bulk_create([
+            programa(agente, FECHA - timedelta(days=d), '08:00', '16:00') for agente in self.agentes for d in (0, 1)
+        ])
+        actividad(self.agentes[0], FECHA, '08:00', 30).save()
+
+    def test_conteo_estimado(self):
+        paginador = PaginadorEstimado(RegistroActividad.objects.all(), 20)
+        self.assertEqual(paginador.count, 1)  # sqlite: sin estimación, exacto
+        for estimado, esperado in ((PaginadorEstimado.UMBRAL * 3, PaginadorEstimado.UMBRAL * 3), (10, 1)):
+            with mock.patch.object(PaginadorEstimado, '_estimar', return_value=estimado):
+                self.assertEqual(PaginadorEstimado(RegistroActividad.objects.all(), 20).count, esperado)
+
+    def test_filtro_de_agente(self):
+        url = '/admin/dashboard/registroactividad/'
+        self.assertEqual(self.client.get(url, {'agente__id__exact': 'abc'}).status_code, 200)
+        respuesta = self.client.get(url, {'agente__id__exact': self.agentes[1].id})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.context['cl'].result_list), 0)
+
+    def test_copiar_a_proxima_semana(self):
+        programa(self.agentes[0], FECHA + timedelta(days=7), '10:00', '18:00').save()
+        respuesta = self.client.post('/admin/dashboard/programadiario/', {
+            'action': 'copiar_a_proxima_semana',
+            '_selected_action': list(ProgramaDiario.objects.filter(fecha__lte=FECHA).values_list('pk', flat=True)),
+        })
+        self.assertEqual(respuesta.status_code, 302)
+        copias = ProgramaDiario.objects.filter(fecha__gt=FECHA)
+        self.assertEqual(copias.count(), 4)
+        # El día que ya tenía programación se respeta
+        self.assertEqual(copias.get(agente=self.agentes[0], fecha=FECHA + timedelta(days=7)).turno, '10:00-18:00')
+        self.assertEqual(ContadoresDiarios.del_dia(FECHA + timedelta(days=6)).programas, 2)
+
+
+class VerificadorIntegridadTest(TestCase):
+    """Reporte de integridad y códigos de salida de verificar_integridad"""
+
+    def setUp(self):
+        self.agente = crear_agente('AGT001')
+        programa(self.agente, FECHA, '08:00', '16:00').save()
+        RegistroActividad.objects.bulk_create([
+            actividad(self.agente, FECHA, '08:00', 60), actividad(self.agente, FECHA, '09:00', 30, 'PAUSA'),
+        ])
+
+    def verificar(self):
+        salida = StringIO()
+        try:
+            call_command('verificar_integridad', stdout=salida)
+            codigo = 0
+        except SystemExit as salida_comando:
+            codigo = salida_comando.code
+        reporte = json.loads(salida.getvalue())
+        self.assertEqual(reporte['codigo_salida'], codigo)
+        fallas = {v['nombre']: v['nivel'] for v in reporte['verificaciones'] if v['nivel'] != 'ok'}
+        return codigo, fallas
+
+    def test_datos_sanos(self):
+        self.assertEqual(self.verificar(), (0, {}))
+
+    def test_advertencias(self):
+        actividad(self.agente, FECHA, '17:00', 30).save()
+        self.assertEqual(self.verificar(), (1, {'fuera_de_turno': 'advertencia'}))
+
+    def test_errores(self):
+        actividad(self.agente, FECHA, '08:30', 20, 'DISPO').save()
+        actividad(crear_agente('AGT002'), FECHA, '10:00', 30).save()
+        self.assertEqual(self.verificar(), (2, {'solapadas': 'error', 'huerfanas': 'error'}))
+
+    def test_dias_negativo(self):
+        with self.assertRaises(CommandError):
+            call_command('verificar_integridad', dias=-1, stdout=StringIO())
+
+
+class RouterAnaliticaTest(SimpleTestCase):
+    """Lecturas a la réplica y pegajosas a default tras escribir"""
+
+    def setUp(self):
+        self.router = RouterAnalitica()
+        replica = mock.patch('dashboard.routers.alias_analitica', return_value='analytics')
+        replica.start()
+        self.addCleanup(replica.stop)
+
+    def leer(self):
+        with lectura_analitica():
+            return self.router.db_for_read(Agente)
+
+    def peticion(self, escritura=None, cookies=None):
+        lecturas = []
+
+        def vista(request):
+            lecturas.append(self.leer())
+            if escritura is not None:
+                self.router.db_for_write(escritura)
+            lecturas.append(self.leer())
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        respuesta = AdherenciaDBMiddleware(vista)(request)
+        return lecturas, respuesta
+
+    def test_fuera_de_lectura_analitica_usa_default(self):
+        self.assertIsNone(self.router.db_for_read(Agente))
+        self.assertEqual(self.leer(), 'analytics')
+
+    @override_settings(ADHERENCIA_DB_PEGAJOSA=True, ADHERENCIA_DB_PEGAJOSA_SEGUNDOS=5)
+    def test_pegajosa_tras_escribir(self):
+        lecturas, respuesta = self.peticion(escritura=RegistroActividad)
+        self.assertEqual(lecturas, ['analytics', 'default'])
+        self.assertIn(COOKIE_PRIMARIA, respuesta.cookies)
+
+        lecturas, _ = self.peticion(cookies={COOKIE_PRIMARIA: '1'})
+        self.assertEqual(lecturas, ['default', 'default'])
+
+    @override_settings(ADHERENCIA_DB_PEGAJOSA=True)
+    def test_escrituras_fuera_de_dashboard_no_fijan_default(self):
+        lecturas, respuesta = self.peticion(escritura=User)
+        self.assertEqual(lecturas, ['analytics', 'analytics'])
+        self.assertNotIn(COOKIE_PRIMARIA, respuesta.cookies)
+
+    @override_settings(ADHERENCIA_DB_PEGAJOSA=False)
+    def test_sin_pegajosa(self):
+        lecturas, respuesta = self.peticion(escritura=RegistroActividad)
+        self.assertEqual(lecturas, ['analytics', 'analytics'])
+        self.assertNotIn(COOKIE_PRIMARIA, respuesta.cookies)
+
+
+def erlang_c_referencia(trafico, aht, nivel, segundos):
+    """Erlang C con factoriales, agente por agente"""
+    n = math.floor(trafico) + 1
+    while True:
+        suma = sum(trafico ** k / math.factorial(k) for k in range(n))
+        cola = trafico ** n / math.factorial(n) * n / (n - trafico)
+        espera = cola / (suma + cola)
+        if 1 - espera * math.exp(-(n - trafico) * segundos / 60 / aht) >= nivel:
+            return n
+        n += 1
+
+
+class DimensionamientoTest(TestCase):
+    """Erlang C vectorizado y alineación de demanda y programados por intervalo"""
+
+    def test_agentes_requeridos(self):
+        trafico = np.array([[0.0, 0.4, 2.5, 10.0], [17.3, 30.0, np.nan, 55.5]])
+        aht = np.array([[0.0, 3.0, 4.0, 3.5], [5.0, 2.0, 0.0, 6.0]])
+        requeridos = Dimensionamiento.agentes_requeridos(trafico, aht, nivel=0.8, tiempo_objetivo=20)
+        esperado = [
+            [0 if not t or np.isnan(t) else erlang_c_referencia(t, a, 0.8, 20) for t, a in zip(ft, fa)]
+            for ft, fa in zip(trafico.tolist(), aht.tolist())
+        ]
+        self.assertEqual(requeridos.tolist(), esperado)
+        self.assertEqual(esperado[0][3], 14)
+
+    def test_parametros_invalidos(self):
+        for nivel, segundos in ((1, 20), (0, 20), (1.5, 20), (0.8, 0), (0.8, -5)):
+            with self.subTest(nivel=nivel, segundos=segundos), self.assertRaises(ValueError):
+                Dimensionamiento.agentes_requeridos([5.0], [3.0], nivel, segundos)
+
+    def test_reparto_de_llamadas(self):
+        agente = crear_agente('AGT001')
+        llamada = actividad(agente, FECHA, '08:10', 30, conversacion=30)
+        llamada.llamadas_atendidas = 3
+        nocturna = actividad(agente, FECHA - timedelta(days=1), '23:50', 20, conversacion=20)
+        RegistroActividad.objects.bulk_create([llamada, nocturna])
+
+        llamadas, conversacion = Dimensionamiento.demanda(FECHA, FECHA, intervalo=15)
+        self.assertEqual(llamadas[0, 32:35].tolist(), [0.5, 1.5, 1.0])
+        self.assertEqual(conversacion[0, 32:35].tolist(), [5.0, 15.0, 10.0])
+        # La llamada de la noche anterior cuenta en el primer intervalo
+        self.assertAlmostEqual(llamadas[0, 0], 0.5)
+        self.assertAlmostEqual(llamadas.sum(), 3.5)
+
+    def test_programados_nocturnos(self):
+        agentes = [crear_agente('AGT001'), crear_agente('AGT002')]
+        ProgramaDiario.objects.bulk_create([
+            programa(agentes[0], FECHA - timedelta(days=1), '22:00', '06:00'),
+            programa(agentes[1], FECHA, '22:00', '06:00'),
+        ])
+        programados = Dimensionamiento.programados(FECHA, FECHA + timedelta(days=1), intervalo=60)
+        self.assertEqual(programados[0].tolist(), [1] * 6 + [0] * 16 + [1] * 2)
+        self.assertEqual(programados[1].tolist(), [1] * 6 + [0] * 18)
+
+    def test_api(self):
+        self.client.force_login(User.objects.create_user('supervisor'))
+        for parametros, estado in (
+            ('nivel=1.5', 400), ('nivel=1', 400), ('nivel=0', 400), ('nivel=x', 400),
+            ('segundos=0', 400), ('intervalo=7', 400), ('dias=0', 400),
+            ('nivel=0.9&segundos=15&intervalo=30', 200),
+        ):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get(f'/api/dimensionamiento/?{parametros}').status_code, estado)
+
+
+class OptimizadorTurnosTest(TestCase):
+    """Asignación voraz + búsqueda local de inicios de turno"""
+
+    def test_cobertura_exacta(self):
+        requeridos = np.zeros(24)
+        requeridos[8:16] = 2
+        requeridos[16:20] = 1
+        inicios, cobertura = OptimizadorTurnos.optimizar_dia(requeridos, [8, 4, 8])
+        self.assertEqual(sorted(inicios.tolist()), [8, 8, 16])
+        np.testing.assert_array_equal(cobertura, requeridos)
+
+    def test_ventana_y_cobertura_base(self):
+        requeridos = np.zeros(24)
+        requeridos[4:18] = 1
+        base = np.zeros(24)
+        base[6:10] = 1
+        # 04-06 queda fuera de la ventana: los turnos cubren 10-18 sin pisar la base
+        inicios, cobertura = OptimizadorTurnos.optimizar_dia(requeridos, [4, 4], primero=6, ultimo=18, base=base)
+        self.assertEqual(sorted(inicios.tolist()), [10, 14])
+        np.testing.assert_array_equal(cobertura[6:], requeridos[6:])
+
+    def test_planificar(self):
+        lunes = date.today() + timedelta(days=7 - date.today().weekday())
+        ft, pt = crear_agente('AGT001'), crear_agente('AGT002', 'PT')
+        Agente.objects.filter(pk=pt.pk).update(horas_semana=20)
+        programa(ft, lunes, '09:00', '17:00').save()
+
+        requeridos = np.zeros((7, 24))
+        requeridos[:, 8:16] = 1
+        requeridos[:, 16:20] = 1
+        resumen, programas = OptimizadorTurnos.planificar(
+            lunes, lunes + timedelta(days=6), requeridos=requeridos, intervalo=60
+        )
+
+        self.assertEqual((resumen['dias'], resumen['turnos']), (5, 9))
+        self.assertEqual(ProgramaDiario.objects.filter(fecha__gte=lunes).count(), 10)
+        self.assertFalse(ProgramaDiario.objects.filter(fecha__gte=lunes + timedelta(days=5)).exists())
+        # El programa existente se respeta y el PT cubre la tarde
+        self.assertEqual(ProgramaDiario.objects.get(agente=ft, fecha=lunes).turno, '09:00-17:00')
+        turno_pt = ProgramaDiario.objects.get(agente=pt, fecha=lunes)
+        self.assertEqual((turno_pt.inicio_min, turno_pt.fin_min, turno_pt.minutos_planificados), (960, 1200, 240))
+        self.assertEqual(ContadoresDiarios.del_dia(lunes).programas, 2)
+
+        resumen, _ = OptimizadorTurnos.planificar(
+            lunes, lunes + timedelta(days=6), requeridos=requeridos, intervalo=60, reemplazar=True
+        )
+        self.assertEqual(resumen['turnos'], 10)
+        self.assertEqual(ProgramaDiario.objects.filter(fecha__gte=lunes).count(), 10)
+        self.assertEqual(resumen['horas_faltantes'], 0.0)
+
+
+class SimuladorImpactoTest(TestCase):
+    """Monte Carlo con semilla por rango y caché por versión de los factores"""
+
+    def setUp(self):
+        for nombre, impacto in (('Caída de sistema', '8.00'), ('Ausentismo', '5.00')):
+            FactorImpacto.objects.create(
+                nombre=nombre, descripcion=nombre, impacto_porcentaje=Decimal(impacto), categoria='TECNICO'
+            )
+
+    def test_reproducible_y_en_rango(self):
+        resultado = SimuladorImpacto._calcular(FECHA, FECHA, 20000, 0.95)
+        self.assertEqual(resultado, SimuladorImpacto._calcular(FECHA, FECHA, 20000, 0.95))
+        self.assertNotEqual(resultado, SimuladorImpacto._calcular(FECHA - timedelta(days=1), FECHA, 20000, 0.95))
+
+        caida, ausentismo = resultado['factores']
+        self.assertEqual((caida['factor'], ausentismo['factor']), ('Caída de sistema', 'Ausentismo'))
+        self.assertAlmostEqual(caida['impacto_simulado'], 8.0, delta=0.1)
+        self.assertLess(caida['ic_inferior'], 8.0)
+        self.assertGreater(caida['ic_superior'], 8.0)
+        self.assertAlmostEqual(resultado['combinado']['impacto'], 100 * (1 - 0.92 * 0.95), delta=0.15)
+
+    def test_cache_e_invalidacion(self):
+        primero = SimuladorImpacto.simular(FECHA, FECHA, muestras=1000)
+        with mock.patch.object(SimuladorImpacto, '_calcular') as calcular:
+            self.assertEqual(SimuladorImpacto.simular(FECHA, FECHA, muestras=1000), primero)
+        calcular.assert_not_called()
+
+        FactorImpacto.objects.filter(nombre='Ausentismo').get().delete()
+        segundo = SimuladorImpacto.simular(FECHA, FECHA, muestras=1000)
+        self.assertEqual([f['factor'] for f in segundo['factores']], ['Caída de sistema'])
+
+    def test_sin_factores(self):
+        FactorImpacto.objects.all().delete()
+        self.assertEqual(SimuladorImpacto._calcular(FECHA, FECHA, 100, 0.95),
+                         {'factores': [], 'combinado': None, 'muestras': 100})
+
+
+class CuboAdherenciaTest(TestCase):
+    """Cubo fechas × minutos y sus reducciones"""
+
+    def setUp(self):
+        self.dias = [FECHA - timedelta(days=1), FECHA]
+        agente = crear_agente('AGT001')
+        ProgramaDiario.objects.bulk_create(
+            [programa(agente, fecha, '08:00', '10:00', horas=2) for fecha in self.dias]
+            + [programa(agente, self.dias[0] - timedelta(days=1), '22:00', '06:00')]
+        )
+        RegistroActividad.objects.bulk_create([
+            actividad(agente, self.dias[0], '08:00', 60),
+            actividad(agente, self.dias[0], '09:00', 60, 'PAUSA'),
+            actividad(agente, self.dias[1], '08:00', 120, 'DISPO'),
+            # Turno nocturno previo: activo de 23:00 a 02:00
+            actividad(agente, self.dias[0] - timedelta(days=1), '23:00', 180),
+        ])
+
+    def test_reducciones(self):
+        cubo = CuboAdherencia.construir(self.dias[0], self.dias[1], 8 * 60, 10 * 60)
+        self.assertEqual(cubo['adherencia'].shape, (2, 120))
+        self.assertEqual(
+            [(d['fecha'], d['adherencia'], d['minutos_programados']) for d in CuboAdherencia.serie_diaria(cubo)],
+            [(str(self.dias[0]), 50.0, 120), (str(self.dias[1]), 100.0, 120)],
+        )
+        self.assertEqual(CuboAdherencia.peores_dias(cubo, k=1)[0]['fecha'], str(self.dias[0]))
+        self.assertEqual(CuboAdherencia.serie_diaria(cubo, desde_min=9 * 60)[0]['adherencia'], 0.0)
+        self.assertEqual(CuboAdherencia.serie_diaria(cubo, dia_semana=self.dias[1].weekday())[0]['adherencia'], 100.0)
+
+        semana = CuboAdherencia.por_dia_semana_y_hora(cubo, intervalo=60)
+        self.assertEqual(semana['horas'], ['08:00', '09:00'])
+        self.assertEqual(semana['adherencia'][self.dias[0].weekday()], [100.0, 0.0])
+        self.assertEqual(semana['adherencia'][self.dias[1].weekday()], [100.0, 100.0])
+        sin_datos = (set(range(7)) - {f.weekday() for f in self.dias}).pop()
+        self.assertEqual(semana['adherencia'][sin_datos], [None, None])
+
+    def test_madrugada_del_turno_anterior(self):
+        cubo = CuboAdherencia.construir(self.dias[0], self.dias[0], 0, 6 * 60)
+        self.assertEqual(int(cubo['programados'][0].sum()), 360)
+        self.assertEqual(int(cubo['activos'][0].sum()), 120)
+        self.assertEqual(CuboAdherencia.serie_diaria(cubo)[0]['adherencia'], round(100 / 3, 2))
+
+
+class IntervalosTest(TestCase):
+    """Intervalos configurables por sumas prefijas y ventana operativa"""
+
+    def test_sumas_por_intervalo(self):
+        programados = np.random.default_rng(3).integers(0, 20, 1440)
+        ocupacion = {
+            'inicio_min': 0, 'programados': programados,
+            'activos': programados // 2, 'activos_total': programados // 2,
+        }
+        for intervalo in (5, 15, 30, 60):
+            tramos = intervalos(ocupacion, intervalo)
+            np.testing.assert_array_equal(tramos['programados'], programados.reshape(-1, intervalo).sum(axis=1))
+            self.assertEqual(len(tramos['etiquetas']), 1440 // intervalo)
+        tramos = intervalos(ocupacion, 60, desde_min=22 * 60 + 30, hasta_min=24 * 60)
+        self.assertEqual(tramos['etiquetas'], ['22:30', '23:30'])
+        self.assertEqual(tramos['programados'].tolist(), [programados[1350:1410].sum(), programados[1410:].sum()])
+
+    def test_ventana_de_la_api(self):
+        self.client.force_login(User.objects.create_user('supervisor'))
+        for parametros, estado in (
+            ('apertura=22:00&cierre=06:00', 200), ('cierre=24:00', 200), ('intervalo=5', 200),
+            ('cierre=24:30', 400), ('apertura=24:00', 400), ('apertura=08:60', 400),
+            ('cierre=25:00', 400), ('apertura=8', 400), ('intervalo=7', 400),
+        ):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get(f'/api/adherencia-cubo/?{parametros}').status_code, estado)
+
+
+class MotorExcepcionesTest(TestCase):
+    """Tramos fuera de adherencia comprimidos por rachas"""
+
+    def setUp(self):
+        self.agente = crear_agente('AGT001')
+        programa(self.agente, FECHA, '08:00', '10:00', horas=2).save()
+        RegistroActividad.objects.bulk_create([
+            actividad(self.agente, FECHA, '08:00', 30),
+            actividad(self.agente, FECHA, '08:30', 30, 'PAUSA'),
+            # 09:00-09:30 sin registro: ausente
+            actividad(self.agente, FECHA, '09:30', 60, 'DISPO'),
+        ])
+
+    def test_segmentos(self):
+        codigos = np.array([[0, 1, 1, 3, 0], [2, 2, 0, 0, 1]], dtype=np.int8)
+        fila, inicio, fin, codigo = segmentos(codigos)
+        self.assertEqual(
+            list(zip(fila.tolist(), inicio.tolist(), fin.tolist(), codigo.tolist())),
+            [(0, 1, 3, 1), (0, 3, 4, 3), (1, 0, 2, 2), (1, 4, 5, 1)],
+        )
+
+    def test_tramos_del_dia(self):
+        tramos = MotorExcepciones.calcular(FECHA, FECHA)
+        self.assertEqual(
+            [(tipo, inicio, fin) for tipo, inicio, fin in zip(
+                tramos['tipo'].tolist(), tramos['inicio_min'].tolist(), tramos['fin_min'].tolist())],
+            [(2, 510, 540), (0, 540, 570), (1, 600, 630)],
+        )
+
+    def test_guardados_y_al_vuelo_coinciden(self):
+        al_vuelo = MotorExcepciones.peores(FECHA, minimo=1)
+        self.assertEqual(MotorExcepciones.guardar(FECHA, FECHA), 3)
+        self.assertEqual(ExcepcionAdherencia.objects.filter(fecha=FECHA).count(), 3)
+        self.assertEqual(MotorExcepciones.peores(FECHA, minimo=1), al_vuelo)
+        self.assertEqual([t['tipo'] for t in al_vuelo], ['ESTADO', 'AUSENTE', 'SIN_PROG'])
+        self.assertEqual(MotorExcepciones.peores(FECHA, tipo='SIN_PROG')[0]['inicio'], '10:00')
+        # Recalcular reemplaza los tramos del rango
+        self.assertEqual(MotorExcepciones.guardar(FECHA, FECHA), 3)
+        self.assertEqual(ExcepcionAdherencia.objects.count(), 3)
+
+
+class LineaTiempoTest(TestCase):
+    """Las líneas de tiempo en bitsets dan lo mismo que las máscaras"""
+
+    def setUp(self):
+        self.agentes = [crear_agente(f'AGT00{i}') for i in range(1, 4)]
+        # Las líneas se construyen al confirmar, como fuera de los tests
+        with self.captureOnCommitCallbacks(execute=True):
+            ProgramaDiario.objects.bulk_create(
+                [programa(agente, FECHA, '08:00', '16:00') for agente in self.agentes]
+                + [programa(self.agentes[0], FECHA - timedelta(days=1), '22:00', '06:00')]
+            )
+            RegistroActividad.objects.bulk_create([
+                actividad(self.agentes[0], FECHA, '08:05', 50),
+                actividad(self.agentes[0], FECHA, '09:00', 15, 'PAUSA'),
+                actividad(self.agentes[1], FECHA, '07:30', 120, 'DISPO'),
+                actividad(self.agentes[2], FECHA, '15:30', 90, 'ADMIN'),
+                actividad(self.agentes[0], FECHA - timedelta(days=1), '23:00', 120),
+            ])
+
+    def assertIgualAMascaras(self, inicio_min, fin_min, agente_ids=None):
+        bitsets = LineaTiempo.ocupacion(FECHA, inicio_min, fin_min, agente_ids)
+        with self.settings(ADHERENCIA_LINEAS_TIEMPO=False):
+            mascaras = ocupacion_dia(FECHA, inicio_min, fin_min, agente_ids)
+        for clave in ('programados', 'activos', 'activos_total'):
+            np.testing.assert_array_equal(bitsets[clave], mascaras[clave])
+
+    def test_ocupacion(self):
+        LineaTiempo.construir(FECHA, FECHA)
+        self.assertIgualAMascaras(0, 1440)
+        self.assertIgualAMascaras(480, 1200)
+        self.assertIgualAMascaras(600, 615, [self.agentes[0].id])
+
+    def test_pendientes_y_dia_sin_construir(self):
+        LineaTiempoAgente.objects.all().delete()
+        self.assertIgualAMascaras(0, 1440)  # nunca construido: en memoria
+        LineaTiempo.construir(FECHA, FECHA)
+        # Sin confirmar la transacción las líneas quedan pendientes
+        actividad(self.agentes[1], FECHA, '12:00', 30, 'CAPAC').save()
+        ProgramaDiario.objects.filter(agente=self.agentes[2], fecha=FECHA).delete()
+        self.assertTrue(LineaTiempoAgente.objects.filter(pendiente=True).exists())
+        self.assertIgualAMascaras(0, 1440)
+        LineaTiempo.actualizar(FECHA)
+        self.assertIgualAMascaras(0, 1440)
+
+    def test_se_reconstruyen_al_confirmar(self):
+        construir = mock.patch.object(LineaTiempo, 'construir', wraps=LineaTiempo.construir)
+        with construir as construidas, self.captureOnCommitCallbacks(execute=True):
+            actividad(self.agentes[1], FECHA, '12:00', 30, 'CAPAC').save()
+            ProgramaDiario.objects.filter(agente=self.agentes[2], fecha=FECHA).delete()
+        # Una sola reconstrucción para todas las escrituras de la transacción
+        construidas.assert_called_once_with(FECHA, FECHA, agente_ids={self.agentes[1].id, self.agentes[2].id})
+        self.assertFalse(LineaTiempoAgente.objects.filter(pendiente=True).exists())
+        self.assertEqual(LineaTiempo.en_estado(FECHA, 12 * 60 + 10, ['CAPAC']), [self.agentes[1].id])
+        self.assertIgualAMascaras(0, 1440)
+
+    def test_kpi_por_hora_en_la_ventana_configurada(self):
+        ProgramaDiario.objects.bulk_create([programa(agente, date.today(), '08:00', '16:00') for agente in self.agentes])
+        self.client.force_login(User.objects.create_user('supervisor'))
+        with self.settings(ADHERENCIA_VENTANA=('08:00', '12:00')):
+            respuesta = self.client.get('/kpi/hora/?intervalo=30')
+        horas = respuesta.context['data']
+        self.assertEqual([h['hora'] for h in horas][:2], ['08:00', '08:30'])
+        self.assertEqual(len(horas), 8)
+        self.assertEqual(horas[0]['agentes_programados'], 3.0)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class VersionDatosTest(TestCase):
+    """La versión vigente de los fragmentos se renueva con demora acotada"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidar_con_demora(self):
+        vigente = VersionDatos.vigente()
+        self.assertEqual(vigente, VersionDatos.version())
+        VersionDatos.invalidar()
+        self.assertEqual(VersionDatos.version(), vigente + 1)
+        # Las plantillas siguen con la versión anterior hasta que vence la demora
+        self.assertEqual(VersionDatos.vigente(), vigente)
+        VersionDatos.invalidar(inmediato=True)
+        self.assertEqual(VersionDatos.vigente(), vigente + 2)
+
+    def test_invalidar_sin_version_en_cache(self):
+        VersionDatos.invalidar()
+        self.assertIsNotNone(VersionDatos.version())
+
+    @override_settings(ADHERENCIA_FRAGMENTOS_DEMORA=0, ADHERENCIA_FRAGMENTOS_SEGUNDOS=60)
+    def test_contexto_y_senales(self):
+        contexto = VersionDatos.contexto()
+        self.assertEqual(contexto['cache_fragmentos'], 60)
+        crear_agente('AGT001')
+        self.assertEqual(VersionDatos.contexto()['version_datos'], contexto['version_datos'] + 1)
+
+
+class RespuestaColumnarTest(TestCase):
+    """Respuestas en filas o en columnas y serie diaria desde los resúmenes"""
+
+    def test_codificar_indice(self):
+        self.assertEqual(
+            RespuestaColumnar.codificar_indice(['2025-03-01', '2025-03-02', '2025-03-03']),
+            {'tipo': 'fecha', 'inicio': '2025-03-01', 'n': 3, 'paso': 1},
+        )
+        # Las horas son circulares: 23:00 -> 00:00 es +60
+        self.assertEqual(RespuestaColumnar.codificar_indice(['22:00', '23:00', '00:00'])['paso'], 60)
+        self.assertEqual(RespuestaColumnar.codificar_indice([1, 2, 5])['deltas'], [1, 3])
+        self.assertEqual(RespuestaColumnar.codificar_indice([])['n'], 0)
+
+    def test_negociacion(self):
+        filas = [{'fecha': '2025-03-03', 'ft': 90.0}, {'fecha': '2025-03-04', 'ft': 80.0}]
+        fabrica = RequestFactory()
+        en_filas = json.loads(RespuestaColumnar.responder(fabrica.get('/'), filas, 'fecha').content)
+        self.assertEqual(en_filas, {'datos': filas})
+        respuesta = RespuestaColumnar.responder(
+            fabrica.get('/?delta=1', HTTP_ACCEPT=TIPO_COLUMNAS), filas, 'fecha'
+        )
+        self.assertIn('Accept', respuesta['Vary'])
+        columnar = json.loads(respuesta.content)
+        self.assertEqual(columnar['columnas'], {'ft': [90.0, 80.0]})
+        self.assertEqual(columnar['indice']['paso'], 1)
+
+    def test_api_adherencia_diaria(self):
+        laborables = []
+        fecha = date.today()
+        while len(laborables) < 4:
+            if fecha.weekday() < 5:
+                laborables.insert(0, fecha)
+            fecha -= timedelta(days=1)
+        agentes = [crear_agente('AGT001'), crear_agente('AGT002', 'PT')]
+        ProgramaDiario.objects.bulk_create([
+            programa(agente, fecha, '08:00', '12:00', horas=4) for agente in agentes for fecha in laborables[:2]
+        ])
+        RegistroActividad.objects.bulk_create([
+            actividad(agente, fecha, '08:00', 60 * (i + 1) + 30 * d)
+            for i, agente in enumerate(agentes) for d, fecha in enumerate(laborables[:2])
+        ])
+        # Solo el primer día tiene resumen: el segundo se calcula al vuelo
+        CalculadorAdherencia.actualizar_resumenes_diarios(laborables[0], laborables[0])
+        diarias = CalculadorAdherencia.adherencias_por_agente(
+            None, laborables[0], laborables[1], por_dia=True
+        ).set_index(['agente_id', 'fecha'])['adherencia']
+
+        self.client.force_login(User.objects.create_user('supervisor'))
+        datos = self.client.get('/api/adherencia-diaria/?dias=4').json()['datos']
+        self.assertEqual([d['fecha'] for d in datos], [f.isoformat() for f in laborables])
+        for d, fecha in enumerate(laborables[:2]):
+            ft = round(float(diarias[(agentes[0].id, str(fecha))]), 2)
+            pt = round(float(diarias[(agentes[1].id, str(fecha))]), 2)
+            self.assertEqual((datos[d]['ft'], datos[d]['pt']), (ft, pt))
+            self.assertEqual(datos[d]['total'], round((ft + pt) / 2, 2))
+        self.assertEqual(datos[2]['total'], 0)
+
+        self.assertEqual(len(self.client.get('/api/adherencia-diaria/?dias=0').json()['datos']), 1)
+        self.assertEqual(self.client.get('/api/adherencia-diaria/?dias=abc').status_code, 400)
+
+
+class EventosActividadTest(TestCase):
+    """Paginación por clave de las actividades"""
+
+    def setUp(self):
+        self.agentes = [crear_agente('AGT001'), crear_agente('AGT002')]
+        # Varias actividades con la misma hora de inicio: desempata el id
+        RegistroActividad.objects.bulk_create([
+            actividad(agente, FECHA - timedelta(days=dia), inicio, 10)
+            for dia in range(3) for inicio in ('08:00', '08:00', '09:30', '10:00') for agente in self.agentes
+        ])
+
+    def test_paginas_en_orden_sin_repetir(self):
+        esperado = list(RegistroActividad.objects.order_by('fecha', 'hora_inicio', 'id').values_list('id', flat=True))
+        vistos, cursor = [], None
+        while True:
+            pagina, cursor = EventosActividad.pagina(cursor, limite=5)
+            vistos.extend(a.id for a in pagina)
+            if cursor is None:
+                break
+        self.assertEqual(vistos, esperado)
+
+    def test_cursor_invalido(self):
+        for cursor in ('no-es-base64!', 'WzFd', 'bnVsbA=='):
+            with self.assertRaises(ValueError):
+                EventosActividad.pagina(cursor)
+
+    def test_api(self):
+        self.client.force_login(User.objects.create_user('supervisor'))
+        primera = self.client.get(f'/api/actividades/?limite=3&agente={self.agentes[0].id}').json()
+        self.assertEqual(primera['cantidad'], 3)
+        segunda = self.client.get(f'/api/actividades/?limite=3&agente={self.agentes[0].id}&cursor={primera["siguiente"]}').json()
+        esperado = list(RegistroActividad.objects.filter(agente=self.agentes[0]).order_by(
+            'fecha', 'hora_inicio', 'id'
+        ).values_list('id', flat=True)[:6])
+        self.assertEqual([a['id'] for a in primera['actividades'] + segunda['actividades']], esperado)
+        for parametros in ('cursor=no-es-un-cursor', 'cursor=WzFd', 'limite=x', 'tipo=NADA', 'fecha_inicio=ayer'):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get(f'/api/actividades/?{parametros}').status_code, 400)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class JornadaAgenteTest(TestCase):
+    """Huecos de la jornada y caché por agente-día de los días cerrados"""
+
+    def setUp(self):
+        cache.clear()
+        self.agente = crear_agente('AGT001')
+        with self.captureOnCommitCallbacks(execute=True):
+            programa(self.agente, FECHA, '08:00', '12:00', horas=4).save()
+            actividad(self.agente, FECHA, '07:30', 60).save()
+            actividad(self.agente, FECHA, '09:00', 30, 'PAUSA').save()
+            actividad(self.agente, FECHA, '11:00', 90).save()
+
+    def test_huecos(self):
+        huecos = JornadaAgente.huecos(
+            [{'inicio_min': 450, 'fin_min': 510}, {'inicio_min': 540, 'fin_min': 570},
+             {'inicio_min': 500, 'fin_min': 520}, {'inicio_min': 660, 'fin_min': 750}],
+            {'inicio_min': 480, 'fin_min': 720},
+        )
+        self.assertEqual(
+            [(h['inicio'], h['fin'], h['minutos'], h['minutos_programados']) for h in huecos],
+            [('08:40', '09:00', 20, 20), ('09:30', '11:00', 90, 90)],
+        )
+        # Sin actividades, todo el turno es hueco; sin nada, no hay jornada
+        hueco, = JornadaAgente.huecos([], {'inicio_min': 1320, 'fin_min': 1800})
+        self.assertEqual((hueco['inicio'], hueco['fin'], hueco['minutos']), ('22:00', '06:00', 480))
+        self.assertEqual(JornadaAgente.huecos([]), [])
+
+    def test_jornadas_en_cache_e_invalidacion(self):
+        jornada, = JornadaAgente.jornadas(self.agente.id, [FECHA])
+        self.assertEqual([a['inicio'] for a in jornada['actividades']], ['07:30', '09:00', '11:00'])
+        self.assertEqual([h['inicio'] for h in jornada['huecos']], ['08:30', '09:30'])
+        with self.assertNumQueries(0):
+            self.assertEqual(JornadaAgente.jornadas(self.agente.id, [FECHA]), [jornada])
+
+        # Una actividad nueva borra solo la jornada de su agente-día
+        with self.captureOnCommitCallbacks(execute=True):
+            actividad(self.agente, FECHA, '08:30', 30, 'DISPO').save()
+        jornada, = JornadaAgente.jornadas(self.agente.id, [FECHA])
+        self.assertEqual([h['inicio'] for h in jornada['huecos']], ['09:30'])
+
+    def test_api(self):
+        self.client.force_login(User.objects.create_user('supervisor'))
+        url = f'/api/agentes/{self.agente.id}/jornada/'
+        respuesta = self.client.get(f'{url}?fecha_inicio={FECHA - timedelta(days=1)}&fecha_fin={FECHA}').json()
+        self.assertEqual([j['fecha'] for j in respuesta['jornadas']], [str(FECHA - timedelta(days=1)), str(FECHA)])
+        self.assertIsNone(respuesta['jornadas'][0]['programa'])
+        for parametros in ('fecha=ayer', f'fecha_inicio={FECHA}&fecha_fin={FECHA - timedelta(days=1)}'):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get(f'{url}?{parametros}').status_code, 400)
+        self.assertEqual(self.client.get('/api/agentes/999999/jornada/').status_code, 404)
+
+
+class ContadoresDiariosTest(TestCase):
+    """Los contadores que mantienen las escrituras coinciden con un recálculo"""
+
+    CAMPOS = ('programas', 'minutos_programados', 'actividades', 'actividades_productivas', 'llamadas',
+              'llamadas_con_conversacion', 'minutos_conversacion', 'agentes_activos')
+
+    def setUp(self):
+        self.agentes = [crear_agente('AGT001'), crear_agente('AGT002', 'PT')]
+
+    def contadores(self, *fechas):
+        return {
+            fecha: {campo: getattr(contador, campo) for campo in self.CAMPOS}
+            for fecha, contador in ContadoresDiarios.dias(*fechas).items()
+        }
+
+    def assertContadoresAlDia(self, *fechas):
+        mantenidos = self.contadores(*fechas)
+        ContadoresDiarios.recalcular(min(fechas), max(fechas))
+        self.assertEqual(mantenidos, self.contadores(*fechas))
+
+    def test_save_update_y_delete(self):
+        llamada = actividad(self.agentes[0], FECHA, '08:00', 30, conversacion=12)
+        llamada.save()
+        self.assertEqual(ContadoresDiarios.del_dia(FECHA).minutos_conversacion, 12)
+        self.assertContadoresAlDia(FECHA)
+
+        llamada.tipo_actividad = 'PAUSA'
+        llamada.save()
+        self.assertContadoresAlDia(FECHA)
+
+        llamada.fecha = FECHA - timedelta(days=1)
+        llamada.save()
+        self.assertContadoresAlDia(FECHA, FECHA - timedelta(days=1))
+
+        llamada.delete()
+        self.assertEqual(ContadoresDiarios.del_dia(FECHA - timedelta(days=1)).actividades, 0)
+        self.assertContadoresAlDia(FECHA, FECHA - timedelta(days=1))
+
+    def test_bulk_create_y_delete_de_queryset(self):
+        RegistroActividad.objects.bulk_create([
+            actividad(agente, FECHA, inicio, 20, tipo, conversacion=5)
+            for agente in self.agentes
+            for inicio, tipo in (('08:00', 'LLAMADA'), ('09:00', 'DISPO'), ('10:00', 'ALMUERZO'))
+        ])
+        ProgramaDiario.objects.bulk_create([programa(agente, FECHA, '08:00', '16:00') for agente in self.agentes])
+        self.assertEqual(ContadoresDiarios.del_dia(FECHA).agentes_activos, 2)
+        self.assertContadoresAlDia(FECHA)
+
+        RegistroActividad.objects.filter(agente=self.agentes[1]).delete()
+        ProgramaDiario.objects.filter(agente=self.agentes[1]).delete()
+        self.assertEqual(ContadoresDiarios.del_dia(FECHA).agentes_activos, 1)
+        self.assertContadoresAlDia(FECHA)
+
+    def test_update_de_las_reglas_de_reparacion(self):
+        ProgramaDiario.objects.bulk_create([programa(agente, FECHA, '08:00', '16:00') for agente in self.agentes])
+        ProgramaDiario.objects.filter(agente=self.agentes[1]).update(horas_planificadas=0, minutos_planificados=0)
+        ContadoresDiarios.recalcular(FECHA, FECHA)
+
+        ReparadorDatos.reparar(['horas_planificadas_cero'])
+        self.assertEqual(ContadoresDiarios.del_dia(FECHA).minutos_programados, 480 + 240)
+        self.assertContadoresAlDia(FECHA)
+
+    def test_borrado_en_cascada_de_un_agente(self):
+        dias = [FECHA - timedelta(days=1), FECHA]
+        ProgramaDiario.objects.bulk_create([
+            programa(agente, fecha, '08:00', '12:00', horas=4) for agente in self.agentes for fecha in dias
+        ])
+        RegistroActividad.objects.bulk_create([
+            actividad(agente, fecha, '08:00', 60, conversacion=30) for agente in self.agentes for fecha in dias
+        ])
+        # El Collector borra programas y actividades sin MinutosQuerySet.delete
+        with self.captureOnCommitCallbacks(execute=True):
+            self.agentes[1].delete()
+        self.assertEqual(self.contadores(*dias)[FECHA]['agentes_activos'], 1)
+        self.assertEqual(self.contadores(*dias)[FECHA]['minutos_conversacion'], 30)
+        self.assertContadoresAlDia(*dias)
+
+    def test_una_invalidacion_por_transaccion(self):
+        with mock.patch.object(VersionDatos, 'invalidar') as invalidar, mock.patch.object(
+            JornadaAgente, 'invalidar'
+        ) as invalidar_jornadas, self.captureOnCommitCallbacks(execute=True):
+            for inicio in ('08:00', '09:00', '10:00'):
+                actividad(self.agentes[0], FECHA, inicio, 30).save()
+            RegistroActividad.objects.bulk_create([actividad(self.agentes[1], FECHA, '08:00', 30)])
+            invalidar.assert_not_called()
+        invalidar.assert_called_once_with()
+        filas, = [llamada.args[0] for llamada in invalidar_jornadas.call_args_list]
+        self.assertEqual({agente_id for agente_id, _, _ in filas}, {agente.id for agente in self.agentes})
+
+    def test_simulador_en_bloque(self):
+        fecha = next(FECHA.replace(day=dia) for dia in range(1, 29) if FECHA.replace(day=dia).weekday() < 5)
+        SimuladorDatos.generar_programacion_mes(fecha.month, fecha.year)
+        SimuladorDatos.generar_programacion_mes(fecha.month, fecha.year)  # no duplica
+        self.assertEqual(ProgramaDiario.objects.filter(fecha=fecha).count(), 2)
+        with mock.patch.object(RegistroActividad.objects, 'create') as crear:
+            SimuladorDatos.generar_actividades_dia(fecha)
+        crear.assert_not_called()
+        self.assertTrue(RegistroActividad.objects.filter(fecha=fecha).exists())
+        self.assertContadoresAlDia(fecha)
+
+    def test_relleno_de_la_migracion(self):
+        ProgramaDiario.objects.bulk_create([programa(agente, FECHA, '08:00', '16:00') for agente in self.agentes])
+        RegistroActividad.objects.bulk_create([
+            actividad(self.agentes[0], FECHA - timedelta(days=40), '08:00', 30, conversacion=10),
+            actividad(self.agentes[1], FECHA, '09:00', 30, 'DISPO'),
+        ])
+        fechas = (FECHA - timedelta(days=40), FECHA)
+        esperados = self.contadores(*fechas)
+        ContadorDiario.objects.all().delete()
+        AgenteActivoDia.objects.all().delete()
+
+        migracion = importlib.import_module('dashboard.migrations.0008_contador_diario')
+        migracion.recalcular_contadores(apps, None)
+        self.assertEqual(self.contadores(*fechas), esperados)
+        self.assertEqual(AgenteActivoDia.objects.count(), 2)
+
+
+class InstantaneaDashboardTest(TestCase):
+    """Conteos del dashboard en una consulta por tabla, compartidos en la petición"""
+
+    def setUp(self):
+        self.supervisor = User.objects.create_user('supervisor')
+        self.agentes = [
+            crear_agente('AGT001', supervisor=self.supervisor), crear_agente('AGT002', 'PT'),
+            crear_agente('AGT003', 'PT', supervisor=self.supervisor),
+        ]
+        Agente.objects.filter(codigo='AGT002').update(activo=False)
+        self.hoy = FECHA
+        ProgramaDiario.objects.bulk_create(
+            [programa(agente, self.hoy, '08:00', '16:00') for agente in self.agentes]
+            + [programa(self.agentes[0], self.hoy + timedelta(days=1), '08:00', '16:00')]
+        )
+        RegistroActividad.objects.bulk_create([
+            actividad(self.agentes[0], self.hoy, '08:00', 30, conversacion=10),
+            actividad(self.agentes[0], self.hoy, '09:00', 30, conversacion=20),
+            actividad(self.agentes[1], self.hoy, '08:00', 30, 'PAUSA'),
+            actividad(self.agentes[2], self.hoy - timedelta(days=1), '08:00', 30, conversacion=5),
+        ])
+
+    def test_conteos(self):
+        instantanea = InstantaneaDashboard(self.supervisor.id, hoy=self.hoy)
+        with self.assertNumQueries(2):
+            agentes = instantanea.agentes
+            estadisticas = instantanea.estadisticas_hoy
+            self.assertEqual(instantanea.estado_sistema, 'activo')
+            self.assertEqual(instantanea.programacion_manana['agentes_programados'], 1)
+        self.assertEqual(
+            (agentes['registrados'], agentes['activos'], agentes['ft'], agentes['pt']), (3, 2, 1, 1)
+        )
+        self.assertEqual((agentes['equipo_activos'], agentes['equipo_ft'], agentes['equipo_pt']), (2, 1, 1))
+        self.assertEqual(estadisticas['llamadas_atendidas'], 2)
+        self.assertEqual(estadisticas['agentes_activos'], 2)
+        self.assertEqual(estadisticas['tiempo_promedio_llamada'], 15.0)
+        self.assertEqual(estadisticas['variacion_llamadas_vs_ayer'], 100.0)
+        # 2 productivas de 3 programados
+        self.assertEqual(instantanea.adherencia_rapida, 66.7)
+
+    def test_estado_sin_actividades(self):
+        self.assertEqual(InstantaneaDashboard(hoy=self.hoy + timedelta(days=1)).estado_sistema, 'parcial')
+        self.assertEqual(InstantaneaDashboard(hoy=self.hoy + timedelta(days=2)).estado_sistema, 'inactivo')
+
+    def test_una_por_peticion(self):
+        request = RequestFactory().get(f'/?supervisor={self.supervisor.id}')
+        instantanea = InstantaneaDashboard.de(request)
+        self.assertIs(InstantaneaDashboard.de(request), instantanea)
+        self.assertEqual(instantanea.supervisor_id, self.supervisor.id)
+        self.assertIsNone(InstantaneaDashboard.de(RequestFactory().get('/?supervisor=x')).supervisor_id)
+
+
+class EjecutorEnProceso(Executor):
+    """ProcessPoolExecutor síncrono: los tramos corren en la transacción del test"""
+
+    def __init__(self, max_workers=None, initializer=None, initargs=()):
+        if initializer:
+            initializer(*initargs)
+
+    def submit(self, funcion, *args, **kwargs):
+        futuro = Future()
+        futuro.set_result(funcion(*args, **kwargs))
+        return futuro
+
+
+@mock.patch('dashboard.management.commands.compute_adherence.connections', mock.Mock())
+@mock.patch('dashboard.management.commands.compute_adherence.ProcessPoolExecutor', EjecutorEnProceso)
+class ComputeAdherenceTest(TestCase):
+    """Cálculo en lote por tramos: formatos, reanudación y argumentos"""
+
+    def setUp(self):
+        self.agentes = [crear_agente('AGT001'), crear_agente('AGT002', 'PT')]
+        self.dias = [FECHA - timedelta(days=1), FECHA]
+        ProgramaDiario.objects.bulk_create([
+            programa(agente, fecha, '08:00', '12:00', horas=4) for agente in self.agentes for fecha in self.dias
+        ])
+        RegistroActividad.objects.bulk_create([
+            actividad(agente, fecha, '08:00', 60 * (i + 1)) for i, agente in enumerate(self.agentes) for fecha in self.dias
+        ])
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+
+    def ejecutar(self, salida, *argumentos):
+        salida = f'{self.directorio}/{salida}'
+        stdout = StringIO()
+        call_command('compute_adherence', salida, f'--desde={self.dias[0]}', f'--hasta={self.dias[1]}',
+                     '--procesos=2', *argumentos, stdout=stdout)
+        return salida, stdout.getvalue()
+
+    def test_csv_y_ndjson(self):
+        salida, _ = self.ejecutar('adherencia.csv')
+        with open(salida, encoding='utf-8') as archivo:
+            lineas = archivo.read().splitlines()
+        self.assertEqual(lineas[0].split(',')[:2], ['fecha', 'agente_id'])
+        self.assertEqual(len(lineas), 1 + 4)
+        self.assertTrue(lineas[1].startswith(f'{self.dias[0]},{self.agentes[0].id},AGT001,FT,240,60,60,0,25.0'))
+
+        salida, _ = self.ejecutar('adherencia.ndjson', '--contrato=PT')
+        with open(salida, encoding='utf-8') as archivo:
+            registros = [json.loads(linea) for linea in archivo]
+        self.assertEqual([(r['fecha'], r['codigo'], r['adherencia']) for r in registros],
+                         [(str(fecha), 'AGT002', 50.0) for fecha in self.dias])
+
+    def test_npz_igual_al_calculo_directo(self):
+        salida, _ = self.ejecutar('adherencia.npz', '--dias-por-tramo=2')
+        esperado = CalculoLote.calcular(self.dias[0], self.dias[1])
+        with np.load(salida) as datos:
+            for columna in ('agente_id', 'minutos_programados', 'minutos_adherentes', 'adherencia'):
+                np.testing.assert_array_equal(datos[columna], esperado[columna])
+
+    def test_retoma_y_rechaza_otros_argumentos(self):
+        salida, _ = self.ejecutar('adherencia.csv', '--conservar-partes')
+        with open(salida, encoding='utf-8') as archivo:
+            completo = archivo.read()
+        partes = f'{salida}.partes'
+        os.remove(f'{partes}/{self.dias[1]}_{self.dias[1]}.csv')
+
+        with mock.patch('dashboard.management.commands.compute_adherence._calcular_tramo',
+                        wraps=_calcular_tramo) as tramo:
+            _, salida_comando = self.ejecutar('adherencia.csv', '--conservar-partes')
+        self.assertIn('Retomando: 1 de 2', salida_comando)
+        self.assertEqual(tramo.call_count, 1)
+        with open(salida, encoding='utf-8') as archivo:
+            self.assertEqual(archivo.read(), completo)
+
+        with self.assertRaisesMessage(CommandError, '--reiniciar'):
+            self.ejecutar('adherencia.csv', '--contrato=FT')
+        _, salida_comando = self.ejecutar('adherencia.csv', '--contrato=FT', '--reiniciar')
+        self.assertNotIn('Retomando', salida_comando)
+        self.assertFalse(os.path.exists(partes))
+
+    def test_argumentos_invalidos(self):
+        for argumentos in (('--desde=ayer',), (f'--desde={FECHA}', f'--hasta={FECHA - timedelta(days=1)}'),
+                           ('--agente=NOEXISTE',), ('--procesos=0',)):
+            with self.subTest(argumentos=argumentos), self.assertRaises(CommandError):
+                call_command('compute_adherence', f'{self.directorio}/a.csv', *argumentos, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'Formato no soportado'):
+            call_command('compute_adherence', f'{self.directorio}/a.xlsx', stdout=StringIO())
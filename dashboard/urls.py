@@ -14,4 +14,14 @@ urlpatterns = [
     path('api/adherencia-diaria/', views.api_adherencia_diaria, name='api_adherencia_diaria'),
     path('api/simular-datos/', views.api_simular_datos, name='api_simular_datos'),
     path('api/agentes-top/', views.api_agentes_top, name='api_agentes_top'),
+    path('api/ranking-agentes/', views.api_ranking_agentes, name='api_ranking_agentes'),
+    path('api/equipos/', views.api_equipos, name='api_equipos'),
+    path('api/equipos/<int:supervisor_id>/', views.api_equipo_detalle, name='api_equipo_detalle'),
+    path('api/adherencia-intervalos/', views.api_adherencia_intervalos, name='api_adherencia_intervalos'),
+    path('api/adherencia-cubo/', views.api_adherencia_cubo, name='api_adherencia_cubo'),
+    path('api/agentes-en-estado/', views.api_agentes_en_estado, name='api_agentes_en_estado'),
+    path('api/actividades/', views.api_actividades, name='api_actividades'),
+    path('api/agentes/<int:agente_id>/jornada/', views.api_jornada_agente, name='api_jornada_agente'),
+    path('api/excepciones/', views.api_excepciones, name='api_excepciones'),
+    path('api/dimensionamiento/', views.api_dimensionamiento, name='api_dimensionamiento'),
 ]
\ No newline at end of file
@@ -6,6 +6,18 @@ from collections import defaultdict
 import pandas as pd  # Import for data analysis
 import numpy as np
 from .models import *
+from .archivo import ArchivoActividad
+from .cargador import CargadorDatos
+from .instantanea import InstantaneaDashboard
+from .cuantiles import SketchCuantiles
+from .impacto import SimuladorImpacto
+from .ranking import RankingAgentes
+from .integridad import VerificadorIntegridad
+from .reparacion import ReparadorDatos
+from .analizador import (
+    AnalizadorProblemas, CuboAdherencia, LIMITES_HISTOGRAMA, RANGOS_HISTOGRAMA,
+    intervalos, ocupacion_dia
+)
 
 class CalculadorAdherencia:
     """
@@ -30,19 +42,24 @@ class CalculadorAdherencia:
         if not programas.exists():
             return None
         
-        # Calcular tiempo total planificado (convertir horas a minutos)
-        tiempo_planificado_total = sum(
-            float(p.horas_planificadas) * 60 for p in programas
-        )
+        # Tiempo total planificado en minutos (columna entera)
+        tiempo_planificado_total = programas.aggregate(
+            total=Sum('minutos_planificados')
+        )['total'] or 0
         
         # Calcular tiempo en actividades productivas
         actividades_productivas = actividades.filter(
             tipo_actividad__in=['LLAMADA', 'DISPO', 'CAPAC', 'ADMIN']
         )
         
-        tiempo_productivo = actividades_productivas.aggregate(
-            total=Sum('duracion_minutos')
-        )['total'] or 0
+        tiempo_productivo = ArchivoActividad.sin_archivadas(
+            actividades_productivas, fecha_inicio, fecha_fin
+        ).aggregate(total=Sum('duracion_minutos'))['total'] or 0
+        
+        # Sumar los meses ya movidos al archivo columnar
+        tiempo_productivo += ArchivoActividad.tiempo_productivo_por_agente(
+            fecha_inicio, fecha_fin, agente_ids=[agente.id]
+        ).get(agente.id, 0)
         
         # Asegurar que la adherencia no sea mayor al 100%
         if tiempo_planificado_total > 0:
@@ -59,22 +76,54 @@ class CalculadorAdherencia:
         }
     
     @staticmethod
-    def calcular_adherencia_tipo_contrato(tipo_contrato, fecha_inicio, fecha_fin):
+    def adherencias_por_agente(agentes_ids, fecha_inicio, fecha_fin, por_dia=False):
+        """
+        Adherencia de varios agentes con una sola carga compacta.
+        Devuelve un DataFrame con agente_id (y fecha si por_dia), planificado,
+        productivo y adherencia; solo incluye agentes con programación.
+        """
+        programas = CargadorDatos.cargar_programas(fecha_inicio, fecha_fin, agente_ids=agentes_ids)
+        claves = ['agente_id', 'fecha'] if por_dia else ['agente_id']
+        if programas.empty:
+            return pd.DataFrame(columns=claves + ['planificado', 'productivo', 'adherencia'])
+        
+        planificado = programas['minutos_planificados'].astype(np.int64).groupby(
+            [programas[c] for c in claves]).sum()
+        productivas = CargadorDatos.cargar_productivas(fecha_inicio, fecha_fin, agente_ids=agentes_ids)
+        productivo = productivas['duracion'].astype(np.int64).groupby(
+            [productivas[c] for c in claves]).sum()
+        productivo = productivo.reindex(planificado.index, fill_value=0)
+        
+        # Misma regla que calcular_adherencia_agente (tope 100%)
+        adherencias = np.where(
+            planificado > 0,
+            np.minimum(productivo / planificado.where(planificado > 0, 1) * 100, 100),
+            0
+        )
+        return pd.DataFrame({
+            'planificado': planificado,
+            'productivo': productivo,
+            'adherencia': np.round(adherencias, 2),
+        }).reset_index()
+    
+    @staticmethod
+    def calcular_adherencia_tipo_contrato(tipo_contrato, fecha_inicio, fecha_fin, supervisor_id=None):
         """
         Calcula adherencia promedio por tipo de contrato
+        Con supervisor_id solo considera los agentes de ese equipo
         """
         agentes = Agente.objects.filter(
             tipo_contrato=tipo_contrato,
             activo=True
         )
+        if supervisor_id:
+            agentes = agentes.filter(supervisor_id=supervisor_id)
+        agentes_ids = agentes.values_list('id', flat=True)
         
-        resultados = []
-        for agente in agentes:
-            resultado = CalculadorAdherencia.calcular_adherencia_agente(
-                agente, fecha_inicio, fecha_fin
-            )
-            if resultado:
-                resultados.append(resultado['adherencia'])
+        # Una sola carga compacta para todos los agentes del contrato
+        resultados = CalculadorAdherencia.adherencias_por_agente(
+            agentes_ids, fecha_inicio, fecha_fin
+        )['adherencia'].tolist()
         
         if resultados:
             return {
@@ -86,477 +135,420 @@ class CalculadorAdherencia:
             }
         return None
     
-    # dashboard/utils.py - MÉTODO CORREGIDO
+    @staticmethod
+    def actualizar_resumenes_diarios(fecha_inicio, fecha_fin):
+        """
+        Guarda por día y tipo de contrato el sketch de cuantiles de las
+        adherencias agente-día, y por día y supervisor el agregado del equipo.
+        Incluye agentes inactivos para que el histórico no cambie al dar de
+        baja a un agente.
+        """
+        diarias = CalculadorAdherencia.adherencias_por_agente(
+            None, fecha_inicio, fecha_fin, por_dia=True
+        )
+        contratos = {}
+        supervisores = {}
+        for agente_id, tipo_contrato, supervisor_id in Agente.objects.values_list(
+            'id', 'tipo_contrato', 'supervisor_id'
+        ):
+            contratos[agente_id] = tipo_contrato
+            supervisores[agente_id] = supervisor_id
+        diarias['tipo_contrato'] = diarias['agente_id'].map(contratos)
+        diarias['supervisor_id'] = diarias['agente_id'].map(supervisores)
+        
+        guardados = 0
+        for (fecha, tipo_contrato), grupo in diarias.groupby(['fecha', 'tipo_contrato']):
+            sketch = SketchCuantiles().agregar(grupo['adherencia'].to_numpy())
+            ResumenAdherenciaDiaria.objects.update_or_create(
+                fecha=fecha.date(),
+                tipo_contrato=tipo_contrato,
+                defaults={
+                    'cantidad_agentes': len(grupo),
+                    'adherencia_suma': float(grupo['adherencia'].sum()),
+                    'minutos_planificados': int(grupo['planificado'].sum()),
+                    'minutos_productivos': int(grupo['productivo'].sum()),
+                    'sketch': sketch.a_bytes(),
+                }
+            )
+            guardados += 1
+        
+        for (fecha, supervisor_id), grupo in diarias.dropna(subset=['supervisor_id']).groupby(
+            ['fecha', 'supervisor_id']
+        ):
+            ResumenEquipoDiario.objects.update_or_create(
+                fecha=fecha.date(),
+                supervisor_id=int(supervisor_id),
+                defaults={
+                    'cantidad_agentes': len(grupo),
+                    'adherencia_suma': float(grupo['adherencia'].sum()),
+                    'minutos_planificados': int(grupo['planificado'].sum()),
+                    'minutos_productivos': int(grupo['productivo'].sum()),
+                }
+            )
+            guardados += 1
+        return guardados
     
     @staticmethod
-    def calcular_adherencia_por_hora_minuto_a_minuto(fecha):
+    def dias_sin_resumen(fecha_inicio, fecha_fin):
         """
-        Calcula adherencia por hora con cálculo MINUTO A MINUTO - VERSIÓN CORRECTA
-
-        Para cada minuto dentro de la hora:
-        1. Identifica qué agentes están programados en ESE minuto exacto
-        2. Identifica qué agentes programados están activos en ESE minuto exacto
-        3. Calcula: (agentes activos / agentes programados) para ESE minuto
-        4. Promedia todos los minutos de la hora
-
-        Esto evita la compensación global y detecta huecos reales.
+        Días cerrados del rango con programas y sin resúmenes guardados, por
+        contrato o por equipo (cada tabla se revisa por separado: los días
+        resumidos antes de existir ResumenEquipoDiario no tienen equipos)
         """
-        horas = []
-
-        for hora in range(8, 20):  # De 8 AM a 8 PM
-            # Lista para almacenar adherencia de cada minuto
-            adherencias_por_minuto = []
-            agentes_programados_por_minuto = []
-
-            # Analizar cada minuto de la hora
-            for minuto in range(60):
-                # Crear el intervalo exacto de este minuto
-                inicio_minuto = time(hora, minuto)
-                fin_minuto = time(hora, minuto + 1) if minuto < 59 else time(hora + 1, 0)
-
-                # 1. Agentes programados en ESTE minuto exacto
-                programas_en_minuto = ProgramaDiario.objects.filter(
-                    fecha=fecha,
-                    hora_inicio__lt=fin_minuto,
-                    hora_fin__gt=inicio_minuto
-                )
-
-                agentes_programados = programas_en_minuto.count()
-
-                if agentes_programados == 0:
-                    # Si no hay agentes programados, adherencia = 0% (o N/A)
-                    adherencias_por_minuto.append(0)
-                    agentes_programados_por_minuto.append(0)
-                    continue
-
-                # 2. Agentes ACTIVOS en ESTE minuto exacto
-                agentes_ids = programas_en_minuto.values_list('agente_id', flat=True)
-
-                agentes_activos = RegistroActividad.objects.filter(
-                    fecha=fecha,
-                    agente_id__in=agentes_ids,
-                    hora_inicio__time__lt=fin_minuto,
-                    hora_fin__time__gt=inicio_minuto,
-                    tipo_actividad__in=['LLAMADA', 'DISPO', 'CAPAC', 'ADMIN']
-                ).values('agente_id').distinct().count()
-
-                # 3. Calcular adherencia para ESTE minuto exacto
-                adherencia_minuto = (agentes_activos / agentes_programados) * 100
-                adherencias_por_minuto.append(adherencia_minuto)
-                agentes_programados_por_minuto.append(agentes_programados)
-
-            # 4. Calcular promedios para la hora completa
-            if adherencias_por_minuto:
-                # Promedio ponderado por agentes programados en cada minuto
-                total_minutos = len(adherencias_por_minuto)
-                minutos_con_programacion = sum(1 for apm in agentes_programados_por_minuto if apm > 0)
-
-                if minutos_con_programacion > 0:
-                    # Solo considerar minutos donde HAY programación
-                    adherencia_promedio = sum(
-                        adherencias_por_minuto[i]
-                        for i in range(total_minutos)
-                        if agentes_programados_por_minuto[i] > 0
-                    ) / minutos_con_programacion
-
-                    # Agentes programados promedio en la hora
-                    agentes_programados_promedio = sum(agentes_programados_por_minuto) / total_minutos
-
-                    # Minutos con adherencia < 80% (problemas)
-                    minutos_baja_adherencia = sum(1 for a in adherencias_por_minuto if a < 80)
-
-                    horas.append({
-                        'hora': f"{hora:02d}:00",
-                        'adherencia': round(adherencia_promedio, 2),
-                        'agentes_programados_promedio': round(agentes_programados_promedio, 1),
-                        'minutos_con_programacion': minutos_con_programacion,
-                        'minutos_baja_adherencia': minutos_baja_adherencia,
-                        'consistencia': round((1 - (minutos_baja_adherencia / minutos_con_programacion)) * 100, 1) if minutos_con_programacion > 0 else 0
-                    })
-                else:
-                    # No hay programación en toda la hora
-                    horas.append({
-                        'hora': f"{hora:02d}:00",
-                        'adherencia': 0,
-                        'agentes_programados_promedio': 0,
-                        'minutos_con_programacion': 0,
-                        'minutos_baja_adherencia': 0,
-                        'consistencia': 0
-                    })
+        cerrado_hasta = min(fecha_fin, date.today() - timedelta(days=1))
+        if fecha_inicio > cerrado_hasta:
+            return []
+        rango = [fecha_inicio, cerrado_hasta]
+        con_programa = set(ProgramaDiario.objects.filter(
+            fecha__range=rango
+        ).values_list('fecha', flat=True).distinct())
+        con_equipo = set(ProgramaDiario.objects.filter(
+            fecha__range=rango, agente__supervisor__isnull=False
+        ).values_list('fecha', flat=True).distinct())
+        por_contrato = set(ResumenAdherenciaDiaria.objects.filter(
+            fecha__range=rango
+        ).values_list('fecha', flat=True))
+        por_equipo = set(ResumenEquipoDiario.objects.filter(
+            fecha__range=rango
+        ).values_list('fecha', flat=True))
+        return sorted((con_programa - por_contrato) | (con_equipo - por_equipo))
+    
+    @staticmethod
+    def _al_vuelo(agentes_ids, fechas):
+        """
+        Adherencias agente-día (por_dia) de las `fechas` sueltas sin resumen
+        guardado, con una carga compacta del rango que las cubre
+        """
+        diarias = CalculadorAdherencia.adherencias_por_agente(
+            agentes_ids, min(fechas), max(fechas), por_dia=True
+        )
+        return diarias[diarias['fecha'].isin(pd.to_datetime(sorted(fechas)))]
+    
+    @staticmethod
+    def percentiles_adherencia(tipo_contrato, fecha_inicio, fecha_fin, cuantiles=(0.1, 0.5, 0.9)):
+        """
+        Percentiles de la adherencia agente-día del rango fusionando los
+        sketches diarios guardados (ver resumir_adherencia). El día de hoy y
+        los días cerrados que aún no tienen resumen se calculan al vuelo sin
+        guardarse.
+        """
+        hoy = date.today()
+        cerrado_hasta = min(fecha_fin, hoy - timedelta(days=1))
+        
+        resumenes = ResumenAdherenciaDiaria.objects.filter(
+            tipo_contrato=tipo_contrato,
+            fecha__range=[fecha_inicio, cerrado_hasta]
+        ).values_list('fecha', 'sketch', 'cantidad_agentes', 'adherencia_suma')
+        
+        sketches, agentes_dia, suma, resumidos = [], 0, 0.0, set()
+        for fecha, datos, cantidad, adherencia_suma in resumenes:
+            sketches.append(SketchCuantiles.desde_bytes(datos))
+            agentes_dia += cantidad
+            suma += adherencia_suma
+            resumidos.add(fecha)
+        
+        al_vuelo = set(ProgramaDiario.objects.filter(
+            agente__tipo_contrato=tipo_contrato, fecha__range=[fecha_inicio, cerrado_hasta]
+        ).values_list('fecha', flat=True).distinct()) - resumidos
+        if fecha_inicio <= hoy <= fecha_fin:
+            al_vuelo.add(hoy)
+        if al_vuelo:
+            agentes_ids = Agente.objects.filter(tipo_contrato=tipo_contrato).values_list('id', flat=True)
+            adherencias = CalculadorAdherencia._al_vuelo(agentes_ids, al_vuelo)['adherencia']
+            sketches.append(SketchCuantiles().agregar(adherencias.to_numpy()))
+            agentes_dia += len(adherencias)
+            suma += float(adherencias.sum())
+        
+        sketch = SketchCuantiles.fusionar_todos(sketches)
+        if not len(sketch):
+            return None
+        
+        resultado = {
+            f"p{round(q * 100)}": round(sketch.cuantil(q), 2) for q in cuantiles
+        }
+        resultado['promedio'] = round(suma / agentes_dia, 2) if agentes_dia else 0
+        resultado['agentes_dia'] = agentes_dia
+        return resultado
+    
+    @staticmethod
+    def adherencia_diaria_contratos(fechas):
+        """
+        {fecha: {tipo_contrato: adherencia promedio}} de las `fechas` con una
+        sola consulta a los resúmenes diarios. El día de hoy y los días
+        cerrados que aún no tienen resumen se calculan al vuelo sin guardarse.
+        """
+        hoy = date.today()
+        serie = {fecha: {} for fecha in fechas}
+        cerradas = [fecha for fecha in fechas if fecha < hoy]
+        for fecha, tipo_contrato, cantidad, suma in ResumenAdherenciaDiaria.objects.filter(
+            fecha__in=cerradas
+        ).values_list('fecha', 'tipo_contrato', 'cantidad_agentes', 'adherencia_suma'):
+            serie[fecha][tipo_contrato] = round(suma / cantidad, 2) if cantidad else 0
+        
+        al_vuelo = set(ProgramaDiario.objects.filter(
+            fecha__in=[fecha for fecha in cerradas if not serie[fecha]]
+        ).values_list('fecha', flat=True).distinct())
+        if hoy in serie:
+            al_vuelo.add(hoy)
+        if al_vuelo:
+            contratos = dict(Agente.objects.values_list('id', 'tipo_contrato'))
+            diarias = CalculadorAdherencia._al_vuelo(None, al_vuelo)
+            diarias['tipo_contrato'] = diarias['agente_id'].map(contratos)
+            for (fecha, tipo_contrato), grupo in diarias.groupby(['fecha', 'tipo_contrato']):
+                serie[fecha.date()][tipo_contrato] = round(float(grupo['adherencia'].mean()), 2)
+        return serie
+    
+    @staticmethod
+    def resumen_equipos(fecha_inicio, fecha_fin, supervisor_id=None, por_dia=False):
+        """
+        Adherencia por equipo desde los agregados diarios precalculados (ver
+        resumir_adherencia). El día de hoy y los equipo-día cerrados que aún
+        no tienen agregado se calculan al vuelo, solo con los agentes de
+        esos equipos. Con por_dia devuelve además la serie diaria.
+        """
+        hoy = date.today()
+        cerrado_hasta = min(fecha_fin, hoy - timedelta(days=1))
+        
+        resumenes = ResumenEquipoDiario.objects.filter(
+            fecha__range=[fecha_inicio, cerrado_hasta]
+        )
+        programas = ProgramaDiario.objects.filter(
+            fecha__range=[fecha_inicio, cerrado_hasta], agente__supervisor__isnull=False
+        )
+        agentes = Agente.objects.filter(supervisor__isnull=False)
+        if supervisor_id:
+            resumenes = resumenes.filter(supervisor_id=supervisor_id)
+            programas = programas.filter(agente__supervisor_id=supervisor_id)
+            agentes = agentes.filter(supervisor_id=supervisor_id)
+        filas = list(resumenes.values_list(
+            'supervisor_id', 'fecha', 'cantidad_agentes', 'adherencia_suma',
+            'minutos_planificados', 'minutos_productivos'
+        ))
+        
+        # Equipo-día con programas y sin agregado guardado, más el día de hoy
+        faltantes = set(programas.order_by().values_list(
+            'agente__supervisor_id', 'fecha'
+        ).distinct()) - {(fila[0], fila[1]) for fila in filas}
+        al_vuelo = {fecha for _, fecha in faltantes}
+        if fecha_inicio <= hoy <= fecha_fin:
+            al_vuelo.add(hoy)
+        equipo_de = dict(agentes.values_list('id', 'supervisor_id')) if al_vuelo else {}
+        if equipo_de:
+            diarias = CalculadorAdherencia._al_vuelo(list(equipo_de), al_vuelo)
+            diarias['supervisor_id'] = diarias['agente_id'].map(equipo_de)
+            for (sup_id, fecha), grupo in diarias.groupby(['supervisor_id', 'fecha']):
+                fecha = fecha.date()
+                if fecha == hoy or (sup_id, fecha) in faltantes:
+                    filas.append((
+                        int(sup_id), fecha, len(grupo), float(grupo['adherencia'].sum()),
+                        int(grupo['planificado'].sum()), int(grupo['productivo'].sum())
+                    ))
+        
+        nombres = {
+            u.id: u.get_full_name() or u.username
+            for u in User.objects.filter(id__in={f[0] for f in filas})
+        }
+        equipos = {}
+        for sup_id, fecha, cantidad, suma, planificado, productivo in filas:
+            equipo = equipos.setdefault(sup_id, {
+                'supervisor_id': sup_id,
+                'supervisor': nombres.get(sup_id, ''),
+                'agentes_dia': 0,
+                'adherencia_suma': 0.0,
+                'minutos_planificados': 0,
+                'minutos_productivos': 0,
+                'dias': [],
+            })
+            equipo['agentes_dia'] += cantidad
+            equipo['adherencia_suma'] += suma
+            equipo['minutos_planificados'] += planificado
+            equipo['minutos_productivos'] += productivo
+            if por_dia:
+                equipo['dias'].append({
+                    'fecha': fecha.strftime('%Y-%m-%d'),
+                    'agentes': cantidad,
+                    'adherencia': round(suma / cantidad, 2) if cantidad else 0,
+                })
+        
+        resultado = []
+        for equipo in equipos.values():
+            suma = equipo.pop('adherencia_suma')
+            equipo['adherencia_promedio'] = round(suma / equipo['agentes_dia'], 2) if equipo['agentes_dia'] else 0
+            if not por_dia:
+                del equipo['dias']
             else:
+                equipo['dias'].sort(key=lambda d: d['fecha'])
+            resultado.append(equipo)
+        
+        return sorted(resultado, key=lambda e: e['adherencia_promedio'], reverse=True)
+    
+    @staticmethod
+    def calcular_adherencia_por_hora(fecha, agente_ids=None, intervalo=60,
+                                     inicio_min=8 * 60, fin_min=20 * 60):
+        """
+        Calcula adherencia por intervalo (por defecto por hora, de 8:00 a 20:00)
+        con cálculo MINUTO A MINUTO. Un solo vector de ocupación del día y sus
+        sumas prefijas dan cada intervalo en O(1); fin_min > 1440 sigue en la
+        madrugada siguiente. Con agente_ids (p. ej. un equipo) solo carga esos
+        agentes
+        """
+        ocupacion = ocupacion_dia(fecha, inicio_min, fin_min, agente_ids=agente_ids)
+        tramos = intervalos(ocupacion, intervalo)
+
+        horas = []
+        for i, etiqueta in enumerate(tramos['etiquetas']):
+            minutos = tramos['minutos_programados'][i]
+            if not minutos:
                 horas.append({
-                    'hora': f"{hora:02d}:00",
+                    'hora': etiqueta,
                     'adherencia': 0,
-                    'agentes_programados_promedio': 0,
-                    'minutos_con_programacion': 0,
+                    'agentes_programados': 0,
+                    'agentes_activos': 0,
+                    'minutos_programados': 0,
                     'minutos_baja_adherencia': 0,
-                    'consistencia': 0
+                    'minutos_criticos': 0,
+                    'consistencia': 0,
+                    'estado': '⏸️  Sin programación'
                 })
+                continue
+
+            adherencia = float(tramos['suma_adherencia'][i] / minutos)
+            minutos_baja = int(tramos['minutos_baja'][i])
+            horas.append({
+                'hora': etiqueta,
+                'adherencia': round(adherencia, 2),
+                'agentes_programados': round(float(tramos['programados'][i] / minutos), 1),
+                'agentes_activos': round(float(tramos['activos'][i] / minutos), 1),
+                'minutos_programados': int(minutos),
+                'minutos_baja_adherencia': minutos_baja,
+                'minutos_criticos': int(tramos['minutos_criticos'][i]),
+                'consistencia': round((minutos - minutos_baja) / minutos * 100, 1),
+                'estado': '✅ Excelente' if adherencia >= 90 else
+                         '⚠️  Aceptable' if adherencia >= 80 else
+                         '🔴 Crítico' if adherencia >= 60 else
+                         '💀 Grave'
+            })
 
         return horas
 
     @staticmethod
-    def calcular_adherencia_por_hora(fecha):
+    def calcular_matriz_adherencia_agente(agente, fechas, intervalo=60,
+                                          inicio_min=8 * 60, fin_min=20 * 60):
         """
-        Calcula adherencia por hora con cálculo MINUTO A MINUTO - VERSIÓN OPTIMIZADA
-        Usa pre-carga de datos y diccionarios para mejor performance
+        Adherencia de un agente por fecha e intervalo: {'intervalos': [...],
+        'valores': {fecha: [adherencia o None si no estaba programado]}}
         """
-        from collections import defaultdict
-        import numpy as np
-
-        horas = []
-
-        # 1. Pre-cargar TODOS los datos del día una sola vez
-        programas_dia = list(ProgramaDiario.objects.filter(fecha=fecha))
-        actividades_dia = list(RegistroActividad.objects.filter(
-            fecha=fecha,
-            tipo_actividad__in=['LLAMADA', 'DISPO', 'CAPAC', 'ADMIN']
-        ))
-
-        # 2. Crear estructuras de acceso rápido
-        # Diccionario: hora -> minuto -> lista de agentes programados
-        programacion_por_minuto = defaultdict(lambda: defaultdict(set))
-
-        for programa in programas_dia:
-            # Para cada minuto que cubre este programa, agregar al agente
-            hora_inicio_prog = programa.hora_inicio.hour
-            minuto_inicio_prog = programa.hora_inicio.minute
-            hora_fin_prog = programa.hora_fin.hour
-            minuto_fin_prog = programa.hora_fin.minute
-
-            # Convertir a minutos absolutos desde las 00:00
-            inicio_abs = hora_inicio_prog * 60 + minuto_inicio_prog
-            fin_abs = hora_fin_prog * 60 + minuto_fin_prog
-
-            # Solo considerar horario laboral (8:00-20:00)
-            inicio_abs = max(inicio_abs, 8 * 60)  # 8:00 AM
-            fin_abs = min(fin_abs, 20 * 60)       # 8:00 PM
-
-            for minuto_abs in range(inicio_abs, fin_abs):
-                if 8*60 <= minuto_abs < 20*60:  # Solo horario laboral
-                    hora = minuto_abs // 60
-                    minuto = minuto_abs % 60
-                    programacion_por_minuto[hora][minuto].add(programa.agente_id)
-
-        # 3. Diccionario: hora -> minuto -> lista de agentes activos
-        actividad_por_minuto = defaultdict(lambda: defaultdict(set))
-
-        for actividad in actividades_dia:
-            hora_inicio_act = actividad.hora_inicio.hour
-            minuto_inicio_act = actividad.hora_inicio.minute
-            hora_fin_act = actividad.hora_fin.hour
-            minuto_fin_act = actividad.hora_fin.minute
-
-            # Convertir a minutos absolutos
-            inicio_abs = hora_inicio_act * 60 + minuto_inicio_act
-            fin_abs = hora_fin_act * 60 + minuto_fin_act
-
-            # Solo considerar horario laboral
-            inicio_abs = max(inicio_abs, 8 * 60)
-            fin_abs = min(fin_abs, 20 * 60)
-
-            for minuto_abs in range(inicio_abs, fin_abs):
-                if 8*60 <= minuto_abs < 20*60:
-                    hora = minuto_abs // 60
-                    minuto = minuto_abs % 60
-                    actividad_por_minuto[hora][minuto].add(actividad.agente_id)
-
-        # 4. Calcular para cada hora
-        for hora in range(8, 20):
-            adherencias_minutos = []
-            agentes_prog_por_minuto = []
-            agentes_activos_por_minuto = []
-
-            for minuto in range(60):
-                # Agentes programados en este minuto
-                agentes_prog = programacion_por_minuto[hora].get(minuto, set())
-                num_agentes_prog = len(agentes_prog)
-
-                if num_agentes_prog == 0:
-                    adherencias_minutos.append(0)
-                    agentes_prog_por_minuto.append(0)
-                    agentes_activos_por_minuto.append(0)
-                    continue
-
-                # Agentes activos en este minuto
-                agentes_activos = actividad_por_minuto[hora].get(minuto, set())
-                num_agentes_activos = len(agentes_activos.intersection(agentes_prog))
-
-                # Adherencia para este minuto
-                adherencia = (num_agentes_activos / num_agentes_prog) * 100
-                adherencias_minutos.append(adherencia)
-                agentes_prog_por_minuto.append(num_agentes_prog)
-                agentes_activos_por_minuto.append(num_agentes_activos)
-
-            # Calcular estadísticas para la hora
-            if adherencias_minutos:
-                # Solo considerar minutos con programación
-                minutos_con_programacion = [i for i, apm in enumerate(agentes_prog_por_minuto) if apm > 0]
-
-                if minutos_con_programacion:
-                    adherencia_promedio = np.mean([adherencias_minutos[i] for i in minutos_con_programacion])
-                    agentes_promedio = np.mean([agentes_prog_por_minuto[i] for i in minutos_con_programacion])
-                    agentes_activos_promedio = np.mean([agentes_activos_por_minuto[i] for i in minutos_con_programacion])
-
-                    # Detectar problemas
-                    minutos_baja = sum(1 for i in minutos_con_programacion if adherencias_minutos[i] < 80)
-                    minutos_criticos = sum(1 for i in minutos_con_programacion if adherencias_minutos[i] < 50)
-
-                    # Calcular consistencia
-                    consistencia = (len(minutos_con_programacion) - minutos_baja) / len(minutos_con_programacion) * 100
-
-                    horas.append({
-                        'hora': f"{hora:02d}:00",
-                        'adherencia': round(adherencia_promedio, 2),
-                        'agentes_programados': round(agentes_promedio, 1),
-                        'agentes_activos': round(agentes_activos_promedio, 1),
-                        'minutos_programados': len(minutos_con_programacion),
-                        'minutos_baja_adherencia': minutos_baja,
-                        'minutos_criticos': minutos_criticos,
-                        'consistencia': round(consistencia, 1),
-                        'estado': '✅ Excelente' if adherencia_promedio >= 90 else
-                                 '⚠️  Aceptable' if adherencia_promedio >= 80 else
-                                 '🔴 Crítico' if adherencia_promedio >= 60 else
-                                 '💀 Grave'
-                    })
-                else:
-                    # No hay programación en la hora
-                    horas.append({
-                        'hora': f"{hora:02d}:00",
-                        'adherencia': 0,
-                        'agentes_programados': 0,
-                        'agentes_activos': 0,
-                        'minutos_programados': 0,
-                        'minutos_baja_adherencia': 0,
-                        'minutos_criticos': 0,
-                        'consistencia': 0,
-                        'estado': '⏸️  Sin programación'
-                    })
+        cubo = CuboAdherencia.construir(
+            min(fechas), max(fechas), inicio_min, fin_min, agente_ids=[agente.id]
+        )
+        tramos = intervalos(cubo, intervalo)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            adherencia = tramos['suma_adherencia'] / tramos['minutos_programados']
 
-        return horas
+        fila = {fecha: i for i, fecha in enumerate(cubo['fechas'])}
+        return {
+            'intervalos': tramos['etiquetas'],
+            'valores': {
+                fecha: [None if np.isnan(v) else round(float(v), 1) for v in adherencia[fila[fecha]]]
+                for fecha in fechas
+            },
+        }
 
     @staticmethod
-    def analizar_problemas_adherencia_por_minuto(fecha):
-            """
-            Detecta problemas específicos minuto a minuto
-            Devuelve huecos de productividad y sobrecargas
-            """
-            from collections import defaultdict
-
-            # 1. Obtener datos minuto a minuto
-            resultado = CalculadorAdherencia.calcular_adherencia_por_hora(fecha)
-
-            # 2. Analizar problemas
-            problemas = {
-                'huecos_productividad': [],  # Minutos con adherencia < 50%
-                'sobrecargas': [],           # Minutos con adherencia > 110% (imposible)
-                'horas_criticas': [],        # Horas con >30% de minutos problemáticos
-                'resumen_por_hora': defaultdict(dict)
-            }
-
-            for hora_data in resultado:
-                hora = hora_data['hora']
-
-                # 3. Detectar horas críticas
-                if hora_data['minutos_criticos'] > 0:
-                    problemas['horas_criticas'].append({
-                        'hora': hora,
-                        'minutos_criticos': hora_data['minutos_criticos'],
-                        'adherencia_promedio': hora_data['adherencia']
-                    })
-
-                problemas['resumen_por_hora'][hora] = {
-                    'adherencia': hora_data['adherencia'],
-                    'estado': hora_data.get('estado', 'Sin estado'),
-                    'minutos_baja': hora_data.get('minutos_baja_adherencia', 0),
-                    'consistencia': hora_data.get('consistencia', 0)
-                }
-
-            # 4. Obtener datos detallados minuto a minuto para análisis
-            print(f"\n🔍 ANÁLISIS DETALLADO DE ADHERENCIA - {fecha}")
-            print("="*60)
-
-            for hora in range(8, 20):
-                print(f"\n🕐 HORA {hora:02d}:00")
-                print("-"*40)
-
-                # Obtener distribución de adherencia por minuto para esta hora
-                distribucion = CalculadorAdherencia.obtener_distribucion_adherencia_por_minuto(fecha, hora)
-
-                if distribucion:
-                    # Mostrar histograma simple
-                    print("Distribución de adherencia por minuto:")
-                    for rango in ['0-20%', '20-40%', '40-60%', '60-80%', '80-100%']:
-                        count = distribucion['histograma'].get(rango, 0)
-                        bar = '█' * (count // 2)  # Cada █ = 2 minutos
-                        print(f"  {rango}: {bar} ({count} minutos)")
-
-                    # Mostrar peores minutos
-                    if distribucion['minutos_bajos']:
-                        print(f"\n⚠️  Minutos más críticos:")
-                        for minuto in distribucion['minutos_bajos'][:5]:  # Top 5 peores
-                            print(f"  {hora:02d}:{minuto['minuto']:02d} - {minuto['adherencia']:.1f}% "
-                                f"({minuto['agentes_activos']}/{minuto['agentes_programados']} agentes)")
-
-            return problemas
+    def analizar_problemas_adherencia_por_minuto(fecha, peores=5, agente_ids=None,
+                                                 inicio_min=8 * 60, fin_min=20 * 60):
+        """
+        Detecta problemas específicos minuto a minuto
+        Devuelve huecos de productividad, sobrecargas, horas críticas y los
+        peores minutos a partir de un único vector de ocupación del día
+        """
+        ocupacion = ocupacion_dia(fecha, inicio_min, fin_min, agente_ids=agente_ids)
+        return AnalizadorProblemas.analizar(ocupacion, peores=peores)
 
     @staticmethod
-    def obtener_distribucion_adherencia_por_minuto(fecha, hora):
+    def obtener_distribucion_adherencia_por_minuto(fecha, hora, ocupacion=None, intervalo=60,
+                                                   minuto=0):
         """
-        Obtiene la distribución detallada de adherencia para una hora específica
+        Obtiene la distribución detallada de adherencia para el intervalo que
+        empieza en hora:minuto (por defecto una hora completa)
+        Acepta una ``ocupacion`` ya calculada para no recargar el día
         """
-        # 1. Obtener programación para esta hora
-        hora_inicio = time(hora, 0)
-        hora_fin = time(hora + 1, 0)
+        inicio = hora * 60 + minuto
+        if ocupacion is None:
+            ocupacion = ocupacion_dia(fecha, inicio, inicio + intervalo)
 
-        programas_hora = ProgramaDiario.objects.filter(
-            fecha=fecha,
-            hora_inicio__lt=hora_fin,
-            hora_fin__gt=hora_inicio
-        )
+        desde = inicio - ocupacion['inicio_min']
+        programados = np.asarray(ocupacion['programados'][desde:desde + intervalo])
+        activos = np.asarray(ocupacion['activos'][desde:desde + intervalo])
 
-        if not programas_hora.exists():
+        if not programados.any():
             return None
 
-        # 2. Para cada minuto, calcular adherencia
-        distribucion = {
-            'hora': f"{hora:02d}:00",
-            'minutos_analizados': 60,
-            'histograma': defaultdict(int),
-            'minutos_bajos': [],
-            'adherencia_promedio': 0,
-            'consistencia': 0
-        }
-
-        adherencias_minuto = []
-
-        for minuto in range(60):
-            inicio_minuto = time(hora, minuto)
-            fin_minuto = time(hora, minuto + 1) if minuto < 59 else time(hora + 1, 0)
-
-            # Agentes programados
-            agentes_prog = programas_hora.filter(
-                hora_inicio__lt=fin_minuto,
-                hora_fin__gt=inicio_minuto
-            ).count()
-
-            if agentes_prog == 0:
-                continue
-
-            # Agentes activos
-            agentes_ids = programas_hora.filter(
-                hora_inicio__lt=fin_minuto,
-                hora_fin__gt=inicio_minuto
-            ).values_list('agente_id', flat=True)
-
-            agentes_activos = RegistroActividad.objects.filter(
-                fecha=fecha,
-                agente_id__in=agentes_ids,
-                hora_inicio__time__lt=fin_minuto,
-                hora_fin__time__gt=inicio_minuto,
-                tipo_actividad__in=['LLAMADA', 'DISPO', 'CAPAC', 'ADMIN']
-            ).values('agente_id').distinct().count()
-
-            # Calcular adherencia
-            adherencia = (agentes_activos / agentes_prog) * 100
-            adherencias_minuto.append(adherencia)
-
-            # Agregar al histograma
-            if adherencia <= 20:
-                distribucion['histograma']['0-20%'] += 1
-            elif adherencia <= 40:
-                distribucion['histograma']['20-40%'] += 1
-            elif adherencia <= 60:
-                distribucion['histograma']['40-60%'] += 1
-            elif adherencia <= 80:
-                distribucion['histograma']['60-80%'] += 1
-            else:
-                distribucion['histograma']['80-100%'] += 1
-
-            # Si es baja, agregar a minutos bajos
-            if adherencia < 60:
-                distribucion['minutos_bajos'].append({
-                    'minuto': minuto,
-                    'adherencia': round(adherencia, 1),
-                    'agentes_programados': agentes_prog,
-                    'agentes_activos': agentes_activos
-                })
-
-        # Calcular promedios
-        if adherencias_minuto:
-            distribucion['adherencia_promedio'] = round(sum(adherencias_minuto) / len(adherencias_minuto), 2)
-
-            # Consistencia: % de minutos con adherencia >= 80%
-            minutos_consistentes = sum(1 for a in adherencias_minuto if a >= 80)
-            distribucion['consistencia'] = round((minutos_consistentes / len(adherencias_minuto)) * 100, 1)
-
+        adherencias = AnalizadorProblemas.adherencia_por_minuto(programados, activos)
+        con_programacion = programados > 0
+        validas = adherencias[con_programacion]
+
+        rangos = np.digitize(validas, LIMITES_HISTOGRAMA, right=True)
+        conteo = np.bincount(rangos, minlength=len(RANGOS_HISTOGRAMA))
+        histograma = defaultdict(int, {
+            rango: int(c) for rango, c in zip(RANGOS_HISTOGRAMA, conteo) if c
+        })
+
+        minutos_bajos = [
+            {
+                'minuto': minuto,
+                'adherencia': round(float(adherencias[minuto]), 1),
+                'agentes_programados': int(programados[minuto]),
+                'agentes_activos': int(activos[minuto])
+            }
+            for minuto in np.flatnonzero(con_programacion & (adherencias < 60)).tolist()
+        ]
         # Ordenar minutos bajos por peor adherencia
-        distribucion['minutos_bajos'].sort(key=lambda x: x['adherencia'])
+        minutos_bajos.sort(key=lambda x: x['adherencia'])
 
-        return distribucion
+        return {
+            'hora': f"{(inicio // 60) % 24:02d}:{inicio % 60:02d}",
+            'minutos_analizados': intervalo,
+            'histograma': histograma,
+            'minutos_bajos': minutos_bajos,
+            'adherencia_promedio': round(float(validas.mean()), 2),
+            # Consistencia: % de minutos con adherencia >= 80%
+            'consistencia': round(float((validas >= 80).mean() * 100), 1)
+        }
 
+    @staticmethod
+    def simular_impacto_factores(fecha_inicio, fecha_fin):
+        """
+        Monte Carlo del impacto de los factores (por factor y combinado),
+        reproducible por rango de fechas y en caché hasta que cambie un factor
+        """
+        return SimuladorImpacto.simular(fecha_inicio, fecha_fin)
+    
     @staticmethod
     def calcular_impacto_factores(fecha_inicio, fecha_fin):
         """
         Simula el impacto de diferentes factores en la adherencia
         """
-        factores = FactorImpacto.objects.all()
-        resultados = []
-        
-        for factor in factores:
-            # Simular impacto basado en datos históricos
-            impacto_simulado = np.random.normal(
-                float(factor.impacto_porcentaje), 
-                2.5
-            )
-            
-            resultados.append({
-                'factor': factor.nombre,
-                'categoria': factor.categoria,
-                'impacto_teorico': float(factor.impacto_porcentaje),
-                'impacto_simulado': round(impacto_simulado, 2),
-                'descripcion': factor.descripcion
-            })
-        
-        return sorted(resultados, key=lambda x: abs(x['impacto_simulado']), reverse=True)
+        return SimuladorImpacto.simular(fecha_inicio, fecha_fin)['factores']
     
     @staticmethod
-    def generar_reporte_adherencia(fecha_inicio, fecha_fin):
+    def generar_reporte_adherencia(fecha_inicio, fecha_fin, supervisor_id=None):
         """
-        Genera reporte completo de adherencia
+        Genera reporte completo de adherencia (opcionalmente de un equipo)
         """
         # Adherencia por tipo de contrato
         ft_adherencia = CalculadorAdherencia.calcular_adherencia_tipo_contrato(
-            'FT', fecha_inicio, fecha_fin
+            'FT', fecha_inicio, fecha_fin, supervisor_id=supervisor_id
         )
         pt_adherencia = CalculadorAdherencia.calcular_adherencia_tipo_contrato(
-            'PT', fecha_inicio, fecha_fin
+            'PT', fecha_inicio, fecha_fin, supervisor_id=supervisor_id
         )
         
-        # Top 5 agentes
-        agentes_ft = Agente.objects.filter(tipo_contrato='FT', activo=True)
-        agentes_pt = Agente.objects.filter(tipo_contrato='PT', activo=True)
-        
-        top_ft = []
-        top_pt = []
-        
-        for agente in agentes_ft[:10]:  # Limitamos para performance
-            resultado = CalculadorAdherencia.calcular_adherencia_agente(
-                agente, fecha_inicio, fecha_fin
-            )
-            if resultado:
-                top_ft.append(resultado)
-        
-        for agente in agentes_pt[:10]:
-            resultado = CalculadorAdherencia.calcular_adherencia_agente(
-                agente, fecha_inicio, fecha_fin
-            ) 
-            if resultado:
-                top_pt.append(resultado)
-        
-        # Ordenar por adherencia
-        top_ft.sort(key=lambda x: x['adherencia'], reverse=True)
-        top_pt.sort(key=lambda x: x['adherencia'], reverse=True)
+        # Top 5 agentes sobre toda la población (no solo los primeros códigos)
+        top_ft = RankingAgentes.top(fecha_inicio, fecha_fin, k=5, tipo_contrato='FT',
+                                    supervisor_id=supervisor_id)
+        top_pt = RankingAgentes.top(fecha_inicio, fecha_fin, k=5, tipo_contrato='PT',
+                                    supervisor_id=supervisor_id)
         
         return {
             'fecha_inicio': fecha_inicio,
@@ -610,6 +602,12 @@ class SimuladorDatos:
     def generar_programacion_mes(mes, año):
         """Genera programación para un mes completo - VERSIÓN CORREGIDA"""
         agentes = Agente.objects.filter(activo=True)
+        # Sin get_or_create por fila: se omiten los agente-día ya programados
+        # y el resto entra en un solo bulk_create
+        existentes = set(ProgramaDiario.objects.filter(
+            fecha__range=[date(año, mes, 1), date(año, mes, 28)]
+        ).values_list('agente_id', 'fecha'))
+        programas = []
         
         for dia in range(1, 29):  # Simulamos 28 días
             fecha = date(año, mes, dia)
@@ -643,17 +641,18 @@ class SimuladorDatos:
                             hora_inicio_obj = time(14, 0)
                             hora_fin_obj = time(18, 0)
                     
-                    ProgramaDiario.objects.get_or_create(
-                        agente=agente,
-                        fecha=fecha,
-                        defaults={
-                            'turno': turno,
-                            'hora_inicio': hora_inicio_obj,
-                            'hora_fin': hora_fin_obj,
-                            'horas_planificadas': horas,
-                            'pausas_planificadas': 1.0 if horas == 8.0 else 0.5
-                        }
-                    )
+                    if (agente.id, fecha) not in existentes:
+                        programas.append(ProgramaDiario(
+                            agente=agente,
+                            fecha=fecha,
+                            turno=turno,
+                            hora_inicio=hora_inicio_obj,
+                            hora_fin=hora_fin_obj,
+                            horas_planificadas=horas,
+                            pausas_planificadas=1.0 if horas == 8.0 else 0.5
+                        ))
+        
+        ProgramaDiario.objects.bulk_create(programas, batch_size=1000)
     
     @staticmethod
     def generar_actividades_dia(fecha):
@@ -661,7 +660,8 @@ class SimuladorDatos:
         from django.utils import timezone
         from datetime import datetime, date, time
         
-        agentes_programados = ProgramaDiario.objects.filter(fecha=fecha)
+        agentes_programados = ProgramaDiario.objects.filter(fecha=fecha).select_related('agente')
+        actividades = []
         
         for programa in agentes_programados:
             agente = programa.agente
@@ -699,7 +699,7 @@ class SimuladorDatos:
                 hora_inicio_aware = timezone.make_aware(hora_inicio_dt)
                 hora_fin_aware = timezone.make_aware(hora_fin_dt)
                 
-                RegistroActividad.objects.create(
+                actividades.append(RegistroActividad(
                     agente=agente,
                     fecha=fecha,
                     hora_inicio=hora_inicio_aware,
@@ -708,11 +708,14 @@ class SimuladorDatos:
                     duracion_minutos=duracion,
                     llamadas_atendidas=1 if tipo == 'LLAMADA' else 0,
                     tiempo_conversacion=duracion if tipo == 'LLAMADA' else 0
-                )
+                ))
                 
                 # Avanzar hora
                 hora_actual = (datetime.combine(date.today(), hora_actual) + 
                               timedelta(minutes=duracion)).time()
+        
+        # Un solo bulk_create: contadores e invalidaciones una vez por día
+        RegistroActividad.objects.bulk_create(actividades, batch_size=1000)
     
     @staticmethod
     @transaction.atomic
@@ -732,6 +735,7 @@ class SimuladorDatos:
             RegistroActividad.objects.all().delete()
             ProgramaDiario.objects.all().delete()
             Agente.objects.all().delete()
+            ContadorDiario.objects.all().delete()
             print("   ✅ Datos eliminados")
             
             # 2. Crear agentes
@@ -745,18 +749,13 @@ class SimuladorDatos:
             
             # 3. Verificar horas semanales
             print("\n3. ⏰ Verificando horas semanales...")
-            for agente in Agente.objects.all():
-                if agente.tipo_contrato == 'FT' and agente.horas_semana != 40:
-                    agente.horas_semana = 40
-                    agente.save()
-                elif agente.tipo_contrato == 'PT' and agente.horas_semana != 20:
-                    agente.horas_semana = 20
-                    agente.save()
-            print("   ✅ Horas semanales verificadas")
+            corregidos = ReparadorDatos.reparar(['horas_semana'])['horas_semana']
+            print(f"   ✅ Horas semanales verificadas ({corregidos} corregidos)")
             
             # 4. Generar programación
             print(f"\n4. 📅 Generando programación para {dias} días...")
             hoy = date.today()
+            programas = []
             
             for i in range(dias):
                 fecha = hoy - timedelta(days=i)
@@ -785,7 +784,7 @@ class SimuladorDatos:
                                 hora_fin = time(18, 0)
                             horas = 4.0
                         
-                        ProgramaDiario.objects.create(
+                        programas.append(ProgramaDiario(
                             agente=agente,
                             fecha=fecha,
                             turno=turno,
@@ -793,7 +792,8 @@ class SimuladorDatos:
                             hora_fin=hora_fin,
                             horas_planificadas=horas,
                             pausas_planificadas=1.0 if horas == 8.0 else 0.5
-                        )
+                        ))
+            ProgramaDiario.objects.bulk_create(programas, batch_size=1000)
             
             print(f"   ✅ {ProgramaDiario.objects.count()} programas creados")
             
@@ -804,13 +804,10 @@ class SimuladorDatos:
                 if programas.exists():
                     horas_prom = programas.aggregate(avg=Avg('horas_planificadas'))['avg'] or 0
                     print(f"   • {label}: {horas_prom:.1f}h promedio planificadas")
-                    
-                    if tipo == 'PT' and horas_prom > 5:
-                        print(f"     ⚠️  Corrigiendo horas PT...")
-                        for programa in programas:
-                            if programa.horas_planificadas > 5:
-                                programa.horas_planificadas = 4.0
-                                programa.save()
+            
+            corregidos = ReparadorDatos.reparar(['horas_planificadas_cero', 'horas_pt_excedidas'])
+            if any(corregidos.values()):
+                print(f"     ⚠️  {sum(corregidos.values())} programas con horas corregidas")
             
             # 6. Generar actividades
             print(f"\n6. 📊 Generando actividades para {dias} días...")
@@ -880,74 +877,35 @@ class SimuladorDatos:
             return False
     
     @staticmethod
-    def verificar_datos():
+    def verificar_datos(dias=None):
         """
         Verifica la integridad de los datos existentes
+        (ver VerificadorIntegridad / manage.py verificar_integridad)
         """
         print("🔍 VERIFICANDO INTEGRIDAD DE DATOS")
         print("=" * 50)
         
-        problemas = []
+        reporte = VerificadorIntegridad.verificar(dias=dias)
+        agentes = reporte['agentes']
+        print(f"✅ Agentes: {agentes['total']} total")
+        print(f"   • FT: {agentes['ft']}")
+        print(f"   • PT: {agentes['pt']}")
         
-        # 1. Verificar agentes
-        agentes = Agente.objects.all()
-        if not agentes.exists():
-            problemas.append("No hay agentes creados")
-        else:
-            print(f"✅ Agentes: {agentes.count()} total")
-            print(f"   • FT: {agentes.filter(tipo_contrato='FT').count()}")
-            print(f"   • PT: {agentes.filter(tipo_contrato='PT').count()}")
-            
-            # Verificar horas semanales
-            for agente in agentes:
-                if agente.tipo_contrato == 'FT' and agente.horas_semana != 40:
-                    problemas.append(f"Agente {agente.codigo} FT tiene {agente.horas_semana}h (debería ser 40h)")
-                elif agente.tipo_contrato == 'PT' and agente.horas_semana != 20:
-                    problemas.append(f"Agente {agente.codigo} PT tiene {agente.horas_semana}h (debería ser 20h)")
+        problemas = [v for v in reporte['verificaciones'] if v['nivel'] != 'ok']
         
-        # 2. Verificar programación
-        programas = ProgramaDiario.objects.all()
-        if not programas.exists():
-            problemas.append("No hay programación creada")
-        else:
-            print(f"\n✅ Programas: {programas.count()} total")
-            
-            # Verificar horas planificadas por tipo
-            for tipo, label in [('FT', 'Full-Time'), ('PT', 'Part-Time')]:
-                programas_tipo = programas.filter(agente__tipo_contrato=tipo)
-                if programas_tipo.exists():
-                    horas_prom = programas_tipo.aggregate(avg=Avg('horas_planificadas'))['avg'] or 0
-                    print(f"   • {label}: {horas_prom:.1f}h promedio")
-                    
-                    if tipo == 'PT' and horas_prom > 5:
-                        problemas.append(f"PT tiene {horas_prom:.1f}h promedio (debería ser ~4h)")
-                    if tipo == 'FT' and horas_prom < 7:
-                        problemas.append(f"FT tiene {horas_prom:.1f}h promedio (debería ser ~8h)")
-        
-        # 3. Verificar actividades
-        actividades = RegistroActividad.objects.all()
-        if not actividades.exists():
-            problemas.append("No hay actividades creadas")
-        else:
-            print(f"\n✅ Actividades: {actividades.count()} total")
-            
-            # Distribución
-            distribucion = actividades.values('tipo_actividad').annotate(
-                total=Count('id')
-            ).order_by('-total')
-            
-            for item in distribucion[:5]:  # Top 5
-                print(f"   • {item['tipo_actividad']}: {item['total']}")
-        
-        # 4. Resumen de problemas
         if problemas:
             print(f"\n⚠️  PROBLEMAS DETECTADOS:")
             for problema in problemas:
-                print(f"   • {problema}")
-            
+                print(f"   • [{problema['nivel']}] {problema['descripcion']}: {problema['valor']}")
+        
+        if reporte['estado'] == 'error':
             print(f"\n💡 RECOMENDACIÓN:")
-            print(f"   Ejecutar: SimuladorDatos.regenerar_datos_completos()")
+            print(f"   Ejecutar: python manage.py reparar_datos")
+            print(f"   o bien: SimuladorDatos.regenerar_datos_completos()")
             return False
+        elif problemas:
+            print(f"\n🎉 DATOS VÁLIDOS (con advertencias)")
+            return True
         else:
             print(f"\n🎉 TODOS LOS DATOS SON VÁLIDOS")
             return True
@@ -972,6 +930,7 @@ class SimuladorDatos:
             
             # 2. Crear programación para hoy si no existe
             if not ProgramaDiario.objects.filter(fecha=hoy).exists():
+                programas = []
                 for agente in Agente.objects.filter(activo=True):
                     if agente.tipo_contrato == 'FT':
                         # FT: 8 horas
@@ -986,7 +945,7 @@ class SimuladorDatos:
                         hora_fin = time(12, 0) if '12:00' in turno else time(18, 0)
                         horas = 4.0
                     
-                    ProgramaDiario.objects.create(
+                    programas.append(ProgramaDiario(
                         agente=agente,
                         fecha=hoy,
                         turno=turno,
@@ -994,7 +953,8 @@ class SimuladorDatos:
                         hora_fin=hora_fin,
                         horas_planificadas=horas,
                         pausas_planificadas=1.0 if horas == 8.0 else 0.5
-                    )
+                    ))
+                ProgramaDiario.objects.bulk_create(programas)
                 print(f"✅ Programación creada para hoy")
             else:
                 print(f"✅ Ya existe programación para hoy")
@@ -1025,17 +985,18 @@ class DashboardUtilidades:
         """
         Obtiene un resumen del estado del sistema
         """
-        hoy = date.today()
+        instantanea = InstantaneaDashboard()
+        contador_hoy = instantanea.contadores[instantanea.hoy]
         
         return {
-            'agentes_totales': Agente.objects.count(),
-            'agentes_activos': Agente.objects.filter(activo=True).count(),
-            'agentes_ft': Agente.objects.filter(tipo_contrato='FT', activo=True).count(),
-            'agentes_pt': Agente.objects.filter(tipo_contrato='PT', activo=True).count(),
-            'programas_hoy': ProgramaDiario.objects.filter(fecha=hoy).count(),
-            'actividades_hoy': RegistroActividad.objects.filter(fecha=hoy).count(),
+            'agentes_totales': instantanea.agentes['registrados'],
+            'agentes_activos': instantanea.agentes['activos'],
+            'agentes_ft': instantanea.agentes['ft'],
+            'agentes_pt': instantanea.agentes['pt'],
+            'programas_hoy': contador_hoy.programas,
+            'actividades_hoy': contador_hoy.actividades,
             'ultima_actividad': RegistroActividad.objects.order_by('-hora_inicio').first(),
-            'estado': 'activo' if ProgramaDiario.objects.filter(fecha=hoy).exists() else 'inactivo'
+            'estado': 'activo' if contador_hoy.programas else 'inactivo'
         }
     
     @staticmethod
@@ -1058,7 +1019,7 @@ class DashboardUtilidades:
         )
         
         # Calcular tiempos
-        tiempo_planificado = sum(float(p.horas_planificadas) * 60 for p in programas_hoy)
+        tiempo_planificado = programas_hoy.aggregate(total=Sum('minutos_planificados'))['total'] or 0
         tiempo_productivo = actividades_productivas.aggregate(total=Sum('duracion_minutos'))['total'] or 0
         
         if tiempo_planificado > 0:
@@ -1,83 +1,153 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.contrib.auth.models import User
+from django.conf import settings
 from datetime import date, timedelta
 import json
+import logging
 
-from .models import Agente, ProgramaDiario, RegistroActividad, KPIMeta
+from .models import Agente, ProgramaDiario, RegistroActividad
 from .utils import CalculadorAdherencia, SimuladorDatos
+from .analizador import CuboAdherencia
+from .columnas import RespuestaColumnar
+from .dimensionamiento import Dimensionamiento
+from .eventos import EventosActividad, LIMITE_MAXIMO
+from .excepciones import MotorExcepciones, TIPOS_EXCEPCION
+from .jornada import JornadaAgente
+from .lineatiempo import LineaTiempo, INDICE_TIPO
+from .fragmentos import VersionDatos
+from .impacto import SimuladorImpacto
+from .instantanea import InstantaneaDashboard, supervisor_de
+from .ranking import RankingAgentes
+from .routers import lectura_analitica
 
+logger = logging.getLogger(__name__)
 
 # dashboard/views.py - CORREGIDO
 
+INTERVALOS = [5, 15, 30, 60]
+DIAS_MAXIMOS = 366  # rango máximo de las APIs con ?dias=
+
+def _supervisor_id(request):
+    """Filtro de equipo ?supervisor=<id>; None si no viene o no es válido"""
+    return supervisor_de(request)
+
+
+def _supervisores():
+    return User.objects.filter(agente__isnull=False).distinct().order_by('username')
+
+
+@lectura_analitica()
 def dashboard_principal(request):
     """Vista principal del dashboard - VERSIÓN CORREGIDA DEFINITIVA"""
     # Fechas por defecto (últimos 7 días)
     fecha_fin = date.today()
     fecha_inicio = fecha_fin - timedelta(days=7)
     
-    # Obtener datos de adherencia
-    reporte = CalculadorAdherencia.generar_reporte_adherencia(fecha_inicio, fecha_fin)
+    # Filtro de equipo: solo se cargan los agentes del supervisor
+    supervisor_id = _supervisor_id(request)
+    agente_ids = None
+    if supervisor_id:
+        agente_ids = Agente.objects.filter(activo=True, supervisor_id=supervisor_id).values_list('id', flat=True)
+    
+    # Conteos y meta compartidos con los context processors de la petición
+    instantanea = InstantaneaDashboard.de(request)
     
-    # Verificar y corregir adherencias inválidas
-    if reporte:
-        # Corregir adherencia PT si es mayor a 100%
-        if reporte.get('part_time') and reporte['part_time'].get('adherencia_promedio', 0) > 100:
-            reporte['part_time']['adherencia_promedio'] = 100
-            reporte['part_time']['rango'] = "100.00% - 100.00%"
+    # Los datos se calculan de forma perezosa: solo si la plantilla renderiza
+    # un fragmento que no está en caché ({% cache %} con version_datos)
+    def obtener_reporte():
+        reporte = CalculadorAdherencia.generar_reporte_adherencia(
+            fecha_inicio, fecha_fin, supervisor_id=supervisor_id
+        )
         
-        # Corregir adherencia FT si es mayor a 100%
-        if reporte.get('full_time') and reporte['full_time'].get('adherencia_promedio', 0) > 100:
-            reporte['full_time']['adherencia_promedio'] = min(reporte['full_time']['adherencia_promedio'], 100)
+        # Verificar y corregir adherencias inválidas
+        if reporte:
+            # Corregir adherencia PT si es mayor a 100%
+            if reporte.get('part_time') and reporte['part_time'].get('adherencia_promedio', 0) > 100:
+                reporte['part_time']['adherencia_promedio'] = 100
+                reporte['part_time']['rango'] = "100.00% - 100.00%"
+            
+            # Corregir adherencia FT si es mayor a 100%
+            if reporte.get('full_time') and reporte['full_time'].get('adherencia_promedio', 0) > 100:
+                reporte['full_time']['adherencia_promedio'] = min(reporte['full_time']['adherencia_promedio'], 100)
+        return reporte or {}
     
-    # Usar la versión CORRECTA
+    # Intervalo y ventana operativa (?intervalo=15&apertura=22:00&cierre=06:00)
     try:
-        adherencia_hora = CalculadorAdherencia.calcular_adherencia_por_hora_minuto_a_minuto(fecha_fin)
-
-        # Análisis de problemas
-        problemas = CalculadorAdherencia.analizar_problemas_adherencia_por_minuto(fecha_fin)
-    except Exception as e:
-        print(f"Error calculando adherencia por hora: {e}")
-        adherencia_hora = []
-        problemas = {'horas_criticas': [], 'resumen_por_hora': {}}
+        intervalo, inicio_min, fin_min = _ventana(request.GET)
+    except ValueError:
+        intervalo, inicio_min, fin_min = _ventana({})
     
-    # Factores de impacto
-    factores = CalculadorAdherencia.calcular_impacto_factores(fecha_inicio, fecha_fin)
+    # Usar la versión CORRECTA
+    def obtener_adherencia_hora():
+        try:
+            return CalculadorAdherencia.calcular_adherencia_por_hora(
+                fecha_fin, agente_ids=agente_ids, intervalo=intervalo,
+                inicio_min=inicio_min, fin_min=fin_min
+            )
+        except Exception:
+            logger.exception("Error calculando adherencia por hora")
+            return []
     
-    # KPIs meta
-    kpi_meta = KPIMeta.objects.filter(activo=True).first()
+    # Factores de impacto
+    impacto = SimpleLazyObject(
+        lambda: CalculadorAdherencia.simular_impacto_factores(fecha_inicio, fecha_fin)
+    )
     
     context = {
-        'reporte': reporte or {},
-        'adherencia_hora': adherencia_hora,
-        'factores': factores[:5] if factores else [],
-        'kpi_meta': kpi_meta,
+        'reporte': SimpleLazyObject(obtener_reporte),
+        'adherencia_hora': SimpleLazyObject(obtener_adherencia_hora),
+        'factores': SimpleLazyObject(lambda: impacto['factores'][:5]),
+        'impacto_combinado': SimpleLazyObject(lambda: impacto['combinado']),
+        'version_impacto': SimuladorImpacto.version(),
+        # KPIs meta
+        'kpi_meta': SimpleLazyObject(lambda: instantanea.kpi_meta),
         'fecha_inicio': fecha_inicio,
         'fecha_fin': fecha_fin,
         'hoy': date.today(),
-        'total_agentes': Agente.objects.filter(activo=True).count(),
-        'agentes_ft': Agente.objects.filter(tipo_contrato='FT', activo=True).count(),
-        'agentes_pt': Agente.objects.filter(tipo_contrato='PT', activo=True).count(),
+        'total_agentes': SimpleLazyObject(lambda: instantanea.agentes['equipo_activos']),
+        'agentes_ft': SimpleLazyObject(lambda: instantanea.agentes['equipo_ft']),
+        'agentes_pt': SimpleLazyObject(lambda: instantanea.agentes['equipo_pt']),
+        'supervisor_id': supervisor_id,
+        'supervisores': _supervisores(),
+        **_contexto_ventana(intervalo, inicio_min, fin_min),
+        **VersionDatos.contexto(),
     }
     
     return render(request, 'dashboard/index.html', context)
 
 @login_required
+@lectura_analitica()
 def kpi_detalle(request, tipo):
     """Vista detallada por tipo de KPI"""
     fecha_fin = date.today()
     fecha_inicio = fecha_fin - timedelta(days=30)
     
+    # Perezoso: solo se calcula si el fragmento no está en caché
+    percentiles = None
+    ventana = None
     if tipo == 'full-time':
-        data = CalculadorAdherencia.calcular_adherencia_tipo_contrato('FT', fecha_inicio, fecha_fin)
+        data = SimpleLazyObject(lambda: CalculadorAdherencia.calcular_adherencia_tipo_contrato('FT', fecha_inicio, fecha_fin))
+        percentiles = SimpleLazyObject(lambda: CalculadorAdherencia.percentiles_adherencia('FT', fecha_inicio, fecha_fin))
         titulo = "Adherencia Full-Time"
     elif tipo == 'part-time':
-        data = CalculadorAdherencia.calcular_adherencia_tipo_contrato('PT', fecha_inicio, fecha_fin)
+        data = SimpleLazyObject(lambda: CalculadorAdherencia.calcular_adherencia_tipo_contrato('PT', fecha_inicio, fecha_fin))
+        percentiles = SimpleLazyObject(lambda: CalculadorAdherencia.percentiles_adherencia('PT', fecha_inicio, fecha_fin))
         titulo = "Adherencia Part-Time"
     elif tipo == 'hora':
-        data = CalculadorAdherencia.calcular_adherencia_por_hora_minuto_a_minuto(date.today())
+        # Minuto a minuto sobre las líneas de tiempo, en la ventana configurada
+        try:
+            ventana = _ventana(request.GET)
+        except ValueError:
+            ventana = _ventana({})
+        intervalo, inicio_min, fin_min = ventana
+        data = SimpleLazyObject(lambda: CalculadorAdherencia.calcular_adherencia_por_hora(
+            fecha_fin, intervalo=intervalo, inicio_min=inicio_min, fin_min=fin_min
+        ))
         titulo = "Adherencia por Hora"
     else:
         data = None
@@ -86,45 +156,50 @@ def kpi_detalle(request, tipo):
     context = {
         'titulo': titulo,
         'data': data,
+        'percentiles': percentiles,
         'tipo': tipo,
         'fecha_inicio': fecha_inicio,
-        'fecha_fin': fecha_fin
+        'fecha_fin': fecha_fin,
+        'ventana': ventana,
+        **VersionDatos.contexto(),
     }
     
     return render(request, 'dashboard/kpi_detail.html', context)
 
 @login_required
+@lectura_analitica()
 def api_adherencia_diaria(request):
-    """API para gráfico de adherencia diaria - SOLO DÍAS LABORABLES"""
-    dias = int(request.GET.get('dias', 7))
-    fecha_fin = date.today()
-
-    datos = []
-    fecha_actual = fecha_fin
-    dias_contados = 0
-
-    while dias_contados < dias:
-        if fecha_actual.weekday() < 5:  # Día laborable (0=lunes, 4=viernes)
-            # Calcular para FT
-            ft_data = CalculadorAdherencia.calcular_adherencia_tipo_contrato('FT', fecha_actual, fecha_actual)
-            ft_adherencia = ft_data['adherencia_promedio'] if ft_data else 0
-
-            # Calcular para PT
-            pt_data = CalculadorAdherencia.calcular_adherencia_tipo_contrato('PT', fecha_actual, fecha_actual)
-            pt_adherencia = pt_data['adherencia_promedio'] if pt_data else 0
-
-            datos.append({
-                'fecha': fecha_actual.strftime('%Y-%m-%d'),
-                'ft': ft_adherencia,
-                'pt': pt_adherencia,
-                'total': round((ft_adherencia + pt_adherencia) / 2, 2)
-            })
-            dias_contados += 1
+    """
+    API para gráfico de adherencia diaria - SOLO DÍAS LABORABLES
+    Con formato=columnas (o Accept columnar) responde en columnas; delta=1
+    codifica las fechas como diferencias (ver columnas.py)
+    """
+    try:
+        dias = min(max(int(request.GET.get('dias', 7)), 1), DIAS_MAXIMOS)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
 
+    # Últimos `dias` días laborables (0=lunes, 4=viernes), en orden cronológico
+    fechas = []
+    fecha_actual = date.today()
+    while len(fechas) < dias:
+        if fecha_actual.weekday() < 5:
+            fechas.append(fecha_actual)
         fecha_actual -= timedelta(days=1)
+    fechas.reverse()
 
-    datos.reverse()  # Orden cronológico
-    return JsonResponse({'datos': datos})
+    serie = CalculadorAdherencia.adherencia_diaria_contratos(fechas)
+    datos = []
+    for fecha in fechas:
+        ft_adherencia = serie[fecha].get('FT', 0)
+        pt_adherencia = serie[fecha].get('PT', 0)
+        datos.append({
+            'fecha': fecha.strftime('%Y-%m-%d'),
+            'ft': ft_adherencia,
+            'pt': pt_adherencia,
+            'total': round((ft_adherencia + pt_adherencia) / 2, 2)
+        })
+    return RespuestaColumnar.responder(request, datos, 'fecha')
 
 @login_required
 def api_simular_datos(request):
@@ -142,6 +217,9 @@ def api_simular_datos(request):
             fecha = hoy - timedelta(days=i)
             SimuladorDatos.generar_actividades_dia(fecha)
         
+        # El usuario espera ver los datos nuevos en la próxima carga
+        VersionDatos.invalidar(inmediato=True)
+        
         return JsonResponse({
             'success': True,
             'message': 'Datos simulados correctamente',
@@ -156,46 +234,386 @@ def api_simular_datos(request):
         })
 
 @login_required
+@lectura_analitica()
 def api_agentes_top(request):
-    """API para top agentes"""
+    """API para top agentes (evalúa a todos los agentes activos)"""
     top_count = int(request.GET.get('top', 5))
     tipo = request.GET.get('tipo', 'all')
     
     fecha_fin = date.today()
     fecha_inicio = fecha_fin - timedelta(days=7)
     
-    if tipo == 'ft':
-        agentes = Agente.objects.filter(tipo_contrato='FT', activo=True)
-    elif tipo == 'pt':
-        agentes = Agente.objects.filter(tipo_contrato='PT', activo=True)
-    else:
-        agentes = Agente.objects.filter(activo=True)
+    tipos_contrato = {'ft': 'FT', 'pt': 'PT'}
+    top_resultados = RankingAgentes.top(
+        fecha_inicio, fecha_fin, k=top_count, tipo_contrato=tipos_contrato.get(tipo),
+        supervisor_id=_supervisor_id(request)
+    )
+    
+    return JsonResponse({'agentes': [
+        {
+            'codigo': fila['codigo'],
+            'nombre': fila['nombre'],
+            'tipo': 'Full-Time' if fila['tipo_contrato'] == 'FT' else 'Part-Time',
+            'adherencia': fila['adherencia'],
+            'horas_productivas': round(fila['tiempo_productivo'] / 60, 1)
+        }
+        for fila in top_resultados
+    ]})
+
+@login_required
+@lectura_analitica()
+def api_ranking_agentes(request):
+    """
+    API de ranking completo paginado por cursor
+    Parámetros: orden (top|bottom), limite, cursor, tipo (FT|PT), supervisor, dias
+    """
+    orden = request.GET.get('orden', 'top')
+    if orden not in ('top', 'bottom'):
+        return JsonResponse({'error': "orden debe ser 'top' o 'bottom'"}, status=400)
+    
+    try:
+        limite = min(max(int(request.GET.get('limite', 20)), 1), 200)
+        dias = min(max(int(request.GET.get('dias', 7)), 1), DIAS_MAXIMOS)
+        supervisor_id = int(request.GET['supervisor']) if request.GET.get('supervisor') else None
+        tipo = request.GET.get('tipo') or None
+        if tipo and tipo not in dict(Agente.TIPO_CONTRATO):
+            raise ValueError(tipo)
+        cursor = request.GET.get('cursor')
+        if cursor:
+            RankingAgentes.decodificar_cursor(cursor)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+    
+    fecha_fin = date.today()
+    fecha_inicio = fecha_fin - timedelta(days=dias)
+    
+    filas = RankingAgentes.ordenado(
+        fecha_inicio, fecha_fin,
+        tipo_contrato=tipo,
+        supervisor_id=supervisor_id,
+        orden=orden
+    )
+    pagina, siguiente = RankingAgentes.pagina(filas, limite=limite, orden=orden, cursor=cursor)
+    
+    return JsonResponse({
+        'agentes': pagina,
+        'siguiente': siguiente,
+        'total': len(filas)
+    })
+
+@login_required
+@lectura_analitica()
+def api_equipos(request):
+    """API de adherencia por equipo (supervisor) desde agregados diarios"""
+    try:
+        dias = min(max(int(request.GET.get('dias', 7)), 1), DIAS_MAXIMOS)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+    fecha_fin = date.today()
+    fecha_inicio = fecha_fin - timedelta(days=dias)
+    
+    equipos = CalculadorAdherencia.resumen_equipos(fecha_inicio, fecha_fin)
+    return JsonResponse({'equipos': equipos})
+
+@login_required
+@lectura_analitica()
+def api_equipo_detalle(request, supervisor_id):
+    """API con la serie diaria y el top de un equipo"""
+    try:
+        dias = min(max(int(request.GET.get('dias', 7)), 1), DIAS_MAXIMOS)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+    supervisor = get_object_or_404(User, id=supervisor_id)
+    fecha_fin = date.today()
+    fecha_inicio = fecha_fin - timedelta(days=dias)
+    
+    equipos = CalculadorAdherencia.resumen_equipos(
+        fecha_inicio, fecha_fin, supervisor_id=supervisor.id, por_dia=True
+    )
+    agentes = RankingAgentes.ordenado(fecha_inicio, fecha_fin, supervisor_id=supervisor.id)
     
-    resultados = []
-    for agente in agentes[:20]:  # Limitamos para performance
-        resultado = CalculadorAdherencia.calcular_adherencia_agente(
-            agente, fecha_inicio, fecha_fin
+    return JsonResponse({
+        'equipo': equipos[0] if equipos else None,
+        'agentes': agentes
+    })
+
+@login_required
+@lectura_analitica()
+def api_dimensionamiento(request):
+    """
+    API de agentes requeridos (Erlang C) vs. programados por intervalo
+    Parámetros: dias, intervalo (minutos), nivel (0-1), segundos, supervisor
+    """
+    try:
+        dias = int(request.GET.get('dias', 7))
+        intervalo = int(request.GET.get('intervalo', 15))
+        nivel = float(request.GET['nivel']) if request.GET.get('nivel') else None
+        segundos = int(request.GET['segundos']) if request.GET.get('segundos') else None
+        supervisor_id = int(request.GET['supervisor']) if request.GET.get('supervisor') else None
+        if intervalo <= 0 or 1440 % intervalo or not 0 < dias <= 62:
+            raise ValueError
+        if nivel is not None and not 0 < nivel < 1:
+            raise ValueError
+        if segundos is not None and segundos <= 0:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+    
+    fecha_fin = date.today()
+    fecha_inicio = fecha_fin - timedelta(days=dias - 1)
+    agente_ids = None
+    if supervisor_id:
+        agente_ids = RankingAgentes.agentes(supervisor_id=supervisor_id).values_list('id', flat=True)
+    
+    resultado = Dimensionamiento.comparar(
+        fecha_inicio, fecha_fin, intervalo=intervalo, nivel=nivel,
+        tiempo_objetivo=segundos, agente_ids=agente_ids
+    )
+    
+    return JsonResponse({
+        'fechas': [f.strftime('%Y-%m-%d') for f in resultado['fechas']],
+        'intervalos': resultado['intervalos'],
+        'llamadas': resultado['llamadas'].astype(int).tolist(),
+        'aht': resultado['aht'].round(2).tolist(),
+        'requeridos': resultado['requeridos'].tolist(),
+        'programados': resultado['programados'].round(2).tolist(),
+        'brecha': resultado['brecha'].round(2).tolist(),
+        'resumen': resultado['resumen'],
+    })
+
+def _minuto(texto):
+    """'HH:MM' (00:00-24:00) -> minuto del día; ValueError si no es válido"""
+    horas, minutos = texto.split(':')
+    horas, minutos = int(horas), int(minutos)
+    if not (0 <= horas <= 23 and 0 <= minutos <= 59 or (horas, minutos) == (24, 0)):
+        raise ValueError(texto)
+    return horas * 60 + minutos
+
+def _ventana(parametros):
+    """
+    (intervalo, inicio_min, fin_min) de ?intervalo=&apertura=HH:MM&cierre=HH:MM;
+    un cierre anterior o igual a la apertura es una ventana nocturna
+    (fin_min > 1440). ValueError si algún parámetro no es válido
+    """
+    intervalo = int(parametros.get('intervalo') or getattr(settings, 'ADHERENCIA_INTERVALO', 60))
+    apertura, cierre = getattr(settings, 'ADHERENCIA_VENTANA', ('08:00', '20:00'))
+    inicio_min = _minuto(parametros.get('apertura') or apertura)
+    fin_min = _minuto(parametros.get('cierre') or cierre)
+    if intervalo <= 0 or 1440 % intervalo or inicio_min >= 1440:
+        raise ValueError(intervalo)
+    if fin_min <= inicio_min:
+        fin_min += 1440
+    return intervalo, inicio_min, fin_min
+
+def _contexto_ventana(intervalo, inicio_min, fin_min):
+    return {
+        'intervalo': intervalo,
+        'intervalos_disponibles': INTERVALOS,
+        'apertura': f"{inicio_min // 60:02d}:{inicio_min % 60:02d}",
+        'cierre': f"{(fin_min // 60) % 24:02d}:{fin_min % 60:02d}",
+    }
+
+@login_required
+@lectura_analitica()
+def api_adherencia_cubo(request):
+    """
+    API de tendencias intradía de varias semanas (cubo fechas × minutos)
+    Parámetros: semanas (1-12), supervisor, dia_semana (0=lunes), desde/hasta (HH:MM)
+    para la serie, intervalo (minutos) y ventana apertura/cierre (HH:MM)
+    """
+    try:
+        semanas = min(max(int(request.GET.get('semanas', 8)), 1), 12)
+        supervisor_id = int(request.GET['supervisor']) if request.GET.get('supervisor') else None
+        dia_semana = int(request.GET['dia_semana']) if request.GET.get('dia_semana') else None
+        desde = _minuto(request.GET['desde']) if request.GET.get('desde') else None
+        hasta = _minuto(request.GET['hasta']) if request.GET.get('hasta') else None
+        intervalo, inicio_min, fin_min = _ventana(request.GET)
+        if dia_semana is not None and not 0 <= dia_semana <= 6:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+    
+    fecha_fin = date.today()
+    fecha_inicio = fecha_fin - timedelta(weeks=semanas) + timedelta(days=1)
+    agente_ids = None
+    if supervisor_id:
+        agente_ids = RankingAgentes.agentes(supervisor_id=supervisor_id).values_list('id', flat=True)
+    
+    # En ventanas nocturnas los tramos de la madrugada son del día siguiente
+    if desde is not None and desde < inicio_min:
+        desde += 1440
+    if hasta is not None and hasta <= (inicio_min if desde is None else desde):
+        hasta += 1440
+    
+    cubo = CuboAdherencia.construir(fecha_inicio, fecha_fin, inicio_min, fin_min, agente_ids=agente_ids)
+    
+    return JsonResponse({
+        'fecha_inicio': fecha_inicio.strftime('%Y-%m-%d'),
+        'fecha_fin': fecha_fin.strftime('%Y-%m-%d'),
+        'intervalo': intervalo,
+        'por_dia_semana_y_hora': CuboAdherencia.por_dia_semana_y_hora(cubo, intervalo),
+        'peores_dias': CuboAdherencia.peores_dias(cubo),
+        'serie': CuboAdherencia.serie_diaria(cubo, dia_semana, desde, hasta),
+    })
+
+@login_required
+@lectura_analitica()
+def api_adherencia_intervalos(request):
+    """
+    API de adherencia de un día por intervalo
+    Parámetros: fecha (YYYY-MM-DD, hoy por defecto), supervisor, intervalo
+    (minutos, divisor de 1440), ventana apertura/cierre (HH:MM) y
+    formato=columnas / delta=1 como en api_adherencia_diaria
+    """
+    try:
+        fecha = date.fromisoformat(request.GET['fecha']) if request.GET.get('fecha') else date.today()
+        supervisor_id = int(request.GET['supervisor']) if request.GET.get('supervisor') else None
+        intervalo, inicio_min, fin_min = _ventana(request.GET)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+    
+    agente_ids = None
+    if supervisor_id:
+        agente_ids = RankingAgentes.agentes(supervisor_id=supervisor_id).values_list('id', flat=True)
+    
+    return RespuestaColumnar.responder(
+        request,
+        CalculadorAdherencia.calcular_adherencia_por_hora(
+            fecha, agente_ids=agente_ids, intervalo=intervalo,
+            inicio_min=inicio_min, fin_min=fin_min
+        ),
+        'hora', clave='intervalos',
+        extra={'fecha': fecha.strftime('%Y-%m-%d'), 'intervalo': intervalo},
+    )
+
+@login_required
+@lectura_analitica()
+def api_excepciones(request):
+    """
+    API de los peores tramos fuera de adherencia de un día
+    Parámetros: fecha (YYYY-MM-DD, ayer por defecto), minimo (minutos), limite
+    (1-500), tipo (AUSENTE, SIN_PROG, ESTADO), supervisor
+    """
+    try:
+        fecha = date.fromisoformat(request.GET['fecha']) if request.GET.get('fecha') else date.today() - timedelta(days=1)
+        minimo = max(int(request.GET.get('minimo', 5)), 1)
+        limite = min(max(int(request.GET.get('limite', 20)), 1), 500)
+        supervisor_id = int(request.GET['supervisor']) if request.GET.get('supervisor') else None
+        tipo = request.GET.get('tipo') or None
+        if tipo is not None and tipo not in TIPOS_EXCEPCION:
+            raise ValueError(tipo)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+    
+    agente_ids = None
+    if supervisor_id:
+        agente_ids = list(RankingAgentes.agentes(supervisor_id=supervisor_id).values_list('id', flat=True))
+    
+    return JsonResponse({
+        'fecha': fecha.strftime('%Y-%m-%d'),
+        'minimo': minimo,
+        'excepciones': MotorExcepciones.peores(fecha, minimo, limite, tipo, agente_ids),
+    })
+
+@login_required
+@lectura_analitica()
+def api_agentes_en_estado(request):
+    """
+    API de los agentes que estaban en alguno de los estados en un minuto
+    Parámetros: fecha (YYYY-MM-DD, hoy por defecto), hora (HH:MM), tipo
+    (repetible; por defecto LLAMADA), supervisor
+    """
+    try:
+        fecha = date.fromisoformat(request.GET['fecha']) if request.GET.get('fecha') else date.today()
+        minuto = _minuto(request.GET['hora'])
+        tipos = request.GET.getlist('tipo') or ['LLAMADA']
+        supervisor_id = int(request.GET['supervisor']) if request.GET.get('supervisor') else None
+        if minuto >= 1440 or any(tipo not in INDICE_TIPO for tipo in tipos):
+            raise ValueError(minuto)
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+    
+    agente_ids = None
+    if supervisor_id:
+        agente_ids = list(RankingAgentes.agentes(supervisor_id=supervisor_id).values_list('id', flat=True))
+    
+    ids = LineaTiempo.en_estado(fecha, minuto, tipos, agente_ids)
+    agentes = Agente.objects.filter(id__in=ids).values('id', 'codigo', 'nombre', 'apellido')
+    return JsonResponse({
+        'fecha': fecha.strftime('%Y-%m-%d'),
+        'hora': request.GET['hora'],
+        'tipos': tipos,
+        'cantidad': len(ids),
+        'agentes': list(agentes),
+    })
+
+@login_required
+@lectura_analitica()
+def api_actividades(request):
+    """
+    API de eventos crudos de actividad, paginada por cursor en orden
+    (fecha, hora_inicio, id)
+    Parámetros: cursor (el 'siguiente' de la página anterior), limite
+    (1-5000), agente (id, repetible), tipo (repetible), fecha_inicio y
+    fecha_fin (YYYY-MM-DD), formato=columnas
+    """
+    try:
+        limite = min(max(int(request.GET.get('limite', 1000)), 1), LIMITE_MAXIMO)
+        agente_ids = [int(agente_id) for agente_id in request.GET.getlist('agente')]
+        tipos = request.GET.getlist('tipo')
+        fecha_inicio = date.fromisoformat(request.GET['fecha_inicio']) if request.GET.get('fecha_inicio') else None
+        fecha_fin = date.fromisoformat(request.GET['fecha_fin']) if request.GET.get('fecha_fin') else None
+        if any(tipo not in INDICE_TIPO for tipo in tipos):
+            raise ValueError(tipos)
+        actividades, siguiente = EventosActividad.pagina(
+            request.GET.get('cursor'), limite, agente_ids, tipos, fecha_inicio, fecha_fin
         )
-        if resultado:
-            resultados.append({
-                'codigo': agente.codigo,
-                'nombre': f"{agente.nombre} {agente.apellido}",
-                'tipo': 'Full-Time' if agente.es_full_time else 'Part-Time',
-                'adherencia': resultado['adherencia'],
-                'horas_productivas': round(resultado['tiempo_productivo'] / 60, 1)
-            })
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
     
-    # Ordenar y limitar
-    resultados.sort(key=lambda x: x['adherencia'], reverse=True)
-    top_resultados = resultados[:top_count]
+    return RespuestaColumnar.responder(
+        request, [EventosActividad.serializar(a) for a in actividades], 'id',
+        clave='actividades', extra={'cantidad': len(actividades), 'siguiente': siguiente},
+    )
 
-    return JsonResponse({'agentes': top_resultados})
+@login_required
+@lectura_analitica()
+def api_jornada_agente(request, agente_id):
+    """
+    API de la jornada de un agente: turno, actividades en orden y huecos
+    Parámetros: fecha (YYYY-MM-DD, repetible; hoy por defecto) o rango
+    fecha_inicio/fecha_fin (hasta 31 días)
+    """
+    agente = get_object_or_404(Agente.objects.only('id', 'codigo', 'nombre', 'apellido'), id=agente_id)
+    try:
+        if request.GET.get('fecha_inicio'):
+            fecha_inicio = date.fromisoformat(request.GET['fecha_inicio'])
+            fecha_fin = date.fromisoformat(request.GET.get('fecha_fin') or request.GET['fecha_inicio'])
+            if not 0 <= (fecha_fin - fecha_inicio).days < 31:
+                raise ValueError(fecha_fin)
+            fechas = [fecha_inicio + timedelta(days=d) for d in range((fecha_fin - fecha_inicio).days + 1)]
+        else:
+            fechas = [date.fromisoformat(f) for f in request.GET.getlist('fecha')] or [date.today()]
+            if len(fechas) > 31:
+                raise ValueError(len(fechas))
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+    
+    return JsonResponse({
+        'agente': {
+            'id': agente.id,
+            'codigo': agente.codigo,
+            'nombre': f"{agente.nombre} {agente.apellido}",
+        },
+        'jornadas': JornadaAgente.jornadas(agente.id, fechas),
+    })
 
 @login_required
 def regenerate_data(request):
     """Vista para regenerar datos del dashboard"""
     if request.method == 'POST':
         success = SimuladorDatos.regenerar_datos_completos(dias=7)
+        VersionDatos.invalidar(inmediato=True)
         if success:
             messages.success(request, 'Datos regenerados correctamente')
         else:
@@ -205,9 +623,13 @@ def regenerate_data(request):
     return render(request, 'dashboard/regenerate.html')
 
 @login_required
+@lectura_analitica()
 def matrix_view(request, agente_id=None):
     """Vista de matriz de adherencia por hora y fecha"""
     agentes = Agente.objects.filter(activo=True).order_by('codigo')
+    supervisor_id = _supervisor_id(request)
+    if supervisor_id:
+        agentes = agentes.filter(supervisor_id=supervisor_id)
 
     if agente_id:
         agente = get_object_or_404(Agente, id=agente_id)
@@ -225,35 +647,50 @@ def matrix_view(request, agente_id=None):
 
         fechas.reverse()  # Orden cronológico
 
-        # Calcular matriz
-        matriz = CalculadorAdherencia.calcular_matriz_adherencia_agente(agente, fechas)
+        # Calcular matriz (intervalo y ventana configurables)
+        try:
+            intervalo, inicio_min, fin_min = _ventana(request.GET)
+        except ValueError:
+            intervalo, inicio_min, fin_min = _ventana({})
 
-        # Preparar datos para template
-        horas = [f"{h:02d}:00" for h in range(8, 20)]
-        datos_matriz = []
+        # Perezoso: solo se calcula si la tabla no está en caché
+        def construir_matriz():
+            matriz = CalculadorAdherencia.calcular_matriz_adherencia_agente(
+                agente, fechas, intervalo, inicio_min, fin_min
+            )
 
-        for hora in range(8, 20):
-            fila = {'hora': f"{hora:02d}:00", 'valores': []}
-            for fecha in fechas:
-                valor = matriz.get(fecha, {}).get(hora, 0)
-                fila['valores'].append({
-                    'fecha': fecha,
-                    'adherencia': valor,
-                    'clase': 'table-success' if valor >= 90 else 'table-warning' if valor >= 70 else 'table-danger'
-                })
-            datos_matriz.append(fila)
+            # Preparar datos para template
+            datos_matriz = []
+            for i, etiqueta in enumerate(matriz['intervalos']):
+                fila = {'hora': etiqueta, 'valores': []}
+                for fecha in fechas:
+                    valor = matriz['valores'][fecha][i]
+                    fila['valores'].append({
+                        'fecha': fecha,
+                        'adherencia': valor,
+                        'clase': '' if valor is None else
+                                 'table-success' if valor >= 90 else 'table-warning' if valor >= 70 else 'table-danger'
+                    })
+                datos_matriz.append(fila)
+            return datos_matriz
 
         context = {
             'agente': agente,
             'fechas': fechas,
-            'datos_matriz': datos_matriz,
+            'datos_matriz': SimpleLazyObject(construir_matriz),
             'agentes': agentes,
-            'segmento': 'Agente'
+            'segmento': 'Agente',
+            'supervisor_id': supervisor_id,
+            'supervisores': _supervisores(),
+            **_contexto_ventana(intervalo, inicio_min, fin_min),
+            **VersionDatos.contexto(),
         }
     else:
         context = {
             'agentes': agentes,
-            'segmento': None
+            'segmento': None,
+            'supervisor_id': supervisor_id,
+            'supervisores': _supervisores()
         }
 
     return render(request, 'dashboard/matrix.html', context)
\ No newline at end of file
@@ -11,10 +11,11 @@ from datetime import date, timedelta
 # Configurar Django
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(BASE_DIR)
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'adherence_dasboard.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'adherence.settings')
 django.setup()
 
 from dashboard.models import Agente, ProgramaDiario, RegistroActividad, KPIMeta
+from dashboard.reparacion import ReparadorDatos
 from dashboard.utils import CalculadorAdherencia
 
 def analizar_problemas():
@@ -117,26 +118,14 @@ def corregir_datos():
     # No hay una tabla directa de adherencia, se calcula dinámicamente
     # Esta corrección se hace en el cálculo, no en los datos
     
-    # 2. Verificar y corregir duraciones inválidas
-    print("2. Verificando duraciones de actividades...")
-    
-    actividades = RegistroActividad.objects.all()
-    for actividad in actividades:
-        if actividad.duracion_minutos < 0:
-            actividad.duracion_minutos = abs(actividad.duracion_minutos)
-            actividad.save()
-            print(f"   Corregida duración negativa: {actividad.id}")
-    
-    # 3. Asegurar horas planificadas positivas
-    print("3. Verificando horas planificadas...")
-    
-    programas = ProgramaDiario.objects.all()
-    for programa in programas:
-        if programa.horas_planificadas <= 0:
-            programa.horas_planificadas = 4.0 if programa.agente.tipo_contrato == 'PT' else 8.0
-            programa.save()
-            print(f"   Corregidas horas: {programa.id} -> {programa.horas_planificadas}h")
-    
+    # 2. Duraciones negativas y horas planificadas inválidas, por conjuntos
+    # (equivale a: python manage.py reparar_datos)
+    print("2. Corrigiendo duraciones y horas planificadas...")
+
+    corregidas = ReparadorDatos.reparar(['duraciones_negativas', 'horas_planificadas_cero'])
+    for nombre, filas in corregidas.items():
+        print(f"   {ReparadorDatos.descripcion(nombre)}: {filas} corregidas")
+
     print("\n✅ Correcciones aplicadas")
 
 if __name__ == '__main__':
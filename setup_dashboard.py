@@ -8,7 +8,7 @@ import sys
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(BASE_DIR)
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'adherence_dasboard.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'adherence.settings')
 
 try:
     django.setup()
@@ -17,6 +17,7 @@ except Exception as e:
     sys.exit(1)
 
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.utils import timezone
 from dashboard.models import KPIMeta, FactorImpacto, Agente, ProgramaDiario, RegistroActividad
 from dashboard.utils import SimuladorDatos
@@ -29,6 +30,10 @@ def inicializar_sistema():
     print("=" * 50)
     
     try:
+        # 0. Tabla del caché compartido (CACHES en settings)
+        call_command('createcachetable')
+        print("✅ Tabla de caché lista")
+    
         # 1. Crear superusuario si no existe
         if not User.objects.filter(username='admin').exists():
             User.objects.create_superuser(